@@ -1,14 +1,278 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import pyodbc
 import json
 import os
+import re
+import sys
+import hashlib
+import argparse
+import cProfile
+import pstats
+import fnmatch
+import heapq
+import time
+import queue
+import random
+import threading
+import datetime
+import uuid
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+
+# SQL_ATTR_PACKET_SIZE（接続文字列では指定できないため接続属性で設定する）
+SQL_ATTR_PACKET_SIZE = 112
+
+def build_connection_string(settings, database=None, read_only=False):
+    """接続設定からODBC接続文字列を組み立てる
+
+    Args:
+        settings: 接続設定（SQLTableManager.connection_info と同じ形式）
+        database: 接続先のデータベース
+        read_only: 読み取り専用の処理の場合はTrue。読み取り用サーバーが設定されていればそちらへ、
+            ApplicationIntent=ReadOnlyが有効なら読み取り可能セカンダリへ振り分ける
+    """
+    server = settings['server']
+    if read_only and settings.get('read_server'):
+        server = settings['read_server']
+
+    connection_string = (
+        f"DRIVER={{{settings['driver']}}};"
+        f"SERVER={server};"
+        f"UID={settings['username']};"
+        f"PWD={settings['password']}"
+    )
+    if database:
+        connection_string += f";DATABASE={database}"
+    if read_only and settings.get('read_intent'):
+        connection_string += ";ApplicationIntent=ReadOnly"
+    if settings.get('multi_subnet_failover'):
+        connection_string += ";MultiSubnetFailover=Yes"
+    if settings.get('mars'):
+        connection_string += ";MARS_Connection=Yes"
+    if settings.get('encrypt'):
+        connection_string += ";Encrypt=Yes"
+    if settings.get('trust_server_certificate'):
+        connection_string += ";TrustServerCertificate=Yes"
+    return connection_string
+
+def connection_attributes(settings):
+    """pyodbc.connect の attrs_before に渡す接続属性
+
+    pyodbcは辞書以外の値を接続文字列のキーワードとして扱うため、属性がない場合も空の辞書を返す。
+    """
+    packet_size = int(settings.get('packet_size', 0) or 0)
+    return {SQL_ATTR_PACKET_SIZE: packet_size} if packet_size else {}
+
+def native_error_numbers(error):
+    """pyodbcのエラーから、SQL Serverのネイティブエラー番号を取り出す
+
+    診断レコードの末尾にある「(番号) (SQLExecDirectW)」または「(番号); [」の形だけを見るため、
+    メッセージ中のデータ値（重複キーの値など）に含まれる括弧付きの数値は拾わない。
+    """
+    message = str(error.args[1]) if len(error.args) > 1 else str(error)
+    return {int(number) for number in re.findall(r"\((\d+)\)(?: \(SQL\w+\))?(?=;\s*\[|\s*$)", message)}
+
+class CircuitOpenError(Exception):
+    """サーキットブレーカーが開いている間の呼び出し"""
+
+class QueryGovernor:
+    """データベース呼び出しのタイムアウト、一時エラーの再試行、サーキットブレーカーを管理する
+
+    一時的なエラーが続いた場合は回路を開き、reset_timeout秒の間は接続を試みずに
+    即座に失敗させる。その後の最初の呼び出しだけを試行として通し（他は試行の結果が出るまで
+    即座に失敗させる）、成功すれば回路を閉じる。
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    # 一時的なエラーとみなすSQLSTATE（通信断、接続失敗、デッドロック）
+    TRANSIENT_SQLSTATES = {'08S01', '08001', '08004', '40001'}
+
+    # タイムアウトのSQLSTATE。クエリのタイムアウトは重いクエリでも起きるため、再試行も
+    # ブレーカーへの計上もしない。接続時（ログイン）のタイムアウトだけを一時エラーとして扱う
+    TIMEOUT_SQLSTATES = {'HYT00', 'HYT01'}
+
+    # 一時的なエラーとみなすSQL Serverのエラー番号
+    TRANSIENT_ERRORS = {
+        1205,                       # デッドロックの対象
+        233, 64, 10053, 10054, 10060,  # 接続の切断
+        976, 978, 983, 4221,        # 可用性グループのフェールオーバー中
+        40197, 40501, 40613, 49918, 49919, 49920, 10928, 10929  # 調整（スロットリング）
+    }
+
+    def __init__(self, failure_threshold=3, reset_timeout=30):
+        """
+        Args:
+            failure_threshold: 回路を開くまでの連続した一時エラーの回数
+            reset_timeout: 回路を開いてから再試行を許可するまでの秒数
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+
+    def is_transient(self, error, connecting=False):
+        """エラーが一時的（再試行で回復し得る）かどうか
+
+        Args:
+            connecting: 接続（ログイン）時のエラーならTrue
+        """
+        if isinstance(error, CircuitOpenError):
+            return False
+        sqlstate = error.args[0] if error.args else ''
+        if sqlstate in self.TIMEOUT_SQLSTATES:
+            return connecting
+        if sqlstate in self.TRANSIENT_SQLSTATES:
+            return True
+        return bool(native_error_numbers(error) & self.TRANSIENT_ERRORS)
+
+    def before_call(self):
+        """
+        Returns:
+            回路が半開で、この呼び出しを試行として通す場合はTrue
+        """
+        with self.lock:
+            if self.state == self.HALF_OPEN and self.probe_in_flight:
+                raise CircuitOpenError("サーバーへの接続を確認中です。しばらくしてから再度実行してください")
+            if self.state == self.OPEN:
+                remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+                if remaining > 0:
+                    raise CircuitOpenError(
+                        f"サーバーへの接続に失敗し続けているため、あと {remaining:.0f} 秒間は接続を試みません")
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                # 試行として通すのは最初の1件だけ
+                self.probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.probe_in_flight = False
+
+    def record_failure(self, error, connecting=False):
+        """
+        Args:
+            connecting: 接続（ログイン）時のエラーならTrue
+        """
+        transient = self.is_transient(error, connecting)
+        with self.lock:
+            # 試行が終わったので、回路が開いたままでなければ次の呼び出しを試行として通せる
+            self.probe_in_flight = False
+            # 構文エラーなどの恒久的なエラーやクエリのタイムアウトはサーバーの状態と無関係なので数えない
+            if not transient:
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def connect(self, connection_string, login_timeout, query_timeout, attrs_before=None):
+        """
+        Args:
+            connection_string: ODBC接続文字列
+            login_timeout: ログインタイムアウト（秒）
+            query_timeout: クエリタイムアウト（秒、0で無制限）
+            attrs_before: 接続前に設定するODBC接続属性
+        """
+        probe = self.before_call()
+        try:
+            # attrs_before=None は接続文字列に追加されてしまうため、属性がある場合だけ渡す
+            options = {'attrs_before': attrs_before} if attrs_before else {}
+            conn = pyodbc.connect(connection_string, timeout=login_timeout, **options)
+        except pyodbc.Error as e:
+            self.record_failure(e, connecting=True)
+            e.recorded_by_governor = True
+            raise
+        if probe:
+            # 接続できればサーバーは回復しているので、run_read等を通さない呼び出し元でも回路を閉じる
+            self.record_success()
+        conn.timeout = query_timeout
+        return conn
+
+    def run(self, func):
+        """再試行せずに実行し、結果を回路の状態に反映する
+
+        任意のクエリや更新など、冪等でないため再試行できない処理に使う。
+
+        Args:
+            func: 引数なしで呼び出す処理
+        """
+        try:
+            result = func()
+        except pyodbc.Error as e:
+            # 接続時のエラーはconnectで計上済み
+            if not getattr(e, 'recorded_by_governor', False):
+                self.record_failure(e)
+            raise
+        self.record_success()
+        return result
+
+    def run_read(self, read, retries=3, base_delay=0.5):
+        """冪等な読み取りを、一時エラー時にジッター付きバックオフで再試行して実行する
+
+        再試行の間は待機するため、UIスレッドからはSQLTableManager.run_in_workerを通して呼び出す。
+
+        Args:
+            read: 引数なしで呼び出す読み取り処理
+            retries: 再試行回数
+            base_delay: 最初の再試行までの最大待ち時間（秒）
+        """
+        for attempt in range(retries + 1):
+            try:
+                result = read()
+            except pyodbc.Error as e:
+                connecting = getattr(e, 'recorded_by_governor', False)
+                if not connecting:
+                    self.record_failure(e)
+                if attempt == retries or not self.is_transient(e, connecting) or self.state == self.OPEN:
+                    raise
+                time.sleep(random.uniform(0, base_delay * 2 ** attempt))
+            else:
+                self.record_success()
+                return result
+
+    def status_text(self):
+        with self.lock:
+            if self.state == self.OPEN:
+                remaining = max(0, self.reset_timeout - (time.monotonic() - self.opened_at))
+                return f"接続: 遮断中（{remaining:.0f} 秒後に再試行）"
+            if self.state == self.HALF_OPEN:
+                return "接続: 再試行中"
+            if self.failures:
+                return f"接続: 正常（一時エラー {self.failures} 回）"
+            return "接続: 正常"
 
 class ConnectionSettingsDialog:
+    # 接続プロファイル（選択すると詳細設定に反映する）
+    PROFILES = {
+        "標準": {
+            'packet_size': 0, 'read_intent': False, 'multi_subnet_failover': False,
+            'mars': False, 'encrypt': False, 'trust_server_certificate': False
+        },
+        "可用性グループ（読み取り分散）": {
+            'packet_size': 0, 'read_intent': True, 'multi_subnet_failover': True,
+            'mars': False, 'encrypt': True, 'trust_server_certificate': True
+        },
+        "大量データ転送": {
+            'packet_size': 32767, 'read_intent': False, 'multi_subnet_failover': False,
+            'mars': False, 'encrypt': False, 'trust_server_certificate': False
+        }
+    }
+    CUSTOM_PROFILE = "カスタム"
+
     def __init__(self, parent, current_settings):
         self.dialog = tk.Toplevel(parent)
         self.dialog.title("接続設定")
-        self.dialog.geometry("400x300")
+        self.dialog.geometry("420x860")
         self.dialog.transient(parent)
         self.dialog.grab_set()
         
@@ -23,6 +287,20 @@ class ConnectionSettingsDialog:
         self.username = tk.StringVar(value=self.current_settings['username'])
         self.password = tk.StringVar(value=self.current_settings['password'])
         self.driver = tk.StringVar(value=self.current_settings['driver'])
+        self.profile = tk.StringVar()
+        self.packet_size = tk.StringVar()
+        self.read_server = tk.StringVar()
+        self.read_intent = tk.BooleanVar()
+        self.multi_subnet_failover = tk.BooleanVar()
+        self.mars = tk.BooleanVar()
+        self.encrypt = tk.BooleanVar()
+        self.trust_server_certificate = tk.BooleanVar()
+        self.login_timeout = tk.StringVar()
+        self.query_timeout = tk.StringVar()
+        self.lock_timeout = tk.StringVar()
+        self.ddl_retries = tk.StringVar()
+        self.low_priority_minutes = tk.StringVar()
+        self.schema_search_refresh_minutes = tk.StringVar()
         
     def get_available_drivers(self):
         try:
@@ -52,26 +330,129 @@ class ConnectionSettingsDialog:
         driver_combo = ttk.Combobox(main_frame, textvariable=self.driver, values=self.get_available_drivers(), width=37)
         driver_combo.grid(row=3, column=1, sticky='ew', padx=5, pady=5)
         
+        # 接続プロファイル
+        profile_frame = ttk.LabelFrame(main_frame, text="接続プロファイル", padding="5")
+        profile_frame.grid(row=4, column=0, columnspan=2, sticky='ew', padx=5, pady=5)
+        profile_combo = ttk.Combobox(profile_frame, textvariable=self.profile, state="readonly",
+                                     values=list(self.PROFILES) + [self.CUSTOM_PROFILE])
+        profile_combo.grid(row=0, column=0, columnspan=2, sticky='ew', padx=5, pady=2)
+        profile_combo.bind('<<ComboboxSelected>>', self.on_profile_selected)
+        ttk.Label(profile_frame, text="パケットサイズ(0で既定):").grid(row=1, column=0, sticky='w', padx=5, pady=2)
+        ttk.Entry(profile_frame, textvariable=self.packet_size, width=10).grid(row=1, column=1, sticky='w', padx=5, pady=2)
+        ttk.Label(profile_frame, text="読み取り用サーバー:").grid(row=2, column=0, sticky='w', padx=5, pady=2)
+        ttk.Entry(profile_frame, textvariable=self.read_server, width=22).grid(row=2, column=1, sticky='w', padx=5, pady=2)
+        options = [
+            (self.read_intent, "読み取りをセカンダリへ (ApplicationIntent=ReadOnly)"),
+            (self.multi_subnet_failover, "MultiSubnetFailover"),
+            (self.mars, "MARS"),
+            (self.encrypt, "暗号化 (Encrypt)"),
+            (self.trust_server_certificate, "サーバー証明書を信頼")
+        ]
+        for row, (variable, text) in enumerate(options, start=3):
+            ttk.Checkbutton(profile_frame, text=text, variable=variable,
+                           command=self.on_option_changed).grid(row=row, column=0, columnspan=2, sticky='w', padx=5)
+
+        # タイムアウト設定
+        timeout_frame = ttk.LabelFrame(main_frame, text="タイムアウト", padding="5")
+        timeout_frame.grid(row=5, column=0, columnspan=2, sticky='ew', padx=5, pady=5)
+        ttk.Label(timeout_frame, text="ログイン(秒):").grid(row=0, column=0, sticky='w', padx=5, pady=2)
+        ttk.Entry(timeout_frame, textvariable=self.login_timeout, width=10).grid(row=0, column=1, sticky='w', padx=5, pady=2)
+        ttk.Label(timeout_frame, text="クエリ(秒、0で無制限):").grid(row=1, column=0, sticky='w', padx=5, pady=2)
+        ttk.Entry(timeout_frame, textvariable=self.query_timeout, width=10).grid(row=1, column=1, sticky='w', padx=5, pady=2)
+
+        # DDL実行設定
+        ddl_frame = ttk.LabelFrame(main_frame, text="DDL実行", padding="5")
+        ddl_frame.grid(row=6, column=0, columnspan=2, sticky='ew', padx=5, pady=5)
+        ttk.Label(ddl_frame, text="ロックタイムアウト(ms):").grid(row=0, column=0, sticky='w', padx=5, pady=2)
+        ttk.Entry(ddl_frame, textvariable=self.lock_timeout, width=10).grid(row=0, column=1, sticky='w', padx=5, pady=2)
+        ttk.Label(ddl_frame, text="再試行回数:").grid(row=1, column=0, sticky='w', padx=5, pady=2)
+        ttk.Entry(ddl_frame, textvariable=self.ddl_retries, width=10).grid(row=1, column=1, sticky='w', padx=5, pady=2)
+        ttk.Label(ddl_frame, text="低優先度待機(分、0で無効):").grid(row=2, column=0, sticky='w', padx=5, pady=2)
+        ttk.Entry(ddl_frame, textvariable=self.low_priority_minutes, width=10).grid(row=2, column=1, sticky='w', padx=5, pady=2)
+
+        # スキーマ検索設定
+        search_frame = ttk.LabelFrame(main_frame, text="スキーマ検索", padding="5")
+        search_frame.grid(row=7, column=0, columnspan=2, sticky='ew', padx=5, pady=5)
+        ttk.Label(search_frame, text="索引の自動更新(分、0で無効):").grid(row=0, column=0, sticky='w', padx=5, pady=2)
+        ttk.Entry(search_frame, textvariable=self.schema_search_refresh_minutes, width=10).grid(row=0, column=1, sticky='w', padx=5, pady=2)
+        
         # テスト接続ボタン
-        ttk.Button(main_frame, text="接続テスト", command=self.test_connection).grid(row=4, column=0, columnspan=2, pady=20)
+        ttk.Button(main_frame, text="接続テスト", command=self.test_connection).grid(row=8, column=0, columnspan=2, pady=20)
         
         # 保存・キャンセルボタン
         button_frame = ttk.Frame(main_frame)
-        button_frame.grid(row=5, column=0, columnspan=2, pady=10)
+        button_frame.grid(row=9, column=0, columnspan=2, pady=10)
         ttk.Button(button_frame, text="保存", command=self.save).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="キャンセル", command=self.cancel).pack(side=tk.LEFT, padx=5)
         
+    def on_profile_selected(self, event=None):
+        profile = self.PROFILES.get(self.profile.get())
+        if not profile:
+            return
+        self.packet_size.set(str(profile['packet_size']))
+        self.read_intent.set(profile['read_intent'])
+        self.multi_subnet_failover.set(profile['multi_subnet_failover'])
+        self.mars.set(profile['mars'])
+        self.encrypt.set(profile['encrypt'])
+        self.trust_server_certificate.set(profile['trust_server_certificate'])
+
+    def on_option_changed(self):
+        # 個別に変更した場合はカスタム扱い
+        self.profile.set(self.CUSTOM_PROFILE)
+
+    def matching_profile(self):
+        """詳細設定がすべて一致するプロファイル名。どれにも一致しなければカスタム"""
+        try:
+            packet_size = int(self.packet_size.get() or 0)
+        except ValueError:
+            return self.CUSTOM_PROFILE
+        current = {
+            'packet_size': packet_size,
+            'read_intent': self.read_intent.get(),
+            'multi_subnet_failover': self.multi_subnet_failover.get(),
+            'mars': self.mars.get(),
+            'encrypt': self.encrypt.get(),
+            'trust_server_certificate': self.trust_server_certificate.get()
+        }
+        for name, profile in self.PROFILES.items():
+            if profile == current:
+                return name
+        return self.CUSTOM_PROFILE
+
+    def collect_profile_settings(self):
+        # プロファイル名は保存せず、読み込み時に詳細設定から判定する
+        return {
+            'packet_size': int(self.packet_size.get() or 0),
+            'read_server': self.read_server.get().strip(),
+            'read_intent': self.read_intent.get(),
+            'multi_subnet_failover': self.multi_subnet_failover.get(),
+            'mars': self.mars.get(),
+            'encrypt': self.encrypt.get(),
+            'trust_server_certificate': self.trust_server_certificate.get()
+        }
+
     def test_connection(self):
         try:
-            connection_string = (
-                f"DRIVER={{{self.driver.get()}}};"
-                f"SERVER={self.server.get()};"
-                f"UID={self.username.get()};"
-                f"PWD={self.password.get()}"
-            )
-            conn = pyodbc.connect(connection_string)
-            conn.close()
-            messagebox.showinfo("成功", "接続テストに成功しました")
+            settings = {
+                'server': self.server.get(),
+                'username': self.username.get(),
+                'password': self.password.get(),
+                'driver': self.driver.get()
+            }
+            settings.update(self.collect_profile_settings())
+            targets = [("プライマリ", False)]
+            if settings['read_server'] or settings['read_intent']:
+                targets.append(("読み取り用", True))
+
+            results = []
+            for label, read_only in targets:
+                conn = pyodbc.connect(build_connection_string(settings, read_only=read_only),
+                                      timeout=int(self.login_timeout.get() or 15),
+                                      attrs_before=connection_attributes(settings))
+                server_name = conn.cursor().execute("SELECT @@SERVERNAME").fetchone()[0]
+                conn.close()
+                results.append(f"{label}: {server_name}")
+            messagebox.showinfo("成功", "接続テストに成功しました\n" + "\n".join(results))
         except Exception as e:
             messagebox.showerror("エラー", f"接続テストに失敗しました: {str(e)}")
             
@@ -79,13 +460,32 @@ class ConnectionSettingsDialog:
         if not all([self.server.get(), self.username.get(), self.password.get(), self.driver.get()]):
             messagebox.showwarning("警告", "すべての項目を入力してください")
             return
+
+        try:
+            profile_settings = self.collect_profile_settings()
+            numeric_settings = {
+                'login_timeout': int(self.login_timeout.get()),
+                'query_timeout': int(self.query_timeout.get()),
+                'lock_timeout_ms': int(self.lock_timeout.get()),
+                'ddl_retries': int(self.ddl_retries.get()),
+                'low_priority_minutes': int(self.low_priority_minutes.get()),
+                'schema_search_refresh_minutes': int(self.schema_search_refresh_minutes.get())
+            }
+        except ValueError:
+            messagebox.showwarning("警告", "パケットサイズ、タイムアウト、DDL実行、スキーマ検索の設定は整数で入力してください")
+            return
             
-        self.result = {
+        # 画面にない設定項目も引き継ぐ（以前のバージョンで保存したプロファイル名は使わないので除く）
+        self.result = dict(self.current_settings)
+        self.result.pop('profile', None)
+        self.result.update({
             'server': self.server.get(),
             'username': self.username.get(),
             'password': self.password.get(),
             'driver': self.driver.get()
-        }
+        })
+        self.result.update(profile_settings)
+        self.result.update(numeric_settings)
         self.dialog.destroy()
         
     def cancel(self):
@@ -97,6 +497,21 @@ class ConnectionSettingsDialog:
         self.username.set(self.current_settings.get('username', ''))
         self.password.set(self.current_settings.get('password', ''))
         self.driver.set(self.current_settings.get('driver', ''))
+        self.packet_size.set(str(self.current_settings.get('packet_size', 0)))
+        self.read_server.set(self.current_settings.get('read_server', ''))
+        self.read_intent.set(self.current_settings.get('read_intent', False))
+        self.multi_subnet_failover.set(self.current_settings.get('multi_subnet_failover', False))
+        self.mars.set(self.current_settings.get('mars', False))
+        self.encrypt.set(self.current_settings.get('encrypt', False))
+        self.trust_server_certificate.set(self.current_settings.get('trust_server_certificate', False))
+        self.login_timeout.set(str(self.current_settings.get('login_timeout', 15)))
+        self.query_timeout.set(str(self.current_settings.get('query_timeout', 30)))
+        self.lock_timeout.set(str(self.current_settings.get('lock_timeout_ms', 5000)))
+        self.ddl_retries.set(str(self.current_settings.get('ddl_retries', 3)))
+        self.low_priority_minutes.set(str(self.current_settings.get('low_priority_minutes', 0)))
+        self.schema_search_refresh_minutes.set(str(self.current_settings.get('schema_search_refresh_minutes', 0)))
+        # 保存済みのプロファイル名ではなく、読み込んだ詳細設定に一致するプロファイルを選択する
+        self.profile.set(self.matching_profile())
         
 class ColumnDialog:
     def __init__(self, sql_manager, title, current_values=None):
@@ -111,7 +526,7 @@ class ColumnDialog:
         # Tkinterのルートウィンドウを取得
         self.dialog = tk.Toplevel(sql_manager.root)
         self.dialog.title(title)
-        self.dialog.geometry("235x410+150+500")
+        self.dialog.geometry("235x470+150+500")
         self.dialog.transient(sql_manager.root)
         self.dialog.grab_set()
         self.result = None
@@ -128,6 +543,8 @@ class ColumnDialog:
         self.is_nullable = tk.BooleanVar(value=True)
         self.is_computed = tk.BooleanVar(value=False)
         self.computation_formula = tk.StringVar()
+        self.is_persisted = tk.BooleanVar(value=False)
+        self.create_index = tk.BooleanVar(value=False)
         self.is_foreign_key = tk.BooleanVar(value=False)
         self.ref_table = tk.StringVar()
         self.ref_column = tk.StringVar()
@@ -160,7 +577,11 @@ class ColumnDialog:
                 if current_values[6]:
                     self.ref_table.set(current_values[7])
                     self.ref_column.set(current_values[8])
-    
+
+            if len(current_values) > 10:
+                self.is_persisted.set(bool(current_values[9]))
+                self.create_index.set(bool(current_values[10]))
+
     def parse_data_type(self, data_type):
         import re
         
@@ -220,10 +641,18 @@ class ColumnDialog:
                        command=self.toggle_computation_formula).pack(anchor='w', padx=5)
         
         self.formula_frame = ttk.Frame(computed_frame)
-        ttk.Label(self.formula_frame, text="計算式:").pack(side=tk.LEFT)
-        self.formula_entry = ttk.Entry(self.formula_frame, textvariable=self.computation_formula)
+        formula_row = ttk.Frame(self.formula_frame)
+        formula_row.pack(fill=tk.X)
+        ttk.Label(formula_row, text="計算式:").pack(side=tk.LEFT)
+        self.formula_entry = ttk.Entry(formula_row, textvariable=self.computation_formula)
         self.formula_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
-        
+
+        # 書き込み時に一度だけ計算させるためのオプション
+        ttk.Checkbutton(self.formula_frame, text="PERSISTED（値を格納）",
+                       variable=self.is_persisted).pack(anchor='w')
+        ttk.Checkbutton(self.formula_frame, text="インデックスを作成",
+                       variable=self.create_index).pack(anchor='w')
+
         # 初期状態の設定
         self.formula_frame.pack(fill=tk.X, padx=5, pady=5) if self.is_computed.get() else self.formula_frame.pack_forget()
         
@@ -283,11 +712,9 @@ class ColumnDialog:
                 messagebox.showwarning("警告", "データベースが選択されていません")
                 return
                 
-            with self.connect_to_server() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_TYPE = 'BASE TABLE'")
-                tables = [row[0] for row in cursor.fetchall()]
-                self.ref_table_combo['values'] = tables
+            rows = self.sql_manager.read_rows("SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_TYPE = 'BASE TABLE'")
+            tables = [row[0] for row in rows]
+            self.ref_table_combo['values'] = tables
         except Exception as e:
             messagebox.showerror("エラー", f"テーブル一覧の取得に失敗しました: {str(e)}")
 
@@ -311,78 +738,3624 @@ class ColumnDialog:
             ttk.Label(self.type_details_frame, text="スケール:").grid(row=1, column=0, padx=5, pady=5)
             self.scale_entry.grid(row=1, column=1, padx=5, pady=5)
 
-    def on_ref_table_select(self, event):
-        if not self.ref_table.get():
-            return
-            
+    def on_ref_table_select(self, event):
+        if not self.ref_table.get():
+            return
+            
+        try:
+            if not self.sql_manager.current_db:
+                messagebox.showwarning("警告", "データベースが選択されていません")
+                return
+                
+            rows = self.sql_manager.read_rows(f"""
+                SELECT COLUMN_NAME 
+                FROM INFORMATION_SCHEMA.COLUMNS 
+                WHERE TABLE_NAME = '{self.ref_table.get()}'
+                AND (COLUMNPROPERTY(OBJECT_ID(TABLE_SCHEMA + '.' + TABLE_NAME), COLUMN_NAME, 'IsIdentity') = 1
+                OR EXISTS (
+                    SELECT 1 
+                    FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE 
+                    WHERE TABLE_NAME = '{self.ref_table.get()}' 
+                    AND COLUMN_NAME = INFORMATION_SCHEMA.COLUMNS.COLUMN_NAME
+                ))
+            """)
+            columns = [row[0] for row in rows]
+            self.ref_column_combo['values'] = columns
+        except Exception as e:
+            messagebox.showerror("エラー", f"カラム一覧の取得に失敗しました: {str(e)}")
+
+    def toggle_computation_formula(self):
+        if self.is_computed.get():
+            self.formula_frame.pack(fill=tk.X, padx=5, pady=5)
+        else:
+            self.formula_frame.pack_forget()
+            
+    def get_full_data_type(self):
+        base_type = self.selected_type.get()
+        if base_type in DataTypes.TYPES_WITH_LENGTH and self.length.get():
+            return f"{base_type}({self.length.get()})"
+        elif base_type in DataTypes.TYPES_WITH_PRECISION:
+            precision = self.precision.get() or "18"
+            scale = self.scale.get() or "0"
+            return f"{base_type}({precision},{scale})"
+        return base_type
+        
+    def validate(self):
+        if not self.column_name.get().strip():
+            messagebox.showwarning("警告", "カラム名を入力してください")
+            return False
+            
+        if self.is_computed.get() and not self.computation_formula.get().strip():
+            messagebox.showwarning("警告", "計算式を入力してください")
+            return False
+            
+        return True
+        
+    def ok(self):
+        if not self.validate():
+            return
+            
+        self.result = {
+            'name': self.column_name.get().strip(),
+            'data_type': self.get_full_data_type(),
+            'is_primary': self.is_primary.get(),
+            'is_nullable': self.is_nullable.get(),
+            'is_computed': self.is_computed.get(),
+            'is_foreign_key' : self.is_foreign_key.get(),
+            'ref_table' : self.ref_table.get(),
+            'ref_column': self.ref_column.get(),
+            'computation_formula': self.computation_formula.get().strip() if self.is_computed.get() else None,
+            'is_persisted': self.is_computed.get() and self.is_persisted.get(),
+            'create_index': self.is_computed.get() and self.create_index.get()
+        }
+        self.dialog.destroy()
+        
+    def cancel(self):
+        self.dialog.destroy()
+
+class TypeAdvisorDialog:
+    """カラムの格納サイズと最大行幅を見積もり、実データから縮小可能なデータ型を提案する"""
+
+    # サンプリング時に確保する余裕（サンプル内の最大値に対する倍率）
+    SAMPLE_HEADROOM = 2
+
+    INTEGER_TYPES = ['TINYINT', 'SMALLINT', 'INT', 'BIGINT']
+    CHAR_TYPES = ['CHAR', 'VARCHAR', 'TEXT', 'NCHAR', 'NVARCHAR', 'NTEXT']
+    WIDE_CHAR_TYPES = ['NCHAR', 'NVARCHAR', 'NTEXT']
+    DATETIME_TYPES = ['DATETIME', 'DATETIME2', 'SMALLDATETIME']
+
+    def __init__(self, sql_manager):
+        """
+        Args:
+            sql_manager: SQLTableManagerのインスタンス
+        """
+        self.sql_manager = sql_manager
+        self.table_name = sql_manager.current_table
+
+        self.dialog = tk.Toplevel(sql_manager.root)
+        self.dialog.title(f"型最適化アドバイザー - {self.table_name}")
+        self.dialog.geometry("950x550")
+        self.dialog.transient(sql_manager.root)
+        # 提案の適用はメインウィンドウで選択中のテーブルに対して行うため、開いている間はテーブルを切り替えさせない
+        self.dialog.grab_set()
+
+        self.sample_rows = tk.StringVar(value="100000")
+        self.summary = tk.StringVar()
+        self.suggestions = {}
+        self.create_widgets()
+        self.analyze()
+
+    def create_widgets(self):
+        main_frame = ttk.Frame(self.dialog, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+
+        # サンプリング設定
+        option_frame = ttk.Frame(main_frame)
+        option_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(option_frame, text="サンプル行数:").pack(side=tk.LEFT, padx=5)
+        ttk.Entry(option_frame, textvariable=self.sample_rows, width=12).pack(side=tk.LEFT, padx=5)
+        ttk.Button(option_frame, text="分析", command=self.analyze).pack(side=tk.LEFT, padx=5)
+
+        ttk.Label(main_frame, textvariable=self.summary).pack(anchor='w', pady=5)
+
+        # 警告一覧
+        warning_frame = ttk.LabelFrame(main_frame, text="警告", padding="5")
+        warning_frame.pack(fill=tk.X, pady=5)
+        self.warning_listbox = tk.Listbox(warning_frame, height=4)
+        self.warning_listbox.pack(fill=tk.X)
+
+        # 提案一覧
+        suggestion_frame = ttk.LabelFrame(main_frame, text="型の提案", padding="5")
+        suggestion_frame.pack(fill=tk.BOTH, expand=True, pady=5)
+        columns = ("カラム", "現在の型", "格納サイズ", "提案", "推定節約", "根拠")
+        self.suggestion_tree = ttk.Treeview(suggestion_frame, columns=columns, show="headings")
+        for column, width in zip(columns, (120, 120, 80, 120, 180, 300)):
+            self.suggestion_tree.heading(column, text=column)
+            self.suggestion_tree.column(column, width=width)
+        self.suggestion_tree.pack(fill=tk.BOTH, expand=True)
+
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(pady=5)
+        ttk.Button(button_frame, text="選択した提案を適用", command=self.apply_suggestion).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="閉じる", command=self.dialog.destroy).pack(side=tk.LEFT, padx=5)
+
+    def analyze(self, read_only=True):
+        """
+        Args:
+            read_only: Falseの場合はプライマリから読む（型を変更した直後の再分析など）
+        """
+        try:
+            sample_rows = int(self.sample_rows.get())
+        except ValueError:
+            messagebox.showwarning("警告", "サンプル行数は整数で入力してください", parent=self.dialog)
+            return
+
+        def read():
+            # 実データのサンプリングは読み取り専用なのでセカンダリへ振り分ける
+            with self.sql_manager.connect_to_server(read_only=read_only) as conn:
+                cursor = conn.cursor()
+                columns = self.load_columns(cursor)
+                row_count = self.get_row_count(cursor)
+                sampled = row_count > sample_rows
+                stats = self.sample_statistics(cursor, columns, sample_rows if sampled else None)
+                if sampled and stats.get('sample_count', 0) == 0:
+                    # TABLESAMPLEはページ単位のため0行になることがある
+                    sampled = False
+                    stats = self.sample_statistics(cursor, columns, None)
+                return columns, row_count, stats, sampled
+
+        try:
+            columns, row_count, stats, sampled = self.sql_manager.run_in_worker(
+                lambda report: self.sql_manager.governor.run_read(read), "型を分析しています...")
+        except Exception as e:
+            messagebox.showerror("エラー", f"型の分析に失敗しました: {str(e)}", parent=self.dialog)
+            return
+
+        self.show_results(columns, row_count, stats, sampled)
+
+    def load_columns(self, cursor):
+        """カラムのメタデータと格納サイズを取得"""
+        cursor.execute("""
+            SELECT c.name, t.name, c.max_length, c.precision, c.scale, c.is_computed, c.is_identity
+            FROM sys.columns c
+            JOIN sys.types t ON c.user_type_id = t.user_type_id
+            WHERE c.object_id = OBJECT_ID(?)
+            ORDER BY c.column_id
+        """, self.table_name)
+
+        columns = []
+        for name, type_name, max_length, precision, scale, is_computed, is_identity in cursor.fetchall():
+            size, is_variable = DataTypes.storage_size(type_name, max_length)
+            columns.append({
+                'name': name,
+                'type': type_name.upper(),
+                'max_length': max_length,
+                'precision': precision,
+                'scale': scale,
+                'is_computed': bool(is_computed),
+                'is_identity': bool(is_identity),
+                'size': size,
+                'is_variable': is_variable
+            })
+        return columns
+
+    def get_row_count(self, cursor):
+        cursor.execute("""
+            SELECT SUM(row_count)
+            FROM sys.dm_db_partition_stats
+            WHERE object_id = OBJECT_ID(?) AND index_id IN (0, 1)
+        """, self.table_name)
+        return cursor.fetchone()[0] or 0
+
+    def sample_statistics(self, cursor, columns, sample_rows):
+        """実データのMIN/MAXと最大長を集計する（sample_rowsを指定した場合はTABLESAMPLE）"""
+        expressions = ["COUNT(*)"]
+        keys = [('', 'sample_count')]
+
+        for column in columns:
+            if column['is_computed']:
+                continue
+            name = f"[{column['name']}]"
+            base_type = column['type']
+
+            if base_type in self.INTEGER_TYPES:
+                expressions += [f"MIN({name})", f"MAX({name})"]
+                keys += [(column['name'], 'min'), (column['name'], 'max')]
+
+            elif base_type in self.CHAR_TYPES:
+                # TEXT/NTEXTは文字列関数を使えないため変換してから集計
+                if base_type == 'TEXT':
+                    value = f"CAST({name} AS VARCHAR(MAX))"
+                elif base_type == 'NTEXT':
+                    value = f"CAST({name} AS NVARCHAR(MAX))"
+                else:
+                    value = name
+                expressions += [
+                    f"MAX(DATALENGTH({value}))",
+                    f"AVG(CAST(DATALENGTH({value}) AS FLOAT))"
+                ]
+                keys += [(column['name'], 'max_bytes'), (column['name'], 'avg_bytes')]
+
+                if base_type in self.WIDE_CHAR_TYPES:
+                    # VARCHARへ変換しても文字が失われないかを確認
+                    narrow = f"CAST({value} AS VARCHAR(MAX))"
+                    expressions += [
+                        f"SUM(CASE WHEN CAST({narrow} AS NVARCHAR(MAX)) COLLATE Latin1_General_BIN2 "
+                        f"<> {value} COLLATE Latin1_General_BIN2 THEN 1 ELSE 0 END)",
+                        f"MAX(DATALENGTH({narrow}))",
+                        f"AVG(CAST(DATALENGTH({narrow}) AS FLOAT))"
+                    ]
+                    keys += [
+                        (column['name'], 'lossy'),
+                        (column['name'], 'narrow_max_bytes'),
+                        (column['name'], 'narrow_avg_bytes')
+                    ]
+
+            elif base_type in self.DATETIME_TYPES:
+                expressions += [
+                    f"SUM(CASE WHEN CAST({name} AS TIME) <> '00:00:00' THEN 1 ELSE 0 END)",
+                    f"COUNT({name})"
+                ]
+                keys += [(column['name'], 'with_time'), (column['name'], 'non_null')]
+
+        sample_clause = f" TABLESAMPLE ({sample_rows} ROWS)" if sample_rows else ""
+        cursor.execute(f"SELECT {', '.join(expressions)} FROM [{self.table_name}]{sample_clause}")
+        row = cursor.fetchone()
+
+        stats = {}
+        for (column_name, key), value in zip(keys, row):
+            if column_name:
+                stats.setdefault(column_name, {})[key] = value
+            else:
+                stats[key] = value
+        return stats
+
+    def estimate_row_width(self, columns):
+        """行ヘッダ・NULLビットマップ・可変長オフセットを含む最大行幅を見積もる"""
+        stored = [c for c in columns if not c['is_computed']]
+        variable = [c for c in stored if c['is_variable']]
+        width = 4 + sum(c['size'] for c in stored if not c['is_variable'])
+        width += 2 + (len(stored) + 7) // 8
+        if variable:
+            width += 2 + 2 * len(variable) + sum(c['size'] for c in variable)
+        return width
+
+    def pick_length(self, max_units, headroom):
+        needed = max(1, int(max_units * headroom))
+        for length in DataTypes.LENGTH_BUCKETS:
+            if length >= needed:
+                return length
+        return None
+
+    def suggest(self, column, stats, sampled):
+        """1カラム分の提案を返す（提案がなければNone）
+
+        Returns:
+            {'type': 提案する型, 'saving': 1行あたりの節約バイト数, 'reason': 根拠}
+        """
+        base_type = column['type']
+        headroom = self.SAMPLE_HEADROOM if sampled else 1
+        prefix = "サンプル" if sampled else "全件"
+
+        if base_type in self.INTEGER_TYPES:
+            low, high = stats.get('min'), stats.get('max')
+            if low is None:
+                return None
+            if column['is_identity']:
+                # IDENTITYは今後も増え続けるため常に余裕を持たせる
+                headroom = max(headroom, self.SAMPLE_HEADROOM)
+            for type_name, range_low, range_high in DataTypes.INTEGER_RANGES:
+                if type_name == base_type:
+                    return None
+                if range_low <= min(low, low * headroom) and max(high, high * headroom) <= range_high:
+                    return {
+                        'type': type_name,
+                        'saving': DataTypes.FIXED_SIZES[base_type] - DataTypes.FIXED_SIZES[type_name],
+                        'reason': f"{prefix}の値の範囲: {low} ～ {high}"
+                    }
+            return None
+
+        if base_type in self.CHAR_TYPES:
+            max_bytes = stats.get('max_bytes')
+            if max_bytes is None:
+                return None
+            avg_bytes = stats.get('avg_bytes') or 0
+            is_wide = base_type in self.WIDE_CHAR_TYPES
+            is_fixed = base_type in ('CHAR', 'NCHAR')
+
+            if is_wide and stats.get('lossy') == 0:
+                # Unicode型から非Unicode型へ
+                narrow_type = 'CHAR' if is_fixed else 'VARCHAR'
+                length = self.pick_length(stats.get('narrow_max_bytes') or 0, headroom)
+                if length is None:
+                    return None
+                new_avg = length if is_fixed else (stats.get('narrow_avg_bytes') or 0)
+                return {
+                    'type': f"{narrow_type}({length})",
+                    'saving': max(0, avg_bytes - new_avg),
+                    'reason': f"{prefix}の全値が非Unicodeで表現可能、最大 {stats.get('narrow_max_bytes')} バイト"
+                }
+
+            # 同じ系統のまま長さを縮小
+            unit = 2 if is_wide else 1
+            max_units = max_bytes // unit
+            if base_type in DataTypes.LOB_TYPES or column['max_length'] == -1:
+                current_units = None
+            else:
+                current_units = column['max_length'] // unit
+            length = self.pick_length(max_units, headroom)
+            if length is None or (current_units is not None and length >= current_units):
+                return None
+            if base_type in DataTypes.LOB_TYPES:
+                type_name = 'NVARCHAR' if is_wide else 'VARCHAR'
+                reason = "LOB型を行内格納の可変長型へ"
+                # 行外ページへのポインタ参照がなくなる
+                saving = 16
+            else:
+                type_name = base_type
+                reason = "メモリ許可の見積りが減少"
+                saving = (current_units - length) * unit if is_fixed else 0
+            return {
+                'type': f"{type_name}({length})",
+                'saving': saving,
+                'reason': f"{prefix}の最大長 {max_units}、{reason}"
+            }
+
+        if base_type in self.DATETIME_TYPES:
+            if not stats.get('non_null') or stats.get('with_time') != 0:
+                return None
+            return {
+                'type': 'DATE',
+                'saving': column['size'] - DataTypes.FIXED_SIZES['DATE'],
+                'reason': f"{prefix}の全値で時刻部分が 00:00:00"
+            }
+
+        return None
+
+    def format_saving(self, saving_per_row, row_count):
+        total = saving_per_row * row_count
+        pages = int(total // DataTypes.PAGE_DATA_SIZE)
+        if total >= 1024 * 1024:
+            size = f"{total / (1024 * 1024):.1f} MB"
+        else:
+            size = f"{total / 1024:.1f} KB"
+        return f"{size} / 約{pages:,}ページ"
+
+    def show_results(self, columns, row_count, stats, sampled):
+        self.warning_listbox.delete(0, tk.END)
+        self.suggestion_tree.delete(*self.suggestion_tree.get_children())
+        self.suggestions = {}
+
+        row_width = self.estimate_row_width(columns)
+        self.summary.set(
+            f"行数: {row_count:,}　最大行幅: {row_width:,} バイト"
+            f"　({'TABLESAMPLE' if sampled else '全件'}で集計)"
+        )
+
+        if row_width > DataTypes.MAX_ROW_SIZE:
+            self.warning_listbox.insert(
+                tk.END, f"最大行幅が {DataTypes.MAX_ROW_SIZE:,} バイトを超えます（{row_width:,} バイト）。"
+                        "超過分は行オーバーフローページに格納されます")
+        for column in columns:
+            if column['type'] in DataTypes.LOB_TYPES:
+                self.warning_listbox.insert(
+                    tk.END, f"{column['name']}: {column['type']} は非推奨のLOB型です")
+            elif column['is_variable'] and column['max_length'] == -1:
+                self.warning_listbox.insert(
+                    tk.END, f"{column['name']}: (MAX)型は8,000バイトを超えると行外に格納されます")
+
+        for column in columns:
+            if column['is_computed']:
+                continue
+            suggestion = self.suggest(column, stats.get(column['name'], {}), sampled)
+            if not suggestion:
+                continue
+            item = self.suggestion_tree.insert("", tk.END, values=(
+                column['name'],
+                column['type'],
+                column['size'],
+                suggestion['type'],
+                self.format_saving(suggestion['saving'], row_count),
+                suggestion['reason']
+            ))
+            self.suggestions[item] = (column['name'], suggestion['type'])
+
+    def apply_suggestion(self):
+        selected_item = self.suggestion_tree.selection()
+        if not selected_item:
+            messagebox.showwarning("警告", "適用する提案を選択してください", parent=self.dialog)
+            return
+
+        if self.sql_manager.current_table != self.table_name:
+            messagebox.showerror("エラー", f"選択中のテーブルが '{self.table_name}' ではありません", parent=self.dialog)
+            return
+
+        column_name, data_type = self.suggestions[selected_item[0]]
+        self.sql_manager.edit_column(column_name=column_name, preset_type=data_type)
+        # カラム編集ダイアログを閉じるとグラブが解除されるため、取り直す
+        self.dialog.grab_set()
+        # 変更がセカンダリに反映される前に読まないよう、プライマリで再分析する
+        self.analyze(read_only=False)
+
+class StatisticsDialog:
+    """テーブルの統計情報とヒストグラムを表示し、古い統計だけを更新する"""
+
+    def __init__(self, sql_manager):
+        """
+        Args:
+            sql_manager: SQLTableManagerのインスタンス
+        """
+        self.sql_manager = sql_manager
+        self.table_name = sql_manager.current_table
+
+        self.dialog = tk.Toplevel(sql_manager.root)
+        self.dialog.title(f"統計情報 - {self.table_name}")
+        self.dialog.geometry("950x650")
+        self.dialog.transient(sql_manager.root)
+
+        self.threshold = tk.StringVar(value="20")
+        self.scan_mode = tk.StringVar(value="FULLSCAN")
+        self.sample_percent = tk.StringVar(value="25")
+        self.statistics = {}
+        self.create_widgets()
+        self.load_statistics()
+
+    def create_widgets(self):
+        main_frame = ttk.Frame(self.dialog, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+
+        # 更新条件
+        runner_frame = ttk.LabelFrame(main_frame, text="統計の更新", padding="5")
+        runner_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(runner_frame, text="変更率のしきい値(%):").pack(side=tk.LEFT, padx=5)
+        ttk.Entry(runner_frame, textvariable=self.threshold, width=6).pack(side=tk.LEFT, padx=5)
+        ttk.Radiobutton(runner_frame, text="FULLSCAN", variable=self.scan_mode, value="FULLSCAN").pack(side=tk.LEFT, padx=5)
+        ttk.Radiobutton(runner_frame, text="SAMPLE", variable=self.scan_mode, value="SAMPLE").pack(side=tk.LEFT, padx=5)
+        ttk.Entry(runner_frame, textvariable=self.sample_percent, width=6).pack(side=tk.LEFT)
+        ttk.Label(runner_frame, text="%").pack(side=tk.LEFT)
+        ttk.Button(runner_frame, text="再表示", command=self.load_statistics).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(runner_frame, text="しきい値超過分を更新", command=self.update_stale_statistics).pack(side=tk.RIGHT, padx=5)
+
+        # 統計一覧
+        stats_frame = ttk.LabelFrame(main_frame, text="統計一覧", padding="5")
+        stats_frame.pack(fill=tk.BOTH, expand=True, pady=5)
+        columns = ("統計名", "カラム", "最終更新", "行数", "サンプル行数", "変更数", "変更率")
+        self.stats_tree = ttk.Treeview(stats_frame, columns=columns, show="headings", height=8)
+        for column, width in zip(columns, (200, 160, 150, 90, 90, 90, 70)):
+            self.stats_tree.heading(column, text=column)
+            self.stats_tree.column(column, width=width)
+        self.stats_tree.tag_configure('stale', background='#ffd6d6')
+        self.stats_tree.pack(fill=tk.BOTH, expand=True)
+        self.stats_tree.bind('<<TreeviewSelect>>', self.on_stats_select)
+
+        # ヒストグラム
+        histogram_frame = ttk.LabelFrame(main_frame, text="ヒストグラム", padding="5")
+        histogram_frame.pack(fill=tk.BOTH, expand=True, pady=5)
+        columns = ("ステップ", "上限キー", "範囲内行数", "一致行数", "範囲内個別値", "平均行数")
+        self.histogram_tree = ttk.Treeview(histogram_frame, columns=columns, show="headings", height=8)
+        for column in columns:
+            self.histogram_tree.heading(column, text=column)
+            self.histogram_tree.column(column, width=130)
+        self.histogram_tree.pack(fill=tk.BOTH, expand=True)
+
+    def get_threshold(self):
+        try:
+            return float(self.threshold.get())
+        except ValueError:
+            messagebox.showwarning("警告", "しきい値は数値で入力してください", parent=self.dialog)
+            return None
+
+    def load_statistics(self):
+        threshold = self.get_threshold()
+        if threshold is None:
+            return
+
+        try:
+            rows = self.sql_manager.read_rows("""
+                SELECT
+                    s.stats_id,
+                    s.name,
+                    STUFF((
+                        SELECT ', ' + c.name
+                        FROM sys.stats_columns sc
+                        JOIN sys.columns c ON sc.object_id = c.object_id AND sc.column_id = c.column_id
+                        WHERE sc.object_id = s.object_id AND sc.stats_id = s.stats_id
+                        ORDER BY sc.stats_column_id
+                        FOR XML PATH('')), 1, 2, '') AS columns,
+                    sp.last_updated,
+                    sp.rows,
+                    sp.rows_sampled,
+                    sp.modification_counter
+                FROM sys.stats s
+                OUTER APPLY sys.dm_db_stats_properties(s.object_id, s.stats_id) sp
+                WHERE s.object_id = OBJECT_ID(?)
+                ORDER BY s.name
+            """, self.table_name, read_only=False)
+        except Exception as e:
+            messagebox.showerror("エラー", f"統計情報の取得に失敗しました: {str(e)}", parent=self.dialog)
+            return
+
+        self.stats_tree.delete(*self.stats_tree.get_children())
+        self.histogram_tree.delete(*self.histogram_tree.get_children())
+        self.statistics = {}
+
+        for stats_id, name, columns, last_updated, row_count, rows_sampled, modifications in rows:
+            ratio = self.modification_ratio(row_count, modifications)
+            is_stale = self.is_stale(ratio, threshold)
+            item = self.stats_tree.insert("", tk.END, values=(
+                name,
+                columns or "",
+                last_updated.strftime("%Y-%m-%d %H:%M:%S") if last_updated else "未作成",
+                row_count if row_count is not None else "",
+                rows_sampled if rows_sampled is not None else "",
+                modifications if modifications is not None else "",
+                f"{ratio:.1f}%" if ratio is not None else ""
+            ), tags=('stale',) if is_stale else ())
+            self.statistics[item] = {'stats_id': stats_id, 'name': name, 'ratio': ratio}
+
+    def modification_ratio(self, row_count, modifications):
+        """最終更新後の変更率（%）。統計が一度も作成されていない場合はNone"""
+        if row_count is None or modifications is None:
+            return None
+        if row_count == 0:
+            return 100.0 if modifications else 0.0
+        return modifications * 100.0 / row_count
+
+    def is_stale(self, ratio, threshold):
+        """更新対象とする統計か（強調表示と一括更新で同じ判定を使う）
+
+        一度も作成されていない統計（変更率がNone）も、ヒストグラムを作成するため対象に含める。
+        """
+        return ratio is None or ratio > threshold
+
+    def on_stats_select(self, event):
+        selected_item = self.stats_tree.selection()
+        if not selected_item:
+            return
+
+        stats = self.statistics[selected_item[0]]
+        try:
+            rows = self.sql_manager.read_rows("""
+                SELECT step_number, CAST(range_high_key AS NVARCHAR(4000)), range_rows, equal_rows,
+                       distinct_range_rows, average_range_rows
+                FROM sys.dm_db_stats_histogram(OBJECT_ID(?), ?)
+                ORDER BY step_number
+            """, self.table_name, stats['stats_id'], read_only=False)
+        except Exception as e:
+            messagebox.showerror("エラー", f"ヒストグラムの取得に失敗しました: {str(e)}", parent=self.dialog)
+            return
+
+        self.histogram_tree.delete(*self.histogram_tree.get_children())
+        for row in rows:
+            self.histogram_tree.insert("", tk.END, values=tuple(row))
+
+    def update_stale_statistics(self):
+        threshold = self.get_threshold()
+        if threshold is None:
+            return
+
+        if self.scan_mode.get() == "FULLSCAN":
+            option = "FULLSCAN"
+        else:
+            try:
+                percent = float(self.sample_percent.get())
+            except ValueError:
+                messagebox.showwarning("警告", "サンプル率は数値で入力してください", parent=self.dialog)
+                return
+            if not 0 < percent <= 100:
+                messagebox.showwarning("警告", "サンプル率は0より大きく100以下で入力してください", parent=self.dialog)
+                return
+            option = f"SAMPLE {percent:g} PERCENT"
+
+        targets = [stats['name'] for stats in self.statistics.values()
+                   if self.is_stale(stats['ratio'], threshold)]
+        if not targets:
+            messagebox.showinfo("情報", "しきい値を超える統計はありません", parent=self.dialog)
+            return
+        if not messagebox.askyesno("確認", f"{len(targets)} 件の統計を {option} で更新しますか？", parent=self.dialog):
+            return
+
+        def update():
+            # 大きなテーブルのFULLSCANはクエリタイムアウトを超えるため無制限にする
+            with self.sql_manager.connect_to_server(query_timeout=0) as conn:
+                conn.autocommit = True
+                cursor = conn.cursor()
+                for name in targets:
+                    cursor.execute(f"UPDATE STATISTICS [{self.table_name}] ([{name}]) WITH {option}")
+
+        try:
+            self.sql_manager.governor.run(update)
+        except Exception as e:
+            messagebox.showerror("エラー", f"統計の更新に失敗しました: {str(e)}", parent=self.dialog)
+        else:
+            messagebox.showinfo("成功", f"{len(targets)} 件の統計を更新しました", parent=self.dialog)
+        self.load_statistics()
+
+class QueryConsole:
+    """メインウィンドウのSQLコンソール。クエリを別スレッドで実行し、結果を逐次グリッドに表示する"""
+
+    # fetchmanyで一度に取得する行数
+    FETCH_SIZE = 500
+
+    # グリッドに表示する最大行数
+    MAX_GRID_ROWS = 50000
+
+    # キューを確認する間隔（ミリ秒）
+    POLL_INTERVAL = 50
+
+    # 1回の確認でグリッドに追加する最大行数
+    ROWS_PER_POLL = 1000
+
+    PLAN_MODES = ["なし", "推定プラン", "実際のプラン"]
+    PLAN_COLUMN = "Microsoft SQL Server 2005 XML Showplan"
+    SHOWPLAN_NS = "{http://schemas.microsoft.com/sqlserver/2004/07/showplan}"
+
+    IO_FIELDS = [
+        ('scan_count', "Scan count"),
+        ('logical_reads', "logical reads"),
+        ('physical_reads', "physical reads"),
+        ('read_ahead_reads', "read-ahead reads"),
+        ('lob_logical_reads', "lob logical reads")
+    ]
+
+    def __init__(self, parent, sql_manager):
+        """
+        Args:
+            parent: コンソールを配置する親ウィジェット
+            sql_manager: SQLTableManagerのインスタンス
+        """
+        self.sql_manager = sql_manager
+        self.frame = ttk.Frame(parent)
+
+        self.queue = queue.Queue()
+        self.worker = None
+        self.cursor = None
+        self.cancel_requested = threading.Event()
+        self.pending_rows = []
+        self.plan_mode = tk.StringVar(value=self.PLAN_MODES[0])
+        self.collect_io = tk.BooleanVar(value=False)
+        self.read_only = tk.BooleanVar(value=False)
+        self.status = tk.StringVar(value="")
+        self.result_trees = []
+        self.create_widgets()
+
+    def create_widgets(self):
+        # ツールバー
+        toolbar = ttk.Frame(self.frame)
+        toolbar.pack(fill=tk.X, pady=2)
+        self.run_button = ttk.Button(toolbar, text="実行 (F5)", command=self.execute)
+        self.run_button.pack(side=tk.LEFT, padx=2)
+        self.cancel_button = ttk.Button(toolbar, text="キャンセル", command=self.cancel, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=2)
+        ttk.Label(toolbar, text="プラン:").pack(side=tk.LEFT, padx=(10, 2))
+        ttk.Combobox(toolbar, textvariable=self.plan_mode, values=self.PLAN_MODES,
+                     state="readonly", width=12).pack(side=tk.LEFT)
+        ttk.Checkbutton(toolbar, text="STATISTICS IO/TIME", variable=self.collect_io).pack(side=tk.LEFT, padx=10)
+        ttk.Checkbutton(toolbar, text="読み取り専用接続", variable=self.read_only).pack(side=tk.LEFT)
+        ttk.Label(toolbar, textvariable=self.status).pack(side=tk.RIGHT, padx=5)
+
+        paned = ttk.PanedWindow(self.frame, orient=tk.VERTICAL)
+        paned.pack(fill=tk.BOTH, expand=True)
+
+        # クエリエディタ
+        self.editor = tk.Text(paned, height=10, undo=True, wrap=tk.NONE)
+        self.editor.bind('<F5>', lambda event: self.execute() or "break")
+        paned.add(self.editor, weight=1)
+
+        # 結果表示
+        self.output_notebook = ttk.Notebook(paned)
+        paned.add(self.output_notebook, weight=3)
+
+        self.message_text = tk.Text(self.output_notebook, height=8, state=tk.DISABLED)
+        self.output_notebook.add(self.message_text, text="メッセージ")
+
+        self.plan_tree = self.create_tree(
+            self.output_notebook, ("演算子", "オブジェクト", "自コスト", "比率", "推定行数", "実際の行数"))
+        self.output_notebook.add(self.plan_tree.master, text="プラン")
+
+        self.io_tree = self.create_tree(
+            self.output_notebook, ("オブジェクト", "スキャン数", "論理読み取り", "物理読み取り", "先読み", "LOB論理読み取り"))
+        self.output_notebook.add(self.io_tree.master, text="IO統計")
+
+    def create_tree(self, parent, columns):
+        """スクロールバー付きのTreeviewを作成（Treeview.masterが外枠）"""
+        container = ttk.Frame(parent)
+        tree = ttk.Treeview(container, columns=columns, show="headings")
+        for column in columns:
+            tree.heading(column, text=column)
+            tree.column(column, width=120, stretch=False)
+        y_scroll = ttk.Scrollbar(container, orient=tk.VERTICAL, command=tree.yview)
+        x_scroll = ttk.Scrollbar(container, orient=tk.HORIZONTAL, command=tree.xview)
+        tree.configure(yscrollcommand=y_scroll.set, xscrollcommand=x_scroll.set)
+        y_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        x_scroll.pack(side=tk.BOTTOM, fill=tk.X)
+        tree.pack(fill=tk.BOTH, expand=True)
+        return tree
+
+    def execute(self):
+        if self.worker and self.worker.is_alive():
+            return
+
+        sql = self.editor.get("sel.first", "sel.last") if self.editor.tag_ranges("sel") else self.editor.get("1.0", tk.END)
+        if not sql.strip():
+            return
+
+        self.clear_output()
+        self.cancel_requested.clear()
+        self.run_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
+
+        self.started_at = time.perf_counter()
+        self.row_count = 0
+        self.worker = threading.Thread(
+            target=self.run_query,
+            args=(sql, self.plan_mode.get(), self.collect_io.get(), self.read_only.get()),
+            daemon=True)
+        self.worker.start()
+        self.poll_queue()
+
+    def cancel(self):
+        self.cancel_requested.set()
+        cursor = self.cursor
+        if cursor is not None:
+            try:
+                cursor.cancel()
+            except Exception:
+                pass
+
+    def clear_output(self):
+        for tree in self.result_trees:
+            self.output_notebook.forget(tree.master)
+            tree.master.destroy()
+        self.result_trees = []
+        self.current_tree = None
+        self.pending_rows = []
+        self.message_text.config(state=tk.NORMAL)
+        self.message_text.delete("1.0", tk.END)
+        self.message_text.config(state=tk.DISABLED)
+        self.plan_tree.delete(*self.plan_tree.get_children())
+        self.io_tree.delete(*self.io_tree.get_children())
+        self.io_totals = {}
+        self.cpu_time = 0
+
+    def run_query(self, sql, plan_mode, collect_io, read_only):
+        """ワーカースレッドで実行。UIへの反映はすべてキュー経由で行う"""
+        try:
+            # 任意のクエリは再試行できないが、通信断などのエラーは回路の状態に反映する
+            self.sql_manager.governor.run(lambda: self.execute_query(sql, plan_mode, collect_io, read_only))
+        except Exception as e:
+            if self.cancel_requested.is_set():
+                self.queue.put(('message', "クエリはキャンセルされました"))
+            else:
+                self.queue.put(('error', str(e)))
+        finally:
+            self.cursor = None
+            self.queue.put(('done', None))
+
+    def execute_query(self, sql, plan_mode, collect_io, read_only):
+        # 任意のクエリはキャンセルで止められるため、クエリタイムアウトは設けない
+        with self.sql_manager.connect_to_server(query_timeout=0, read_only=read_only) as conn:
+            conn.autocommit = True
+            cursor = conn.cursor()
+            self.cursor = cursor
+
+            if collect_io:
+                cursor.execute("SET STATISTICS IO ON; SET STATISTICS TIME ON")
+            # SHOWPLAN_XMLは単独のバッチで設定する必要がある
+            if plan_mode == self.PLAN_MODES[1]:
+                cursor.execute("SET SHOWPLAN_XML ON")
+            elif plan_mode == self.PLAN_MODES[2]:
+                cursor.execute("SET STATISTICS XML ON")
+
+            cursor.execute(sql)
+            while True:
+                self.queue_messages(cursor)
+                if cursor.description:
+                    self.stream_result(cursor)
+                elif cursor.rowcount >= 0:
+                    self.queue.put(('message', f"({cursor.rowcount} 行処理されました)"))
+                if self.cancel_requested.is_set() or not cursor.nextset():
+                    break
+            self.queue_messages(cursor)
+
+    def stream_result(self, cursor):
+        columns = [description[0] for description in cursor.description]
+        if columns == [self.PLAN_COLUMN]:
+            self.queue.put(('plan', "".join(row[0] for row in cursor.fetchall())))
+            return
+
+        self.queue.put(('columns', columns))
+        fetched = 0
+        while not self.cancel_requested.is_set():
+            rows = cursor.fetchmany(self.FETCH_SIZE)
+            if not rows:
+                break
+            fetched += len(rows)
+            if fetched > self.MAX_GRID_ROWS:
+                self.queue.put(('message', f"表示上限の {self.MAX_GRID_ROWS:,} 行を超えたため、以降の行は表示しません"))
+                # 残りの行は読み捨てて次の結果セットへ進む
+                while cursor.fetchmany(self.FETCH_SIZE):
+                    pass
+                break
+            self.queue.put(('rows', [tuple("NULL" if value is None else value for value in row) for row in rows]))
+
+    def queue_messages(self, cursor):
+        for _, text in getattr(cursor, 'messages', None) or []:
+            self.queue.put(('message', re.sub(r'^(\[[^\]]*\])+', '', text)))
+
+    def poll_queue(self):
+        # 1回の呼び出しで追加する行数を制限してUIを固まらせない（残りは次回に回す）
+        budget = self.ROWS_PER_POLL
+        while budget > 0:
+            if self.pending_rows:
+                kind, payload = 'rows', self.pending_rows
+            else:
+                try:
+                    kind, payload = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if kind == 'columns':
+                self.add_result_tree(payload)
+            elif kind == 'rows':
+                for row in payload[:budget]:
+                    self.current_tree.insert("", tk.END, values=row)
+                inserted = min(len(payload), budget)
+                self.row_count += inserted
+                self.pending_rows = payload[inserted:]
+                budget -= inserted
+                continue
+            elif kind == 'message':
+                self.append_message(payload)
+            elif kind == 'error':
+                self.append_message(f"エラー: {payload}")
+                self.output_notebook.select(self.message_text)
+            elif kind == 'plan':
+                self.show_plan_summary(payload)
+            elif kind == 'done':
+                self.finish()
+                return
+            budget -= 1
+
+        self.update_status("実行中")
+        self.frame.after(self.POLL_INTERVAL, self.poll_queue)
+
+    def finish(self):
+        self.run_button.config(state=tk.NORMAL)
+        self.cancel_button.config(state=tk.DISABLED)
+        self.update_status("完了")
+
+    def update_status(self, state):
+        elapsed = time.perf_counter() - self.started_at
+        status = f"{state}　{elapsed:.2f} 秒　{self.row_count:,} 行"
+        if self.cpu_time:
+            status += f"　CPU {self.cpu_time:,} ms"
+        self.status.set(status)
+
+    def add_result_tree(self, columns):
+        tree = self.create_tree(self.output_notebook, columns)
+        self.output_notebook.insert(len(self.result_trees), tree.master, text=f"結果 {len(self.result_trees) + 1}")
+        if not self.result_trees:
+            self.output_notebook.select(tree.master)
+        self.result_trees.append(tree)
+        self.current_tree = tree
+
+    def append_message(self, text):
+        self.message_text.config(state=tk.NORMAL)
+        self.message_text.insert(tk.END, text + "\n")
+        self.message_text.config(state=tk.DISABLED)
+        self.parse_statistics_message(text)
+
+    def parse_statistics_message(self, text):
+        """STATISTICS IO/TIMEの出力を集計してIO統計タブに反映"""
+        time_match = re.search(r"CPU time = (\d+) ms", text)
+        if time_match and "Execution Times" in text:
+            self.cpu_time += int(time_match.group(1))
+
+        table_match = re.match(r"\s*Table '([^']+)'\. Scan count", text)
+        if not table_match:
+            return
+
+        table = table_match.group(1)
+        totals = self.io_totals.setdefault(table, dict.fromkeys([key for key, _ in self.IO_FIELDS], 0))
+        for key, label in self.IO_FIELDS:
+            match = re.search(rf"(?<![\w-]){re.escape(label)} (\d+)", text)
+            if match:
+                totals[key] += int(match.group(1))
+
+        self.io_tree.delete(*self.io_tree.get_children())
+        ordered = sorted(self.io_totals.items(), key=lambda item: item[1]['logical_reads'], reverse=True)
+        for name, values in ordered:
+            self.io_tree.insert("", tk.END, values=(name, *[values[key] for key, _ in self.IO_FIELDS]))
+
+    def show_plan_summary(self, plan_xml):
+        """プランXMLから演算子ごとの自コストを求め、コストの高い順に表示"""
+        import xml.etree.ElementTree as ET
+
+        try:
+            root = ET.fromstring(plan_xml)
+        except ET.ParseError as e:
+            self.append_message(f"プランの解析に失敗しました: {str(e)}")
+            return
+
+        relop_tag = f"{self.SHOWPLAN_NS}RelOp"
+
+        def child_relops(element):
+            for child in element:
+                if child.tag == relop_tag:
+                    yield child
+                else:
+                    yield from child_relops(child)
+
+        operators = []
+        total_cost = 0.0
+        for statement in root.iter(f"{self.SHOWPLAN_NS}StmtSimple"):
+            total_cost += float(statement.get('StatementSubTreeCost', 0))
+        for relop in root.iter(relop_tag):
+            subtree_cost = float(relop.get('EstimatedTotalSubtreeCost', 0))
+            own_cost = subtree_cost - sum(
+                float(child.get('EstimatedTotalSubtreeCost', 0)) for child in child_relops(relop))
+
+            target = None
+            for child in relop:
+                target = child.find(f"{self.SHOWPLAN_NS}Object")
+                if target is not None:
+                    break
+            object_name = ""
+            if target is not None:
+                object_name = ".".join(part.strip("[]") for part in (
+                    target.get('Table', ''), target.get('Index', '')) if part)
+
+            actual_rows = ""
+            counters = relop.findall(f"{self.SHOWPLAN_NS}RunTimeInformation/{self.SHOWPLAN_NS}RunTimeCountersPerThread")
+            if counters:
+                actual_rows = sum(int(counter.get('ActualRows', 0)) for counter in counters)
+
+            operators.append((
+                relop.get('PhysicalOp', ''),
+                object_name,
+                max(own_cost, 0.0),
+                relop.get('EstimateRows', ''),
+                actual_rows
+            ))
+
+        operators.sort(key=lambda operator: operator[2], reverse=True)
+        for physical_op, object_name, own_cost, estimate_rows, actual_rows in operators[:20]:
+            ratio = own_cost * 100 / total_cost if total_cost else 0
+            self.plan_tree.insert("", tk.END, values=(
+                physical_op, object_name, f"{own_cost:.4f}", f"{ratio:.1f}%", estimate_rows, actual_rows))
+
+class SyntheticDataGenerator:
+    """カラムのメタデータと列ごとの生成設定から、テストデータを列単位でまとめて生成する
+
+    値は列ごとにバッチ全体をまとめて生成してから行に組み替える。
+    バッチの開始位置から乱数の種を決めるため、並列に生成しても結果は再現できる。
+    """
+
+    BASE_DATETIME = datetime.datetime(2020, 1, 1)
+
+    DISTRIBUTIONS = ["連番", "一様", "正規", "偏り"]
+
+    INTEGER_TYPES = ['TINYINT', 'SMALLINT', 'INT', 'BIGINT']
+    DECIMAL_TYPES = ['DECIMAL', 'NUMERIC', 'MONEY', 'SMALLMONEY']
+    FLOAT_TYPES = ['FLOAT', 'REAL']
+    DATETIME_TYPES = ['DATETIME', 'DATETIME2', 'SMALLDATETIME', 'DATETIMEOFFSET']
+    CHAR_TYPES = ['CHAR', 'VARCHAR', 'TEXT', 'NCHAR', 'NVARCHAR', 'NTEXT']
+    BINARY_TYPES = ['BINARY', 'VARBINARY', 'IMAGE']
+    SUPPORTED_TYPES = (INTEGER_TYPES + DECIMAL_TYPES + FLOAT_TYPES + DATETIME_TYPES + CHAR_TYPES
+                       + BINARY_TYPES + ['BIT', 'DATE', 'TIME', 'UNIQUEIDENTIFIER'])
+
+    # 値の既定の範囲（日付は基準日からの日数、日時は秒数）
+    DEFAULT_RANGES = {
+        'TINYINT': (0, 255), 'SMALLINT': (1, 32767),
+        'INT': (1, 1000000), 'BIGINT': (1, 1000000000),
+        'BIT': (0, 1), 'MONEY': (0, 100000), 'SMALLMONEY': (0, 100000),
+        'FLOAT': (0, 1000000), 'REAL': (0, 1000000),
+        'DATE': (0, 3650), 'TIME': (0, 86399),
+        'UNIQUEIDENTIFIER': (0, 2 ** 63)
+    }
+
+    # 既存データの最大値から連番を続けられる型（順序に意味がない型とLOB型は除く）
+    RESUMABLE_TYPES = (INTEGER_TYPES + DECIMAL_TYPES + ['CHAR', 'VARCHAR', 'NCHAR', 'NVARCHAR', 'BINARY', 'VARBINARY',
+                                                        'DATE', 'DATETIME', 'DATETIME2', 'SMALLDATETIME'])
+
+    def __init__(self, columns, seed=0):
+        """
+        Args:
+            columns: DataGeneratorDialog.load_columns() の結果のうち、INSERT対象のカラム
+            seed: 乱数の種
+        """
+        self.columns = columns
+        self.seed = seed
+
+    @classmethod
+    def default_settings(cls, column):
+        """カラムの型と制約から既定の生成設定を決める"""
+        base_type = column['type']
+        if base_type in cls.DEFAULT_RANGES:
+            low, high = cls.DEFAULT_RANGES[base_type]
+        elif base_type in cls.DECIMAL_TYPES:
+            low, high = 0, min(10 ** max(column['precision'] - column['scale'], 1) - 1, 1000000)
+        elif base_type in cls.DATETIME_TYPES:
+            low, high = 0, 3650 * 86400
+        else:
+            low, high = 0, 1000000
+
+        return {
+            'distribution': "連番" if column['is_unique'] and not column['ref_table'] else "一様",
+            'cardinality': 0,
+            'null_ratio': 0.1 if column['is_nullable'] and not column['is_unique'] else 0.0,
+            'skew': 2.0,
+            'min': low,
+            'max': high
+        }
+
+    @classmethod
+    def key_range(cls, column):
+        """連番の元の値として型に収まる範囲（制限しない型はNone）"""
+        base_type = column['type']
+        if base_type == 'BIT':
+            return 0, 1
+        for type_name, range_low, range_high in DataTypes.INTEGER_RANGES:
+            if type_name == base_type:
+                return range_low, range_high
+        if base_type == 'MONEY':
+            return -922337203685477, 922337203685477
+        if base_type == 'SMALLMONEY':
+            return -214748, 214748
+        if base_type in cls.DECIMAL_TYPES:
+            limit = 10 ** (column['precision'] - column['scale']) - 1
+            return -limit, limit
+        if base_type in cls.BINARY_TYPES:
+            return 0, 256 ** min(cls.value_length(column), 16) - 1
+        if base_type in cls.CHAR_TYPES:
+            # 「カラム名_」を付けられない長さでも数値だけなら一意になる
+            return 0, 10 ** cls.value_length(column) - 1
+        return None
+
+    @classmethod
+    def sequence_error(cls, column, total):
+        """total行を生成したときに値が型に収まらない、または一意にならない場合は理由を返す
+
+        Args:
+            column: 生成設定を含むカラム情報
+            total: 生成する行数
+
+        Returns:
+            問題がなければNone、あればエラーメッセージ
+        """
+        settings = column['settings']
+        if settings['distribution'] != "連番":
+            if column['is_unique']:
+                return f"{column['name']}: 一意制約があるため分布には連番を指定してください"
+            return None
+        if column['ref_table']:
+            return None
+        # 文字列とバイナリは一意でなければ切り詰めて構わない
+        if not column['is_unique'] and (column['type'] in cls.CHAR_TYPES or column['type'] in cls.BINARY_TYPES):
+            return None
+
+        key_range = cls.key_range(column)
+        if key_range is None:
+            return None
+        low, high = settings['min'], settings['min'] + total - 1
+        if low < key_range[0] or high > key_range[1]:
+            return (f"{column['name']}: 連番 {low:,} ～ {high:,} が {column['type']} で表せる範囲 "
+                    f"{key_range[0]:,} ～ {key_range[1]:,} に収まりません")
+        return None
+
+    @classmethod
+    def key_from_value(cls, column, value):
+        """既存の値を連番の元の値に戻す（値がない場合はNone）"""
+        if value is None:
+            return None
+        base_type = column['type']
+        if base_type == 'DATE':
+            return (value - cls.BASE_DATETIME.date()).days
+        if base_type in cls.DATETIME_TYPES:
+            return int((value - cls.BASE_DATETIME).total_seconds())
+        if base_type in cls.BINARY_TYPES:
+            return int.from_bytes(value, 'big')
+        return int(value)
+
+    def generate_batch(self, start, count):
+        """start行目からcount行分の値をタプルのリストで返す"""
+        rng = random.Random(self.seed * 1000003 + start)
+        values = [self.generate_column(column, rng, start, count) for column in self.columns]
+        return list(zip(*values))
+
+    def generate_column(self, column, rng, start, count):
+        settings = column['settings']
+        pool = column.get('parent_keys')
+
+        if pool is not None:
+            # 外部キーは既存の親キーから選ぶ
+            if not pool:
+                if column['is_nullable']:
+                    return [None] * count
+                raise ValueError(f"{column['name']}: 参照先 {column['ref_table']} にデータがありません")
+            values = [pool[index] for index in self.generate_indexes(settings, rng, start, count, len(pool))]
+        else:
+            values = self.convert(column, self.generate_keys(settings, rng, start, count), rng)
+
+        null_ratio = settings['null_ratio'] if column['is_nullable'] else 0
+        if null_ratio > 0:
+            values = [None if rng.random() < null_ratio else value for value in values]
+        return values
+
+    def generate_indexes(self, settings, rng, start, count, size):
+        """0 ～ size-1 の位置を分布に従って生成"""
+        distribution = settings['distribution']
+        if distribution == "連番":
+            return [(start + i) % size for i in range(count)]
+        if distribution == "正規":
+            center, sigma = (size - 1) / 2, max(size / 6, 1)
+            return [min(max(int(rng.gauss(center, sigma)), 0), size - 1) for _ in range(count)]
+        if distribution == "偏り":
+            # 乱数をべき乗して先頭側に偏らせる（skewが大きいほど偏る）
+            skew = settings['skew']
+            return [min(int(size * rng.random() ** skew), size - 1) for _ in range(count)]
+        return [rng.randrange(size) for _ in range(count)]
+
+    def generate_keys(self, settings, rng, start, count):
+        """値の元になる数値を生成（型への変換はconvertで行う）"""
+        low, high = settings['min'], settings['max']
+        if settings['distribution'] == "連番":
+            return [low + start + i for i in range(count)]
+
+        cardinality = settings['cardinality']
+        if cardinality:
+            # 個別値の数を制限する場合は範囲内のcardinality個の値から選ぶ
+            step = (high - low) / max(cardinality - 1, 1)
+            return [low + index * step for index in self.generate_indexes(settings, rng, start, count, cardinality)]
+
+        distribution = settings['distribution']
+        if distribution == "正規":
+            center, sigma = (low + high) / 2, max((high - low) / 6, 1)
+            return [min(max(rng.gauss(center, sigma), low), high) for _ in range(count)]
+        if distribution == "偏り":
+            skew = settings['skew']
+            return [low + (high - low) * rng.random() ** skew for _ in range(count)]
+        return [rng.uniform(low, high) for _ in range(count)]
+
+    def convert(self, column, keys, rng):
+        base_type = column['type']
+
+        if base_type in self.INTEGER_TYPES or base_type == 'BIT':
+            return [int(round(key)) for key in keys]
+
+        if base_type in self.DECIMAL_TYPES:
+            scale = 4 if base_type in ('MONEY', 'SMALLMONEY') else column['scale']
+            quantum = Decimal(1).scaleb(-scale)
+            return [Decimal(key).quantize(quantum) for key in keys]
+
+        if base_type in self.FLOAT_TYPES:
+            return [float(key) for key in keys]
+
+        if base_type == 'DATE':
+            base_date = self.BASE_DATETIME.date()
+            return [base_date + datetime.timedelta(days=int(key)) for key in keys]
+
+        if base_type == 'TIME':
+            return [datetime.time(int(key) // 3600 % 24, int(key) // 60 % 60, int(key) % 60) for key in keys]
+
+        if base_type in self.DATETIME_TYPES:
+            values = [self.BASE_DATETIME + datetime.timedelta(seconds=int(key)) for key in keys]
+            if base_type == 'DATETIMEOFFSET':
+                return [value.strftime("%Y-%m-%d %H:%M:%S +00:00") for value in values]
+            return values
+
+        if base_type == 'UNIQUEIDENTIFIER':
+            # 同じ元の値からは同じGUIDになるよう、種と混ぜてから128ビットに広げる
+            return [str(uuid.UUID(int=(int(key) * 0x9E3779B97F4A7C15 + self.seed) % 2 ** 128)) for key in keys]
+
+        length = self.value_length(column)
+        if base_type in self.BINARY_TYPES:
+            size = min(length, 16)
+            return [(int(key) % 256 ** size).to_bytes(size, 'big') for key in keys]
+
+        prefix = f"{column['name']}_"
+        values = []
+        for key in keys:
+            text = f"{prefix}{int(key)}"
+            # 長さが足りない場合は一意性を保つため数値側を残す
+            values.append(text if len(text) <= length else str(int(key))[-length:])
+        return values
+
+    @staticmethod
+    def value_length(column):
+        """文字列・バイナリ型の最大長（文字数またはバイト数）"""
+        if column['max_length'] == -1 or column['type'] in ('TEXT', 'NTEXT', 'IMAGE'):
+            return 64
+        if column['type'] in ('NCHAR', 'NVARCHAR'):
+            return column['max_length'] // 2
+        return column['max_length']
+
+class DataGeneratorDialog:
+    """カラムのメタデータに基づいてテストデータを生成し、並列にバルク挿入する"""
+
+    # キューを確認する間隔（ミリ秒）
+    POLL_INTERVAL = 200
+
+    # 外部キーの親キーを取得する最大件数
+    PARENT_KEY_LIMIT = 100000
+
+    def __init__(self, sql_manager):
+        """
+        Args:
+            sql_manager: SQLTableManagerのインスタンス
+        """
+        self.sql_manager = sql_manager
+        self.table_name = sql_manager.current_table
+
+        self.dialog = tk.Toplevel(sql_manager.root)
+        self.dialog.title(f"テストデータ生成 - {self.table_name}")
+        self.dialog.geometry("950x600")
+        self.dialog.transient(sql_manager.root)
+
+        self.row_count = tk.StringVar(value="100000")
+        self.batch_size = tk.StringVar(value="5000")
+        self.workers = tk.StringVar(value="4")
+        self.progress_text = tk.StringVar()
+        self.distribution = tk.StringVar()
+        self.cardinality = tk.StringVar()
+        self.null_ratio = tk.StringVar()
+        self.skew = tk.StringVar()
+        self.min_value = tk.StringVar()
+        self.max_value = tk.StringVar()
+
+        self.queue = queue.Queue()
+        self.stop_event = threading.Event()
+        self.worker = None
+        self.poll_id = None
+        self.closing = False
+        self.columns = []
+        self.create_widgets()
+        self.load_columns()
+        self.dialog.protocol("WM_DELETE_WINDOW", self.close)
+
+    def create_widgets(self):
+        main_frame = ttk.Frame(self.dialog, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+
+        # 生成条件
+        option_frame = ttk.Frame(main_frame)
+        option_frame.pack(fill=tk.X, pady=5)
+        for text, variable in (("行数:", self.row_count), ("バッチサイズ:", self.batch_size), ("並列数:", self.workers)):
+            ttk.Label(option_frame, text=text).pack(side=tk.LEFT, padx=5)
+            ttk.Entry(option_frame, textvariable=variable, width=10).pack(side=tk.LEFT)
+
+        # カラムごとの設定一覧
+        columns = ("カラム", "型", "分布", "個別値数", "NULL率", "偏り", "最小", "最大", "参照")
+        self.column_tree = ttk.Treeview(main_frame, columns=columns, show="headings", height=12)
+        for column, width in zip(columns, (130, 110, 60, 70, 60, 50, 110, 110, 160)):
+            self.column_tree.heading(column, text=column)
+            self.column_tree.column(column, width=width)
+        self.column_tree.pack(fill=tk.BOTH, expand=True, pady=5)
+        self.column_tree.bind('<<TreeviewSelect>>', self.on_column_select)
+
+        # 選択したカラムの設定
+        edit_frame = ttk.LabelFrame(main_frame, text="カラムの生成設定", padding="5")
+        edit_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(edit_frame, text="分布:").pack(side=tk.LEFT, padx=2)
+        ttk.Combobox(edit_frame, textvariable=self.distribution, values=SyntheticDataGenerator.DISTRIBUTIONS,
+                     state="readonly", width=6).pack(side=tk.LEFT)
+        for text, variable in (("個別値数(0で無制限):", self.cardinality), ("NULL率:", self.null_ratio),
+                               ("偏り:", self.skew), ("最小:", self.min_value), ("最大:", self.max_value)):
+            ttk.Label(edit_frame, text=text).pack(side=tk.LEFT, padx=2)
+            ttk.Entry(edit_frame, textvariable=variable, width=9).pack(side=tk.LEFT)
+        ttk.Button(edit_frame, text="反映", command=self.apply_settings).pack(side=tk.LEFT, padx=5)
+
+        # 進捗
+        self.progress_bar = ttk.Progressbar(main_frame, mode='determinate')
+        self.progress_bar.pack(fill=tk.X, pady=5)
+        ttk.Label(main_frame, textvariable=self.progress_text).pack(anchor='w')
+
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(pady=5)
+        self.start_button = ttk.Button(button_frame, text="生成開始", command=self.start)
+        self.start_button.pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="停止", command=self.stop_event.set).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="閉じる", command=self.close).pack(side=tk.LEFT, padx=5)
+
+    def load_columns(self):
+        try:
+            rows = self.sql_manager.read_rows("""
+                SELECT
+                    c.name, t.name, c.max_length, c.precision, c.scale,
+                    c.is_nullable, c.is_identity, c.is_computed, CASE WHEN c.default_object_id <> 0 THEN 1 ELSE 0 END,
+                    OBJECT_NAME(fk.referenced_object_id), rc.name,
+                    CASE WHEN EXISTS (
+                        SELECT 1 FROM sys.index_columns ic
+                        JOIN sys.indexes i ON ic.object_id = i.object_id AND ic.index_id = i.index_id
+                        WHERE ic.object_id = c.object_id AND ic.column_id = c.column_id
+                        AND i.is_unique = 1
+                    ) THEN 1 ELSE 0 END
+                FROM sys.columns c
+                JOIN sys.types t ON c.system_type_id = t.user_type_id
+                -- 複数の外部キーに含まれるカラムでも1行にする
+                OUTER APPLY (
+                    SELECT TOP 1 fkc.referenced_object_id, fkc.referenced_column_id
+                    FROM sys.foreign_key_columns fkc
+                    WHERE fkc.parent_object_id = c.object_id AND fkc.parent_column_id = c.column_id
+                    ORDER BY fkc.constraint_object_id
+                ) fk
+                LEFT JOIN sys.columns rc
+                    ON rc.object_id = fk.referenced_object_id AND rc.column_id = fk.referenced_column_id
+                WHERE c.object_id = OBJECT_ID(?)
+                ORDER BY c.column_id
+            """, self.table_name, read_only=False)
+        except Exception as e:
+            messagebox.showerror("エラー", f"カラム情報の取得に失敗しました: {str(e)}", parent=self.dialog)
+            return
+
+        self.columns = []
+        self.column_tree.delete(*self.column_tree.get_children())
+        for (name, type_name, max_length, precision, scale, is_nullable, is_identity, is_computed, has_default,
+             ref_table, ref_column, is_unique) in rows:
+            # IDENTITY・計算列・rowversionはサーバー側で値が決まる
+            server_generated = is_identity or is_computed or type_name.upper() == 'TIMESTAMP'
+            column = {
+                'name': name,
+                'type': type_name.upper(),
+                'max_length': max_length,
+                'precision': precision,
+                'scale': scale,
+                'is_nullable': bool(is_nullable),
+                'is_unique': bool(is_unique),
+                'ref_table': ref_table,
+                'ref_column': ref_column,
+                'insertable': not server_generated and type_name.upper() in SyntheticDataGenerator.SUPPORTED_TYPES
+            }
+            column['settings'] = SyntheticDataGenerator.default_settings(column)
+            # 対応していない型でも、NULLか既定値で埋まるカラムは省略して挿入できる
+            if not column['insertable'] and not server_generated and not is_nullable and not has_default:
+                column['unsupported'] = True
+            column['item'] = self.column_tree.insert("", tk.END)
+            self.columns.append(column)
+            self.update_row(column)
+
+    def update_row(self, column):
+        settings = column['settings']
+        if column['insertable']:
+            values = (settings['distribution'], settings['cardinality'] or "無制限", settings['null_ratio'],
+                      settings['skew'], settings['min'], settings['max'])
+        else:
+            label = "未対応" if column.get('unsupported') else "自動"
+            values = (label, "", "", "", "", "")
+        reference = f"{column['ref_table']}.{column['ref_column']}" if column['ref_table'] else ""
+        self.column_tree.item(column['item'], values=(column['name'], column['type'], *values, reference))
+
+    def selected_column(self):
+        selected_item = self.column_tree.selection()
+        if not selected_item:
+            return None
+        for column in self.columns:
+            if column['item'] == selected_item[0]:
+                return column
+        return None
+
+    def on_column_select(self, event):
+        column = self.selected_column()
+        if not column:
+            return
+        settings = column['settings']
+        self.distribution.set(settings['distribution'])
+        self.cardinality.set(str(settings['cardinality']))
+        self.null_ratio.set(str(settings['null_ratio']))
+        self.skew.set(str(settings['skew']))
+        self.min_value.set(str(settings['min']))
+        self.max_value.set(str(settings['max']))
+
+    def apply_settings(self):
+        column = self.selected_column()
+        if not column or not column['insertable']:
+            return
+        try:
+            settings = {
+                'distribution': self.distribution.get(),
+                'cardinality': int(self.cardinality.get() or 0),
+                'null_ratio': float(self.null_ratio.get() or 0),
+                'skew': float(self.skew.get() or 1),
+                'min': float(self.min_value.get()),
+                'max': float(self.max_value.get())
+            }
+        except ValueError:
+            messagebox.showwarning("警告", "生成設定は数値で入力してください", parent=self.dialog)
+            return
+        if settings['min'] > settings['max'] or not 0 <= settings['null_ratio'] <= 1:
+            messagebox.showwarning("警告", "最小は最大以下、NULL率は0～1で入力してください", parent=self.dialog)
+            return
+        if column['is_unique'] and settings['null_ratio'] > 0:
+            # 一意インデックスではNULLも1行しか入れられない
+            messagebox.showwarning("警告", "一意制約のあるカラムのNULL率は0にしてください", parent=self.dialog)
+            return
+        column['settings'] = settings
+        self.update_row(column)
+
+    def start(self):
+        if self.worker and self.worker.is_alive():
+            return
+        try:
+            total = int(self.row_count.get())
+            batch_size = int(self.batch_size.get())
+            workers = int(self.workers.get())
+        except ValueError:
+            messagebox.showwarning("警告", "行数、バッチサイズ、並列数は整数で入力してください", parent=self.dialog)
+            return
+        if min(total, batch_size, workers) <= 0:
+            messagebox.showwarning("警告", "行数、バッチサイズ、並列数は1以上で入力してください", parent=self.dialog)
+            return
+
+        unsupported = [column['name'] for column in self.columns if column.get('unsupported')]
+        if unsupported:
+            messagebox.showerror("エラー", f"値を生成できない NOT NULL カラムがあります: {', '.join(unsupported)}",
+                                 parent=self.dialog)
+            return
+
+        # 連番の開始位置を書き換えるため、設定も複製しておく
+        columns = [dict(column, settings=dict(column['settings'])) for column in self.columns if column['insertable']]
+        try:
+            self.continue_sequences(columns)
+        except Exception as e:
+            messagebox.showerror("エラー", f"既存データの最大値の取得に失敗しました: {str(e)}", parent=self.dialog)
+            return
+        errors = [error for error in (SyntheticDataGenerator.sequence_error(column, total) for column in columns)
+                  if error]
+        if errors:
+            messagebox.showerror("エラー", "一意な値を生成できないカラムがあります:\n" + "\n".join(errors),
+                                 parent=self.dialog)
+            return
+
+        self.stop_event.clear()
+        self.total = total
+        self.inserted = 0
+        self.started_at = time.perf_counter()
+        self.progress_bar.config(maximum=total, value=0)
+        self.start_button.config(state=tk.DISABLED)
+        self.worker = threading.Thread(target=self.run_generation,
+                                       args=(columns, total, batch_size, workers), daemon=True)
+        self.worker.start()
+        self.poll_queue()
+
+    def continue_sequences(self, columns):
+        """一意制約のある連番のカラムは、既存データの最大値の次から連番を始める"""
+        targets = [column for column in columns
+                   if column['is_unique'] and not column['ref_table'] and column['settings']['distribution'] == "連番"
+                   and column['type'] in SyntheticDataGenerator.RESUMABLE_TYPES]
+        if not targets:
+            return
+
+        expressions = []
+        params = []
+        for column in targets:
+            name = f"[{column['name']}]"
+            if column['type'] in SyntheticDataGenerator.CHAR_TYPES:
+                # 生成した文字列は「カラム名_数値」または数値のみ
+                prefix = f"{column['name']}_"
+                expressions.append(f"MAX(TRY_CAST(CASE WHEN LEFT({name}, {len(prefix)}) = ? "
+                                   f"THEN SUBSTRING({name}, {len(prefix) + 1}, 4000) ELSE {name} END AS BIGINT))")
+                params.append(prefix)
+            else:
+                expressions.append(f"MAX({name})")
+        # 挿入先の最大値なので、セカンダリの遅れを避けてプライマリから読む
+        rows = self.sql_manager.read_rows(f"SELECT {', '.join(expressions)} FROM [{self.table_name}]", *params,
+                                          read_only=False)
+
+        for column, value in zip(targets, rows[0]):
+            key = SyntheticDataGenerator.key_from_value(column, value)
+            if key is not None and key >= column['settings']['min']:
+                column['settings']['min'] = key + 1
+
+    def run_generation(self, columns, total, batch_size, workers):
+        try:
+            self.load_parent_keys(columns, total)
+            generator = SyntheticDataGenerator(columns, seed=random.randrange(2 ** 32))
+            names = ", ".join(f"[{column['name']}]" for column in columns)
+            placeholders = ", ".join("?" for _ in columns)
+            sql = f"INSERT INTO [{self.table_name}] ({names}) VALUES ({placeholders})"
+
+            batches = [(start, min(batch_size, total - start)) for start in range(0, total, batch_size)]
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(self.insert_batches, generator, sql, batches[i::workers])
+                           for i in range(workers)]
+                for future in futures:
+                    future.result()
+        except Exception as e:
+            self.stop_event.set()
+            self.queue.put(('error', str(e)))
+        finally:
+            self.queue.put(('done', None))
+
+    def load_parent_keys(self, columns, total):
+        """外部キーのカラムについて、参照先の既存キーを取得"""
+        references = [column for column in columns if column['ref_table']]
+        if not references:
+            return
+
+        def read():
+            # 挿入はプライマリに対して行うため、参照先のキーもプライマリから取得する
+            with self.sql_manager.connect_to_server() as conn:
+                cursor = conn.cursor()
+                return [[row[0] for row in cursor.execute(
+                    f"SELECT DISTINCT TOP ({self.PARENT_KEY_LIMIT}) [{column['ref_column']}] "
+                    f"FROM [{column['ref_table']}] WHERE [{column['ref_column']}] IS NOT NULL").fetchall()]
+                    for column in references]
+
+        for column, keys in zip(references, self.sql_manager.governor.run_read(read)):
+            column['parent_keys'] = keys
+            if column['is_unique'] and len(keys) < total:
+                raise ValueError(f"{column['name']}: 一意制約があるため参照先 {column['ref_table']} に "
+                                 f"{total:,} 件以上のキーが必要です")
+
+    def insert_batches(self, generator, sql, batches):
+        # 並列数ぶんの接続でそれぞれバッチを挿入する
+        def insert():
+            with self.sql_manager.connect_to_server(query_timeout=0) as conn:
+                cursor = conn.cursor()
+                cursor.fast_executemany = True
+                for start, count in batches:
+                    if self.stop_event.is_set():
+                        return
+                    cursor.executemany(sql, generator.generate_batch(start, count))
+                    conn.commit()
+                    self.queue.put(('progress', count))
+
+        self.sql_manager.governor.run(insert)
+
+    def poll_queue(self):
+        finished = False
+        while True:
+            try:
+                kind, payload = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'progress':
+                self.inserted += payload
+            elif kind == 'error':
+                messagebox.showerror("エラー", f"テストデータの生成に失敗しました: {payload}", parent=self.dialog)
+            elif kind == 'done':
+                finished = True
+
+        elapsed = time.perf_counter() - self.started_at
+        rate = self.inserted / elapsed if elapsed > 0 else 0
+        self.progress_bar.config(value=self.inserted)
+        self.progress_text.set(f"{self.inserted:,} / {self.total:,} 行　{rate:,.0f} 行/秒　{elapsed:.1f} 秒")
+
+        if finished:
+            self.poll_id = None
+            self.start_button.config(state=tk.NORMAL)
+        else:
+            self.poll_id = self.dialog.after(self.POLL_INTERVAL, self.poll_queue)
+
+    def close(self):
+        self.stop_event.set()
+        if self.closing:
+            return
+        self.closing = True
+        self.destroy_when_stopped()
+
+    def destroy_when_stopped(self):
+        """挿入中のバッチが終わり、ワーカーが止まってから画面を破棄する"""
+        if self.worker and self.worker.is_alive():
+            self.progress_text.set("停止しています...")
+            self.dialog.after(self.POLL_INTERVAL, self.destroy_when_stopped)
+            return
+        if self.poll_id:
+            self.dialog.after_cancel(self.poll_id)
+            self.poll_id = None
+        self.dialog.destroy()
+
+def quote_name(name):
+    """識別子を角かっこで囲む（QUOTENAMEと同じ規則）"""
+    return "[" + name.replace("]", "]]") + "]"
+
+class CatalogSnapshot:
+    """データベースのカタログ情報を、オブジェクトごとではなく種類ごとのクエリでまとめて取得する
+
+    テーブル数に関係なくクエリの回数は一定で、取得後はサーバーに問い合わせずにスクリプトを生成できる。
+    """
+
+    TABLES_SQL = """
+        SELECT t.object_id, s.name, t.name
+        FROM sys.tables t
+        JOIN sys.schemas s ON t.schema_id = s.schema_id
+        WHERE t.is_ms_shipped = 0 AND (? IS NULL OR t.object_id = OBJECT_ID(?))
+    """
+
+    COLUMNS_SQL = """
+        SELECT
+            c.object_id, c.column_id, c.name, TYPE_NAME(c.user_type_id), ty.is_user_defined,
+            c.max_length, c.precision, c.scale, c.is_nullable, c.collation_name,
+            c.is_identity, CAST(ic.seed_value AS BIGINT), CAST(ic.increment_value AS BIGINT),
+            c.is_computed, cc.definition, cc.is_persisted, c.is_rowguidcol,
+            dc.name, dc.definition
+        FROM sys.columns c
+        JOIN sys.tables t ON c.object_id = t.object_id
+        JOIN sys.types ty ON c.user_type_id = ty.user_type_id
+        LEFT JOIN sys.identity_columns ic ON ic.object_id = c.object_id AND ic.column_id = c.column_id
+        LEFT JOIN sys.computed_columns cc ON cc.object_id = c.object_id AND cc.column_id = c.column_id
+        LEFT JOIN sys.default_constraints dc ON dc.object_id = c.default_object_id
+        WHERE t.is_ms_shipped = 0 AND (? IS NULL OR t.object_id = OBJECT_ID(?))
+    """
+
+    INDEXES_SQL = """
+        SELECT i.object_id, i.index_id, i.name, i.type, i.is_unique, i.is_primary_key,
+               i.is_unique_constraint, i.filter_definition
+        FROM sys.indexes i
+        JOIN sys.tables t ON i.object_id = t.object_id
+        WHERE t.is_ms_shipped = 0 AND i.type IN (1, 2, 5, 6) AND i.is_hypothetical = 0
+        AND (? IS NULL OR t.object_id = OBJECT_ID(?))
+    """
+
+    INDEX_COLUMNS_SQL = """
+        SELECT ic.object_id, ic.index_id, ic.key_ordinal, ic.index_column_id, c.name,
+               ic.is_descending_key, ic.is_included_column
+        FROM sys.index_columns ic
+        JOIN sys.tables t ON ic.object_id = t.object_id
+        JOIN sys.columns c ON c.object_id = ic.object_id AND c.column_id = ic.column_id
+        WHERE t.is_ms_shipped = 0 AND (? IS NULL OR t.object_id = OBJECT_ID(?))
+    """
+
+    FOREIGN_KEYS_SQL = """
+        SELECT fk.object_id, fk.name, fk.parent_object_id, fk.referenced_object_id,
+               SCHEMA_NAME(rt.schema_id), rt.name,
+               fk.delete_referential_action_desc, fk.update_referential_action_desc
+        FROM sys.foreign_keys fk
+        JOIN sys.tables rt ON fk.referenced_object_id = rt.object_id
+        WHERE (? IS NULL OR fk.parent_object_id = OBJECT_ID(?))
+    """
+
+    FOREIGN_KEY_COLUMNS_SQL = """
+        SELECT fkc.constraint_object_id, fkc.constraint_column_id, pc.name, rc.name
+        FROM sys.foreign_key_columns fkc
+        JOIN sys.columns pc ON pc.object_id = fkc.parent_object_id AND pc.column_id = fkc.parent_column_id
+        JOIN sys.columns rc ON rc.object_id = fkc.referenced_object_id AND rc.column_id = fkc.referenced_column_id
+        WHERE (? IS NULL OR fkc.parent_object_id = OBJECT_ID(?))
+    """
+
+    CHECKS_SQL = """
+        SELECT cc.parent_object_id, cc.name, cc.definition
+        FROM sys.check_constraints cc
+        JOIN sys.tables t ON cc.parent_object_id = t.object_id
+        WHERE t.is_ms_shipped = 0 AND (? IS NULL OR t.object_id = OBJECT_ID(?))
+    """
+
+    # 名前を指定せずに作成され、サーバーが名前を付けた制約
+    SYSTEM_NAMED_SQL = """
+        SELECT c.parent_object_id, c.name
+        FROM (
+            SELECT parent_object_id, name, is_system_named FROM sys.key_constraints
+            UNION ALL SELECT parent_object_id, name, is_system_named FROM sys.default_constraints
+            UNION ALL SELECT parent_object_id, name, is_system_named FROM sys.check_constraints
+            UNION ALL SELECT parent_object_id, name, is_system_named FROM sys.foreign_keys
+        ) c
+        WHERE c.is_system_named = 1 AND (? IS NULL OR c.parent_object_id = OBJECT_ID(?))
+    """
+
+    def __init__(self):
+        # object_id -> テーブル情報（columns, indexes, foreign_keys, checks, system_named を含む）
+        self.tables = {}
+
+    @classmethod
+    def load(cls, cursor, table_name=None):
+        """
+        Args:
+            cursor: 対象データベースに接続したカーソル
+            table_name: 指定した場合はそのテーブルだけを取得する
+        """
+        snapshot = cls()
+        params = (table_name, table_name)
+
+        for object_id, schema, name in cursor.execute(cls.TABLES_SQL, *params).fetchall():
+            snapshot.tables[object_id] = {
+                'object_id': object_id, 'schema': schema, 'name': name,
+                'columns': [], 'indexes': {}, 'foreign_keys': {}, 'checks': [], 'system_named': set()
+            }
+
+        for row in cursor.execute(cls.COLUMNS_SQL, *params).fetchall():
+            table = snapshot.tables.get(row[0])
+            if table is None:
+                continue
+            table['columns'].append({
+                'column_id': row[1], 'name': row[2], 'type': row[3], 'is_user_defined': bool(row[4]),
+                'max_length': row[5], 'precision': row[6], 'scale': row[7], 'is_nullable': bool(row[8]),
+                'collation': row[9], 'is_identity': bool(row[10]), 'seed': row[11], 'increment': row[12],
+                'is_computed': bool(row[13]), 'definition': row[14], 'is_persisted': bool(row[15]),
+                'is_rowguidcol': bool(row[16]), 'default_name': row[17], 'default_definition': row[18]
+            })
+
+        for object_id, index_id, name, index_type, is_unique, is_primary_key, is_unique_constraint, \
+                filter_definition in cursor.execute(cls.INDEXES_SQL, *params).fetchall():
+            table = snapshot.tables.get(object_id)
+            if table is None:
+                continue
+            table['indexes'][index_id] = {
+                'name': name, 'type': index_type, 'is_unique': bool(is_unique),
+                'is_primary_key': bool(is_primary_key), 'is_unique_constraint': bool(is_unique_constraint),
+                'filter': filter_definition, 'keys': [], 'includes': []
+            }
+
+        for object_id, index_id, key_ordinal, index_column_id, name, is_descending, is_included \
+                in cursor.execute(cls.INDEX_COLUMNS_SQL, *params).fetchall():
+            index = snapshot.tables.get(object_id, {}).get('indexes', {}).get(index_id)
+            if index is None:
+                continue
+            if is_included or key_ordinal == 0:
+                index['includes'].append((index_column_id, name))
+            else:
+                index['keys'].append((key_ordinal, name, bool(is_descending)))
+
+        for constraint_id, name, parent_id, referenced_id, ref_schema, ref_name, on_delete, on_update \
+                in cursor.execute(cls.FOREIGN_KEYS_SQL, *params).fetchall():
+            table = snapshot.tables.get(parent_id)
+            if table is None:
+                continue
+            table['foreign_keys'][constraint_id] = {
+                'name': name, 'referenced_object_id': referenced_id,
+                'ref_schema': ref_schema, 'ref_table': ref_name,
+                'on_delete': on_delete, 'on_update': on_update, 'columns': []
+            }
+
+        foreign_keys = {constraint_id: fk for table in snapshot.tables.values()
+                        for constraint_id, fk in table['foreign_keys'].items()}
+        for constraint_id, ordinal, parent_column, ref_column \
+                in cursor.execute(cls.FOREIGN_KEY_COLUMNS_SQL, *params).fetchall():
+            if constraint_id in foreign_keys:
+                foreign_keys[constraint_id]['columns'].append((ordinal, parent_column, ref_column))
+
+        for object_id, name, definition in cursor.execute(cls.CHECKS_SQL, *params).fetchall():
+            if object_id in snapshot.tables:
+                snapshot.tables[object_id]['checks'].append((name, definition))
+
+        for object_id, name in cursor.execute(cls.SYSTEM_NAMED_SQL, *params).fetchall():
+            if object_id in snapshot.tables:
+                snapshot.tables[object_id]['system_named'].add(name)
+
+        # 取得順に依存しない出力にするため、すべて名前や序数で並べ替えておく
+        for table in snapshot.tables.values():
+            table['columns'].sort(key=lambda column: column['column_id'])
+            table['checks'].sort()
+            for index in table['indexes'].values():
+                index['keys'].sort()
+                index['includes'].sort()
+            for fk in table['foreign_keys'].values():
+                fk['columns'].sort()
+        return snapshot
+
+    def find_table(self, name):
+        """テーブル名（スキーマ名なし）からテーブル情報を探す"""
+        for table in self.tables.values():
+            if table['name'] == name:
+                return table
+        return None
+
+class TableScripter:
+    """CatalogSnapshotのテーブル情報からDDLを生成する
+
+    データを流し込んでからインデックスを作成できるよう、CREATE TABLE・キーとインデックス・
+    外部キーをそれぞれ別に生成する。
+    """
+
+    LENGTH_TYPES = ('char', 'varchar', 'binary', 'varbinary')
+    UNICODE_TYPES = ('nchar', 'nvarchar')
+    SCALE_TYPES = ('datetime2', 'time', 'datetimeoffset')
+
+    def __init__(self, snapshot):
+        """
+        Args:
+            snapshot: CatalogSnapshot
+        """
+        self.snapshot = snapshot
+
+    @staticmethod
+    def qualified_name(table, database=None):
+        name = f"{quote_name(table['schema'])}.{quote_name(table['name'])}"
+        return f"{quote_name(database)}.{name}" if database else name
+
+    def format_type(self, column):
+        type_name = column['type']
+        if column['is_user_defined']:
+            return quote_name(type_name)
+
+        if type_name in self.LENGTH_TYPES:
+            length = "MAX" if column['max_length'] == -1 else column['max_length']
+        elif type_name in self.UNICODE_TYPES:
+            length = "MAX" if column['max_length'] == -1 else column['max_length'] // 2
+        elif type_name in ('decimal', 'numeric'):
+            length = f"{column['precision']}, {column['scale']}"
+        elif type_name in self.SCALE_TYPES:
+            length = column['scale']
+        else:
+            return type_name.upper()
+        return f"{type_name.upper()}({length})"
+
+    def format_column(self, column):
+        name = quote_name(column['name'])
+        if column['is_computed']:
+            persisted = " PERSISTED" if column['is_persisted'] else ""
+            return f"{name} AS {column['definition']}{persisted}"
+
+        parts = [name, self.format_type(column)]
+        if column['collation'] and not column['is_user_defined']:
+            parts.append(f"COLLATE {column['collation']}")
+        if column['is_identity']:
+            parts.append(f"IDENTITY({column['seed']}, {column['increment']})")
+        if column['is_rowguidcol']:
+            parts.append("ROWGUIDCOL")
+        parts.append("NULL" if column['is_nullable'] else "NOT NULL")
+        if column['default_definition'] is not None:
+            parts.append(f"CONSTRAINT {quote_name(column['default_name'])} DEFAULT {column['default_definition']}")
+        return " ".join(parts)
+
+    def create_table(self, table, database=None):
+        """列・既定値・CHECK制約を含むCREATE TABLE文（キーとインデックスは含まない）"""
+        lines = [self.format_column(column) for column in table['columns']]
+        lines += [f"CONSTRAINT {quote_name(name)} CHECK {definition}" for name, definition in table['checks']]
+        body = ",\n    ".join(lines)
+        return f"CREATE TABLE {self.qualified_name(table, database)} (\n    {body}\n)"
+
+    def ordered_indexes(self, table):
+        """クラスター化インデックスを先頭に、残りを名前順で返す"""
+        return sorted(table['indexes'].values(),
+                      key=lambda index: (index['type'] not in (1, 5), index['name']))
+
+    def format_keys(self, index):
+        return ", ".join(f"{quote_name(name)} {'DESC' if is_descending else 'ASC'}"
+                         for _, name, is_descending in index['keys'])
+
+    def index_statements(self, table, database=None):
+        """主キー・一意制約・インデックスを作成する文のリスト"""
+        return [self.index_statement(table, index, database) for index in self.ordered_indexes(table)]
+
+    def index_statement(self, table, index, database=None):
+        table_name = self.qualified_name(table, database)
+        kind = "CLUSTERED" if index['type'] in (1, 5) else "NONCLUSTERED"
+        if index['is_primary_key'] or index['is_unique_constraint']:
+            constraint = "PRIMARY KEY" if index['is_primary_key'] else "UNIQUE"
+            return (f"ALTER TABLE {table_name} ADD CONSTRAINT {quote_name(index['name'])} "
+                    f"{constraint} {kind} ({self.format_keys(index)})")
+
+        if index['type'] == 5:
+            return f"CREATE CLUSTERED COLUMNSTORE INDEX {quote_name(index['name'])} ON {table_name}"
+        if index['type'] == 6:
+            columns = ", ".join(quote_name(name) for _, name in index['includes'])
+            return f"CREATE NONCLUSTERED COLUMNSTORE INDEX {quote_name(index['name'])} ON {table_name} ({columns})"
+
+        unique = "UNIQUE " if index['is_unique'] else ""
+        statement = f"CREATE {unique}{kind} INDEX {quote_name(index['name'])} ON {table_name} ({self.format_keys(index)})"
+        if index['includes']:
+            statement += f" INCLUDE ({', '.join(quote_name(name) for _, name in index['includes'])})"
+        if index['filter']:
+            statement += f" WHERE {index['filter']}"
+        return statement
+
+    def drop_index_statement(self, table, index):
+        if index['is_primary_key'] or index['is_unique_constraint']:
+            return f"ALTER TABLE {self.qualified_name(table)} DROP CONSTRAINT {quote_name(index['name'])}"
+        return f"DROP INDEX {quote_name(index['name'])} ON {self.qualified_name(table)}"
+
+    def foreign_key_statements(self, table, database=None):
+        return [self.foreign_key_statement(table, fk, database)
+                for fk in sorted(table['foreign_keys'].values(), key=lambda fk: fk['name'])]
+
+    def foreign_key_statement(self, table, fk, database=None):
+        columns = ", ".join(quote_name(parent) for _, parent, _ in fk['columns'])
+        ref_columns = ", ".join(quote_name(ref) for _, _, ref in fk['columns'])
+        ref_table = {'schema': fk['ref_schema'], 'name': fk['ref_table']}
+        statement = (f"ALTER TABLE {self.qualified_name(table, database)} ADD CONSTRAINT {quote_name(fk['name'])} "
+                     f"FOREIGN KEY ({columns}) REFERENCES {self.qualified_name(ref_table, database)} ({ref_columns})")
+        if fk['on_delete'] != 'NO_ACTION':
+            statement += f" ON DELETE {fk['on_delete'].replace('_', ' ')}"
+        if fk['on_update'] != 'NO_ACTION':
+            statement += f" ON UPDATE {fk['on_update'].replace('_', ' ')}"
+        return statement
+
+    def renamed_table(self, table, name, rename_constraints=False):
+        """テーブル名を変えたテーブル情報を返す
+
+        Args:
+            rename_constraints: 制約名はスキーマ内で一意なため、同じデータベースに複製する場合はTrue
+        """
+        # PK_<テーブル名>、FK_<テーブル名>_... のように「_」区切りの語として含まれる場合だけ置き換える
+        token = re.compile(r"(?<![^_])" + re.escape(table['name']) + r"(?![^_])", re.IGNORECASE)
+
+        def rename(constraint):
+            if not rename_constraints:
+                return constraint
+            if token.search(constraint):
+                return token.sub(lambda match: name, constraint, count=1)
+            return f"{constraint}_{name}"
+
+        columns = [dict(column, default_name=rename(column['default_name'])) if column['default_name'] else column
+                   for column in table['columns']]
+        indexes = {index_id: dict(index, name=rename(index['name']))
+                   if index['is_primary_key'] or index['is_unique_constraint'] else index
+                   for index_id, index in table['indexes'].items()}
+        foreign_keys = {}
+        for constraint_id, fk in table['foreign_keys'].items():
+            fk = dict(fk, name=rename(fk['name']))
+            # 自己参照の外部キーは新しいテーブルを参照させる
+            if fk['referenced_object_id'] == table['object_id']:
+                fk['ref_table'] = name
+            foreign_keys[constraint_id] = fk
+        checks = [(rename(check_name), definition) for check_name, definition in table['checks']]
+        return dict(table, name=name, columns=columns, indexes=indexes, foreign_keys=foreign_keys, checks=checks)
+
+    def insert_columns(self, table):
+        """データのコピー対象のカラム（計算列とrowversionは除く）"""
+        return [column['name'] for column in table['columns']
+                if not column['is_computed'] and column['type'] != 'timestamp']
+
+    def range_key(self, table):
+        """範囲分割に使える主キーの先頭カラム（整数型の場合のみ）"""
+        integer_types = ('tinyint', 'smallint', 'int', 'bigint')
+        for index in table['indexes'].values():
+            if index['is_primary_key'] and index['keys']:
+                name = index['keys'][0][1]
+                column = next(column for column in table['columns'] if column['name'] == name)
+                return name if column['type'] in integer_types else None
+        return None
+
+class DatabaseScripter:
+    """CatalogSnapshotからデータベース全体のDDLスクリプトを生成する
+
+    テーブルは外部キーの参照先が先になる順に並べ、外部キーは循環参照でも実行できるよう
+    すべてのテーブルの後にまとめて作成する。出力には日時などを含めず、同じスキーマからは
+    常に同じテキストを生成するため、そのままバージョン管理に登録できる。
+    """
+
+    # ファイル名に使えない文字
+    INVALID_FILENAME_CHARS = re.compile(r'[<>:"/\\|?*]')
+
+    def __init__(self, snapshot):
+        """
+        Args:
+            snapshot: CatalogSnapshot
+        """
+        self.snapshot = snapshot
+        self.scripter = TableScripter(snapshot)
+
+    def dependency_order(self):
+        """参照先のテーブルが先になるよう並べたテーブルのリスト（同順位はスキーマ名・テーブル名順）"""
+        tables = self.snapshot.tables
+        depends_on = {object_id: {fk['referenced_object_id'] for fk in table['foreign_keys'].values()
+                                  if fk['referenced_object_id'] != object_id and fk['referenced_object_id'] in tables}
+                      for object_id, table in tables.items()}
+        referenced_by = {object_id: [] for object_id in tables}
+        for object_id, references in depends_on.items():
+            for reference in references:
+                referenced_by[reference].append(object_id)
+
+        def sort_key(object_id):
+            return (tables[object_id]['schema'], tables[object_id]['name'])
+
+        remaining = {object_id: len(references) for object_id, references in depends_on.items()}
+        ready = sorted((object_id for object_id, count in remaining.items() if count == 0), key=sort_key)
+        ordered = []
+        while ready:
+            object_id = ready.pop(0)
+            ordered.append(object_id)
+            del remaining[object_id]
+            for dependent in referenced_by[object_id]:
+                if dependent in remaining:
+                    remaining[dependent] -= 1
+                    if remaining[dependent] == 0:
+                        ready.append(dependent)
+            ready.sort(key=sort_key)
+
+        # 循環参照しているテーブルは名前順で最後に並べる（外部キーは後から作成するため実行できる）
+        ordered += sorted(remaining, key=sort_key)
+        return [tables[object_id] for object_id in ordered]
+
+    def script_table(self, table):
+        """1テーブル分のCREATE TABLEとインデックスのスクリプト"""
+        statements = [self.scripter.create_table(table)] + self.scripter.index_statements(table)
+        header = f"-- {self.scripter.qualified_name(table)}\n"
+        return header + "".join(f"{statement}\nGO\n" for statement in statements)
+
+    def generate(self):
+        """
+        Returns:
+            (スキーマ作成スクリプト, [(テーブル, スクリプト), ...], 外部キー作成スクリプト)
+        """
+        # 文字列の組み立てだけなので、数千テーブルでも1秒かからない（時間の大半はカタログの取得）
+        tables = self.dependency_order()
+        scripts = [self.script_table(table) for table in tables]
+
+        schemas = sorted({table['schema'] for table in tables} - {'dbo'})
+        schema_script = "".join(f"CREATE SCHEMA {quote_name(schema)}\nGO\n" for schema in schemas)
+        foreign_key_script = "".join(f"{statement}\nGO\n" for table in tables
+                                     for statement in self.scripter.foreign_key_statements(table))
+        return schema_script, list(zip(tables, scripts)), foreign_key_script
+
+    def write_file(self, path, database):
+        """1つの.sqlファイルに出力する"""
+        schema_script, table_scripts, foreign_key_script = self.generate()
+        parts = [f"-- {database}\n"]
+        if schema_script:
+            parts.append(schema_script)
+        parts += [f"\n{script}" for _, script in table_scripts]
+        if foreign_key_script:
+            parts.append(f"\n-- 外部キー\n{foreign_key_script}")
+        with open(path, 'w', encoding='utf-8', newline='\n') as f:
+            f.write("".join(parts))
+        return len(table_scripts)
+
+    def write_folder(self, path):
+        """テーブルごとの.sqlファイルと、実行順を記したファイルをフォルダに出力する
+
+        前回の出力にあって今回はないファイル（削除・名前変更されたテーブル）は削除する。
+        """
+        schema_script, table_scripts, foreign_key_script = self.generate()
+        os.makedirs(path, exist_ok=True)
+        order_path = os.path.join(path, "_deploy_order.txt")
+
+        files = []
+        if schema_script:
+            files.append(("_schemas.sql", schema_script))
+        for table, script in table_scripts:
+            file_name = self.INVALID_FILENAME_CHARS.sub("_", f"{table['schema']}.{table['name']}.sql")
+            files.append((file_name, script))
+        if foreign_key_script:
+            files.append(("_foreign_keys.sql", foreign_key_script))
+
+        self.remove_stale_files(path, order_path, {file_name for file_name, _ in files})
+        for file_name, script in files:
+            with open(os.path.join(path, file_name), 'w', encoding='utf-8', newline='\n') as f:
+                f.write(script)
+        with open(order_path, 'w', encoding='utf-8', newline='\n') as f:
+            f.write("".join(f"{file_name}\n" for file_name, _ in files))
+        return len(table_scripts)
+
+    def remove_stale_files(self, path, order_path, file_names):
+        """前回の_deploy_order.txtに載っていて、今回出力しない.sqlファイルを削除する
+
+        利用者が置いたファイルを消さないよう、前回このクラスが出力したファイルだけを対象にする。
+        """
+        if not os.path.exists(order_path):
+            return
+        with open(order_path, encoding='utf-8') as f:
+            previous = {line.strip() for line in f if line.strip()}
+        for file_name in previous - file_names:
+            # 出力先フォルダの外を指す行は無視する
+            if file_name.endswith(".sql") and os.path.basename(file_name) == file_name:
+                file_path = os.path.join(path, file_name)
+                if os.path.isfile(file_path):
+                    os.remove(file_path)
+
+class DatabaseScriptDialog:
+    """選択中のデータベース全体のDDLをファイルまたはフォルダに出力する"""
+
+    def __init__(self, sql_manager):
+        """
+        Args:
+            sql_manager: SQLTableManagerのインスタンス
+        """
+        self.sql_manager = sql_manager
+        self.database = sql_manager.current_db
+
+        self.dialog = tk.Toplevel(sql_manager.root)
+        self.dialog.title(f"スクリプト生成 - {self.database}")
+        self.dialog.geometry("520x300")
+        self.dialog.transient(sql_manager.root)
+
+        self.output_mode = tk.StringVar(value="file")
+        self.output_path = tk.StringVar()
+
+        self.queue = queue.Queue()
+        self.worker = None
+        self.create_widgets()
+
+    def create_widgets(self):
+        main_frame = ttk.Frame(self.dialog, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+
+        mode_frame = ttk.LabelFrame(main_frame, text="出力形式", padding="5")
+        mode_frame.pack(fill=tk.X, pady=5)
+        ttk.Radiobutton(mode_frame, text="1つの.sqlファイル", variable=self.output_mode,
+                        value="file").pack(side=tk.LEFT, padx=5)
+        ttk.Radiobutton(mode_frame, text="テーブルごとのファイル（フォルダ）", variable=self.output_mode,
+                        value="folder").pack(side=tk.LEFT, padx=5)
+
+        path_frame = ttk.Frame(main_frame)
+        path_frame.pack(fill=tk.X, pady=5)
+        ttk.Label(path_frame, text="出力先:").pack(side=tk.LEFT)
+        ttk.Entry(path_frame, textvariable=self.output_path).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        ttk.Button(path_frame, text="参照", command=self.browse).pack(side=tk.LEFT)
+
+        self.log_text = tk.Text(main_frame, height=8)
+        self.log_text.pack(fill=tk.BOTH, expand=True, pady=5)
+
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(pady=5)
+        self.start_button = ttk.Button(button_frame, text="生成", command=self.start)
+        self.start_button.pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="閉じる", command=self.dialog.destroy).pack(side=tk.LEFT, padx=5)
+
+    def browse(self):
+        if self.output_mode.get() == "file":
+            path = filedialog.asksaveasfilename(parent=self.dialog, defaultextension=".sql",
+                                                initialfile=f"{self.database}.sql",
+                                                filetypes=[("SQLファイル", "*.sql")])
+        else:
+            path = filedialog.askdirectory(parent=self.dialog)
+        if path:
+            self.output_path.set(path)
+
+    def start(self):
+        if self.worker and self.worker.is_alive():
+            return
+        path = self.output_path.get().strip()
+        if not path:
+            messagebox.showwarning("警告", "出力先を指定してください", parent=self.dialog)
+            return
+
+        self.log_text.delete("1.0", tk.END)
+        self.start_button.config(state=tk.DISABLED)
+        self.worker = threading.Thread(target=self.run_script, args=(self.output_mode.get(), path), daemon=True)
+        self.worker.start()
+        self.poll_queue()
+
+    def run_script(self, mode, path):
+        try:
+            started_at = time.perf_counter()
+
+            def read():
+                with self.sql_manager.connect_to_server(read_only=True, database=self.database) as conn:
+                    return CatalogSnapshot.load(conn.cursor())
+            snapshot = self.sql_manager.governor.run_read(read)
+            loaded_at = time.perf_counter()
+            self.queue.put(('log', f"カタログ取得: {len(snapshot.tables):,} テーブル　{loaded_at - started_at:.2f} 秒"))
+
+            scripter = DatabaseScripter(snapshot)
+            if mode == "file":
+                count = scripter.write_file(path, self.database)
+            else:
+                count = scripter.write_folder(path)
+            self.queue.put(('log', f"スクリプト生成: {count:,} テーブル　{time.perf_counter() - loaded_at:.2f} 秒"))
+            self.queue.put(('log', f"出力先: {path}"))
+        except Exception as e:
+            self.queue.put(('error', str(e)))
+        finally:
+            self.queue.put(('done', None))
+
+    def poll_queue(self):
+        finished = False
+        while True:
+            try:
+                kind, payload = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'log':
+                self.log_text.insert(tk.END, payload + "\n")
+            elif kind == 'error':
+                messagebox.showerror("エラー", f"スクリプトの生成に失敗しました: {payload}", parent=self.dialog)
+            elif kind == 'done':
+                finished = True
+
+        if finished:
+            self.start_button.config(state=tk.NORMAL)
+        else:
+            self.dialog.after(200, self.poll_queue)
+
+def load_snapshot(governor, settings, database, server=None):
+    """接続設定でデータベースに接続してCatalogSnapshotを取得する（画面を使わない実行でも使う）
+
+    Args:
+        governor: QueryGovernor
+        settings: 接続設定
+        database: 対象のデータベース
+        server: 接続設定と異なるサーバーの場合に指定（認証情報は接続設定のものを使う）
+    """
+    if server and server.lower() != settings['server'].lower():
+        settings = dict(settings, server=server, read_server='')
+
+    def read():
+        with governor.connect(build_connection_string(settings, database, read_only=True),
+                              int(settings.get('login_timeout', 15)), int(settings.get('query_timeout', 30)),
+                              connection_attributes(settings)) as conn:
+            return CatalogSnapshot.load(conn.cursor())
+    return governor.run_read(read)
+
+class SchemaComparer:
+    """2つのCatalogSnapshotを比較し、ターゲットをソースに合わせる移行スクリプトを生成する
+
+    まずテーブルごとのDDLのハッシュ（シグネチャ）を比べ、一致しないテーブルだけを詳しく比較する。
+    サーバーが名前を付けた制約はデータベースごとに名前が異なるため、名前ではなく定義で対応付ける。
+    データが失われるテーブルとカラムの削除は、include_dropsを指定しない限りコメントとして出力する。
+    """
+
+    # 移行スクリプトの実行順（制約の削除 → 構造の変更 → 制約とインデックスの作成）
+    PHASES = [
+        ('drop_fk', "外部キーの削除"),
+        ('drop_index', "インデックス・キーの削除"),
+        ('drop_constraint', "既定値・CHECK制約の削除"),
+        ('drop_table', "テーブルの削除"),
+        ('create_schema', "スキーマの作成"),
+        ('create_table', "テーブルの作成"),
+        ('drop_column', "カラムの削除"),
+        ('alter_column', "カラムの変更"),
+        ('add_column', "カラムの追加"),
+        ('add_constraint', "既定値・CHECK制約の追加"),
+        ('create_index', "インデックス・キーの作成"),
+        ('create_fk', "外部キーの作成")
+    ]
+
+    def __init__(self, source, target, include_drops=False):
+        """
+        Args:
+            source: 目標とするスキーマのCatalogSnapshot
+            target: 変更するデータベースのCatalogSnapshot
+            include_drops: テーブルとカラムの削除を実行する文として出力する場合はTrue
+        """
+        self.source = source
+        self.target = target
+        self.include_drops = include_drops
+        self.scripter = TableScripter(None)
+        self.source_tables = {(table['schema'], table['name']): table for table in source.tables.values()}
+        self.target_tables = {(table['schema'], table['name']): table for table in target.tables.values()}
+
+    def signature(self, table):
+        statements = ([self.scripter.create_table(table)] + self.scripter.index_statements(table)
+                      + self.scripter.foreign_key_statements(table))
+        text = "\n".join(statements)
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def compare(self):
+        """
+        Returns:
+            (差分のリスト [(種別, オブジェクト, 内容), ...], 移行スクリプト)
+        """
+        self.differences = []
+        self.statements = {phase: [] for phase, _ in self.PHASES}
+        self.commented = set()
+        # 参照先の変更により作り直す外部キーの判定用: テーブル -> 変更・削除したカラム（Noneは全カラム）
+        self.changed_references = {}
+        self.dropped_tables = set()
+
+        source_order = DatabaseScripter(self.source).dependency_order()
+        target_order = DatabaseScripter(self.target).dependency_order()
+
+        for table in source_order:
+            key = (table['schema'], table['name'])
+            if key not in self.target_tables:
+                self.add_table(table)
+            elif self.signature(table) != self.signature(self.target_tables[key]):
+                self.compare_table(table, self.target_tables[key])
+
+        for table in reversed(target_order):
+            key = (table['schema'], table['name'])
+            if key not in self.source_tables:
+                self.drop_table(table)
+
+        self.rebuild_referencing_foreign_keys()
+        return self.differences, self.build_script()
+
+    def add(self, phase, statement, commented=False):
+        # 同じ文を実行する文としても追加した場合は、実行する方を優先する
+        if not commented:
+            self.commented.discard(statement)
+        elif statement not in self.statements[phase]:
+            self.commented.add(statement)
+        if statement not in self.statements[phase]:
+            self.statements[phase].append(statement)
+
+    def match_constraints(self, source, source_items, target_items, definition):
+        """ソースとターゲットの制約を対応付ける
+
+        同じ名前どうしを対応付け、残ったソース側のシステム名の制約は、定義が同じターゲット側の
+        制約と対応付ける。ユーザーが名前を付けた制約は名前でだけ対応付ける。
+
+        Args:
+            source: ソースのテーブル情報
+            source_items: 名前 -> ソース側の制約
+            target_items: 名前 -> ターゲット側の制約
+            definition: 制約から名前を除いた定義を返す関数
+
+        Returns:
+            [(ソース側の名前, ターゲット側の名前), ...]。対応するものがない側はNone
+        """
+        matches = {name: name for name in source_items if name in target_items}
+        remaining = [name for name in target_items if name not in matches]
+        for name, item in source_items.items():
+            if name in matches or name not in source['system_named']:
+                continue
+            for target_name in remaining:
+                if definition(target_items[target_name]) == definition(item):
+                    matches[name] = target_name
+                    remaining.remove(target_name)
+                    break
+        return [(name, matches.get(name)) for name in source_items] + [(None, name) for name in remaining]
+
+    def add_table(self, table):
+        self.differences.append(("テーブル追加", self.scripter.qualified_name(table), ""))
+        target_schemas = {schema for schema, _ in self.target_tables} | {'dbo'}
+        if table['schema'] not in target_schemas:
+            self.add('create_schema', f"CREATE SCHEMA {quote_name(table['schema'])}")
+        self.add('create_table', self.scripter.create_table(table))
+        for statement in self.scripter.index_statements(table):
+            self.add('create_table', statement)
+        for statement in self.scripter.foreign_key_statements(table):
+            self.add('create_fk', statement)
+
+    def drop_table(self, table):
+        self.differences.append(("テーブル削除", self.scripter.qualified_name(table), ""))
+        self.dropped_tables.add((table['schema'], table['name']))
+        for fk in table['foreign_keys'].values():
+            self.add('drop_fk', self.drop_constraint(table, fk['name']), not self.include_drops)
+        self.add('drop_table', f"DROP TABLE {self.scripter.qualified_name(table)}", not self.include_drops)
+
+    def drop_constraint(self, table, name):
+        return f"ALTER TABLE {self.scripter.qualified_name(table)} DROP CONSTRAINT {quote_name(name)}"
+
+    def column_definition(self, column):
+        """ALTER COLUMNで比較・指定する型の部分"""
+        definition = self.scripter.format_type(column)
+        if column['collation'] and not column['is_user_defined']:
+            definition += f" COLLATE {column['collation']}"
+        return f"{definition} {'NULL' if column['is_nullable'] else 'NOT NULL'}"
+
+    def compare_table(self, source, target):
+        table_name = self.scripter.qualified_name(source)
+        source_columns = {column['name']: column for column in source['columns']}
+        target_columns = {column['name']: column for column in target['columns']}
+        changed_columns = set()
+        # ALTER COLUMNするカラム（既定値やCHECK制約が付いたままでは変更できない）
+        altered_columns = set()
+
+        for column in source['columns']:
+            name = column['name']
+            if name not in target_columns:
+                self.differences.append(("カラム追加", f"{table_name}.{quote_name(name)}", self.column_definition(column)
+                                         if not column['is_computed'] else f"AS {column['definition']}"))
+                self.add_column(source, column)
+                continue
+
+            old = target_columns[name]
+            if column['is_computed'] or old['is_computed']:
+                if self.scripter.format_column(column) != self.scripter.format_column(old):
+                    # 計算列は変更できないため削除して追加し直す
+                    self.differences.append(("計算列変更", f"{table_name}.{quote_name(name)}",
+                                             f"{self.scripter.format_column(old)} → {self.scripter.format_column(column)}"))
+                    changed_columns.add(name)
+                    self.drop_column(target, old)
+                    self.add_column(source, column)
+                continue
+
+            old_definition, new_definition = self.column_definition(old), self.column_definition(column)
+            if old_definition != new_definition:
+                self.differences.append(("カラム変更", f"{table_name}.{quote_name(name)}",
+                                         f"{old_definition} → {new_definition}"))
+                changed_columns.add(name)
+                altered_columns.add(name)
+                self.add('alter_column', f"ALTER TABLE {table_name} ALTER COLUMN {quote_name(name)} {new_definition}")
+
+            if (old['is_identity'], old['seed'], old['increment']) != \
+                    (column['is_identity'], column['seed'], column['increment']):
+                self.differences.append(("IDENTITY変更", f"{table_name}.{quote_name(name)}", "手動での対応が必要です"))
+                self.add('alter_column', f"-- IDENTITYの変更はALTER COLUMNでは行えません: {table_name}.{quote_name(name)}")
+
+            # システム名の既定値は名前の違いを無視する
+            renamed = old['default_name'] != column['default_name'] and column['default_name'] not in source['system_named']
+            default_changed = old['default_definition'] != column['default_definition'] or renamed
+            if default_changed:
+                self.differences.append(("既定値変更", f"{table_name}.{quote_name(name)}",
+                                         f"{old['default_definition']} → {column['default_definition']}"))
+            # 変更がなくても、ALTER COLUMNの前に削除して後で追加し直す
+            if default_changed or name in altered_columns:
+                if old['default_name']:
+                    self.add('drop_constraint', self.drop_constraint(target, old['default_name']))
+                if column['default_name']:
+                    self.add('add_constraint', f"ALTER TABLE {table_name} ADD CONSTRAINT {quote_name(column['default_name'])} "
+                                               f"DEFAULT {column['default_definition']} FOR {quote_name(name)}")
+
+        for column in target['columns']:
+            if column['name'] not in source_columns:
+                self.differences.append(("カラム削除", f"{table_name}.{quote_name(column['name'])}", ""))
+                # 削除をコメントで出力する場合は、カラムを参照するインデックスや外部キーも残す
+                if self.include_drops:
+                    changed_columns.add(column['name'])
+                self.drop_column(target, column, not self.include_drops)
+
+        self.compare_checks(source, target, rebuild=bool(altered_columns))
+        self.compare_indexes(source, target, changed_columns)
+        self.compare_foreign_keys(source, target, changed_columns)
+        if changed_columns:
+            self.changed_references.setdefault((source['schema'], source['name']), set()).update(changed_columns)
+
+    def add_column(self, table, column):
+        statement = f"ALTER TABLE {self.scripter.qualified_name(table)} ADD {self.scripter.format_column(column)}"
+        self.add('add_column', statement)
+        if not (column['is_nullable'] or column['is_identity'] or column['is_computed']
+                or column['default_definition'] is not None):
+            self.add('add_column', f"-- 注意: 既存の行がある場合、{quote_name(column['name'])} には既定値が必要です")
+
+    def drop_column(self, table, column, commented=False):
+        if column['default_name']:
+            self.add('drop_constraint', self.drop_constraint(table, column['default_name']), commented)
+        self.add('drop_column', f"ALTER TABLE {self.scripter.qualified_name(table)} DROP COLUMN {quote_name(column['name'])}",
+                 commented)
+
+    def compare_checks(self, source, target, rebuild=False):
+        # rebuildがTrueなら変更のないCHECK制約も作り直す（どのカラムを参照しているかは定義から判断しない）
+        source_checks, target_checks = dict(source['checks']), dict(target['checks'])
+        for new_name, old_name in self.match_constraints(source, source_checks, target_checks, lambda definition: definition):
+            new, old = source_checks.get(new_name), target_checks.get(old_name)
+            unchanged = new_name and old_name and new == old
+            if unchanged and not rebuild:
+                continue
+            if not unchanged:
+                self.differences.append(("CHECK制約", f"{self.scripter.qualified_name(source)}.{quote_name(new_name or old_name)}",
+                                         f"{old} → {new}"))
+            if old_name:
+                self.add('drop_constraint', self.drop_constraint(target, old_name))
+            if new_name:
+                self.add('add_constraint', f"ALTER TABLE {self.scripter.qualified_name(source)} "
+                                           f"ADD CONSTRAINT {quote_name(new_name)} CHECK {new}")
+
+    def index_columns(self, index):
+        return {name for _, name, _ in index['keys']} | {name for _, name in index['includes']}
+
+    def compare_indexes(self, source, target, changed_columns):
+        source_indexes = {index['name']: index for index in self.scripter.ordered_indexes(source)}
+        target_indexes = {index['name']: index for index in target['indexes'].values()}
+        pairs = self.match_constraints(source, source_indexes, target_indexes,
+                                       lambda index: self.scripter.index_statement(source, dict(index, name="")))
+
+        for new_name, old_name in pairs:
+            new, old = source_indexes.get(new_name), target_indexes.get(old_name)
+            if old is None:
+                self.differences.append(("インデックス追加", f"{self.scripter.qualified_name(source)}.{quote_name(new_name)}", ""))
+                self.add('create_index', self.scripter.index_statement(source, new))
+                continue
+
+            # 定義で対応付けた場合は名前の違いを無視して比較する
+            changed = new is None or (self.scripter.index_statement(source, dict(new, name=old_name))
+                                      != self.scripter.index_statement(target, old))
+            # 変更・削除するカラムを含むインデックスは、ALTER COLUMNの前に削除して後で作り直す
+            if not changed and not self.index_columns(old) & changed_columns:
+                continue
+            self.add('drop_index', self.scripter.drop_index_statement(target, old))
+            if changed:
+                self.differences.append(("インデックス削除" if new is None else "インデックス変更",
+                                         f"{self.scripter.qualified_name(target)}.{quote_name(old_name)}", ""))
+            if old['is_primary_key'] or old['is_unique_constraint']:
+                # キーを削除すると、それを参照する外部キーも作り直しが必要になる
+                self.changed_references.setdefault((target['schema'], target['name']), set()).update(
+                    self.index_columns(old))
+            if new is not None:
+                self.add('create_index', self.scripter.index_statement(source, new))
+
+    def compare_foreign_keys(self, source, target, changed_columns):
+        source_fks = {fk['name']: fk for fk in source['foreign_keys'].values()}
+        target_fks = {fk['name']: fk for fk in target['foreign_keys'].values()}
+        for new_name, old_name in self.match_foreign_keys(source, source_fks, target_fks):
+            new, old = source_fks.get(new_name), target_fks.get(old_name)
+            new_statement = new and self.scripter.foreign_key_statement(source, new)
+            # 定義で対応付けた場合は名前の違いを無視して比較する
+            same = new and old and self.scripter.foreign_key_statement(source, dict(new, name=old_name)) == \
+                self.scripter.foreign_key_statement(target, old)
+            touches = old and {parent for _, parent, _ in old['columns']} & changed_columns
+            if same and not touches:
+                continue
+            if not same:
+                kind = "外部キー追加" if old is None else "外部キー削除" if new is None else "外部キー変更"
+                self.differences.append((kind, f"{self.scripter.qualified_name(source)}.{quote_name(new_name or old_name)}", ""))
+            if old:
+                self.add('drop_fk', self.drop_constraint(target, old_name))
+            if new:
+                self.add('create_fk', new_statement)
+
+    def match_foreign_keys(self, source, source_fks, target_fks):
+        return self.match_constraints(source, source_fks, target_fks,
+                                      lambda fk: self.scripter.foreign_key_statement(source, dict(fk, name="")))
+
+    def rebuild_referencing_foreign_keys(self):
+        """削除・変更したテーブルやカラムを参照している外部キーを、先に削除して後で作り直す"""
+        for key, table in sorted(self.target_tables.items()):
+            if key in self.dropped_tables:
+                continue
+            source = self.source_tables.get(key)
+            source_fks = {fk['name']: fk for fk in source['foreign_keys'].values()} if source else {}
+            target_fks = {fk['name']: fk for fk in table['foreign_keys'].values()}
+            # ターゲット側の外部キー名 -> 対応するソース側の外部キー名
+            matches = ({old_name: new_name for new_name, old_name in self.match_foreign_keys(source, source_fks, target_fks)}
+                       if source else {})
+            for fk in table['foreign_keys'].values():
+                ref_key = (fk['ref_schema'], fk['ref_table'])
+                ref_columns = {ref for _, _, ref in fk['columns']}
+                # 削除をコメントで出力するテーブルは残るため、参照する外部キーもそのままにする
+                dropped = ref_key in self.dropped_tables and self.include_drops
+                if not dropped and not ref_columns & self.changed_references.get(ref_key, set()):
+                    continue
+                self.add('drop_fk', self.drop_constraint(table, fk['name']))
+                new_name = matches.get(fk['name'])
+                if new_name and ref_key in self.source_tables:
+                    self.add('create_fk', self.scripter.foreign_key_statement(source, source_fks[new_name]))
+
+    def build_script(self):
+        lines = []
+        for phase, title in self.PHASES:
+            if not self.statements[phase]:
+                continue
+            lines.append(f"\n-- {title}\n")
+            for statement in self.statements[phase]:
+                if statement.startswith("--"):
+                    lines.append(f"{statement}\n")
+                elif statement in self.commented:
+                    lines.append("".join(f"-- {line}\n" for line in statement.split("\n")))
+                else:
+                    lines.append(f"{statement}\nGO\n")
+        return "".join(lines).lstrip("\n")
+
+class SchemaDiffDialog:
+    """2つのデータベースのスキーマを比較し、ターゲットをソースに合わせる移行スクリプトを生成する"""
+
+    def __init__(self, sql_manager):
+        """
+        Args:
+            sql_manager: SQLTableManagerのインスタンス
+        """
+        self.sql_manager = sql_manager
+
+        self.dialog = tk.Toplevel(sql_manager.root)
+        self.dialog.title("スキーマ比較")
+        self.dialog.geometry("900x650")
+        self.dialog.transient(sql_manager.root)
+
+        server = sql_manager.connection_info['server']
+        self.source_server = tk.StringVar(value=server)
+        self.source_db = tk.StringVar(value=sql_manager.current_db or "")
+        self.target_server = tk.StringVar(value=server)
+        self.target_db = tk.StringVar()
+        self.include_drops = tk.BooleanVar(value=False)
+        self.status = tk.StringVar()
+
+        self.queue = queue.Queue()
+        self.worker = None
+        self.create_widgets()
+
+    def create_widgets(self):
+        main_frame = ttk.Frame(self.dialog, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+
+        databases = self.sql_manager.db_listbox.get(0, tk.END)
+        select_frame = ttk.Frame(main_frame)
+        select_frame.pack(fill=tk.X)
+        for row, (label, server, database) in enumerate((("ソース（目標のスキーマ）", self.source_server, self.source_db),
+                                                        ("ターゲット（変更対象）", self.target_server, self.target_db))):
+            ttk.Label(select_frame, text=label).grid(row=row, column=0, sticky='w', pady=2)
+            ttk.Label(select_frame, text="サーバー:").grid(row=row, column=1, padx=(10, 2))
+            ttk.Entry(select_frame, textvariable=server, width=20).grid(row=row, column=2)
+            ttk.Label(select_frame, text="データベース:").grid(row=row, column=3, padx=(10, 2))
+            combo = ttk.Combobox(select_frame, textvariable=database, values=databases, width=25)
+            combo.grid(row=row, column=4)
+            ttk.Button(select_frame, text="DB一覧取得",
+                       command=lambda server=server, combo=combo: self.load_databases(server, combo)).grid(
+                row=row, column=5, padx=5)
+
+        option_frame = ttk.Frame(main_frame)
+        option_frame.pack(fill=tk.X, pady=5)
+        ttk.Checkbutton(option_frame, text="テーブル・カラムの削除を含める（含めない場合はコメントとして出力）",
+                        variable=self.include_drops).pack(side=tk.LEFT)
+        self.compare_button = ttk.Button(option_frame, text="比較", command=self.start)
+        self.compare_button.pack(side=tk.LEFT, padx=10)
+        ttk.Button(option_frame, text="スクリプトを保存", command=self.save_script).pack(side=tk.LEFT)
+        ttk.Label(option_frame, textvariable=self.status).pack(side=tk.RIGHT)
+
+        paned = ttk.PanedWindow(main_frame, orient=tk.VERTICAL)
+        paned.pack(fill=tk.BOTH, expand=True)
+
+        columns = ("種別", "オブジェクト", "内容")
+        self.diff_tree = ttk.Treeview(paned, columns=columns, show="headings", height=10)
+        for column, width in zip(columns, (110, 330, 400)):
+            self.diff_tree.heading(column, text=column)
+            self.diff_tree.column(column, width=width)
+        paned.add(self.diff_tree, weight=1)
+
+        self.script_text = tk.Text(paned, height=12, wrap=tk.NONE)
+        paned.add(self.script_text, weight=1)
+
+    def load_databases(self, server, combo):
+        def read():
+            with self.sql_manager.connect_to_server(database="master", server=server.get().strip()) as conn:
+                return conn.cursor().execute("SELECT name FROM sys.databases WHERE database_id > 4").fetchall()
+
+        try:
+            rows = self.sql_manager.run_in_worker(lambda report: self.sql_manager.governor.run_read(read))
+            combo.config(values=[row[0] for row in rows])
+        except Exception as e:
+            messagebox.showerror("エラー", f"データベース一覧の取得に失敗しました: {str(e)}", parent=self.dialog)
+
+    def start(self):
+        if self.worker and self.worker.is_alive():
+            return
+        sides = [(self.source_server.get().strip(), self.source_db.get().strip()),
+                 (self.target_server.get().strip(), self.target_db.get().strip())]
+        if not all(server and database for server, database in sides):
+            messagebox.showwarning("警告", "ソースとターゲットのサーバーとデータベースを指定してください", parent=self.dialog)
+            return
+
+        self.status.set("比較中...")
+        self.compare_button.config(state=tk.DISABLED)
+        self.worker = threading.Thread(target=self.run_compare, args=(sides, self.include_drops.get()), daemon=True)
+        self.worker.start()
+        self.poll_queue()
+
+    def run_compare(self, sides, include_drops):
+        try:
+            started_at = time.perf_counter()
+            # 両方のカタログを並行して取得する
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                source, target = executor.map(
+                    lambda side: load_snapshot(self.sql_manager.governor, self.sql_manager.connection_info,
+                                               side[1], side[0]), sides)
+            differences, script = SchemaComparer(source, target, include_drops).compare()
+            self.queue.put(('result', (differences, script, len(source.tables), len(target.tables),
+                                       time.perf_counter() - started_at)))
+        except Exception as e:
+            self.queue.put(('error', str(e)))
+
+    def poll_queue(self):
+        try:
+            kind, payload = self.queue.get_nowait()
+        except queue.Empty:
+            self.dialog.after(200, self.poll_queue)
+            return
+
+        self.compare_button.config(state=tk.NORMAL)
+        if kind == 'error':
+            self.status.set("")
+            messagebox.showerror("エラー", f"スキーマの比較に失敗しました: {payload}", parent=self.dialog)
+            return
+
+        differences, script, source_count, target_count, elapsed = payload
+        self.diff_tree.delete(*self.diff_tree.get_children())
+        for difference in differences:
+            self.diff_tree.insert("", tk.END, values=difference)
+        self.script_text.delete("1.0", tk.END)
+        self.script_text.insert("1.0", script)
+        self.status.set(f"{source_count:,} / {target_count:,} テーブル　差分 {len(differences):,} 件　{elapsed:.1f} 秒")
+
+    def save_script(self):
+        script = self.script_text.get("1.0", "end-1c")
+        if not script:
+            return
+        path = filedialog.asksaveasfilename(parent=self.dialog, defaultextension=".sql",
+                                            filetypes=[("SQLファイル", "*.sql")])
+        if not path:
+            return
+        try:
+            with open(path, 'w', encoding='utf-8', newline='\n') as f:
+                f.write(script)
+        except Exception as e:
+            messagebox.showerror("エラー", f"スクリプトの保存に失敗しました: {str(e)}", parent=self.dialog)
+
+class TableCopyDialog:
+    """現在のテーブルを別のデータベース（同一サーバーまたは別サーバー）へ複製する
+
+    テーブルはインデックスなしのヒープとして作成してデータを流し込み、読み込み後に
+    主キーとインデックスを作成する。同一インスタンス内ではTABLOCK付きのINSERT ... SELECTで、
+    別サーバーへは主キーの範囲ごとに並列でfetchmanyとfast_executemanyを使って転送する。
+    """
+
+    # キューを確認する間隔（ミリ秒）
+    POLL_INTERVAL = 200
+
+    def __init__(self, sql_manager):
+        """
+        Args:
+            sql_manager: SQLTableManagerのインスタンス
+        """
+        self.sql_manager = sql_manager
+        self.source_db = sql_manager.current_db
+        self.table_name = sql_manager.current_table
+
+        self.dialog = tk.Toplevel(sql_manager.root)
+        self.dialog.title(f"テーブルの複製 - {self.source_db}.{self.table_name}")
+        self.dialog.geometry("560x430")
+        self.dialog.transient(sql_manager.root)
+
+        self.target_server = tk.StringVar(value=sql_manager.connection_info['server'])
+        self.target_db = tk.StringVar()
+        self.target_table = tk.StringVar(value=self.table_name)
+        self.copy_data = tk.BooleanVar(value=True)
+        self.batch_size = tk.StringVar(value="10000")
+        self.workers = tk.StringVar(value="4")
+        self.progress_text = tk.StringVar()
+
+        self.queue = queue.Queue()
+        self.stop_event = threading.Event()
+        self.worker = None
+        self.create_widgets()
+
+    def create_widgets(self):
+        main_frame = ttk.Frame(self.dialog, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+
+        ttk.Label(main_frame, text="コピー先サーバー:").grid(row=0, column=0, sticky='w', pady=3)
+        ttk.Entry(main_frame, textvariable=self.target_server, width=30).grid(row=0, column=1, sticky='w')
+        ttk.Button(main_frame, text="DB一覧取得", command=self.load_target_databases).grid(row=0, column=2, padx=5)
+
+        ttk.Label(main_frame, text="コピー先データベース:").grid(row=1, column=0, sticky='w', pady=3)
+        self.target_db_combo = ttk.Combobox(main_frame, textvariable=self.target_db, width=28,
+                                            values=self.sql_manager.db_listbox.get(0, tk.END))
+        self.target_db_combo.grid(row=1, column=1, sticky='w')
+
+        ttk.Label(main_frame, text="コピー先テーブル名:").grid(row=2, column=0, sticky='w', pady=3)
+        ttk.Entry(main_frame, textvariable=self.target_table, width=30).grid(row=2, column=1, sticky='w')
+
+        mode_frame = ttk.LabelFrame(main_frame, text="複製内容", padding="5")
+        mode_frame.grid(row=3, column=0, columnspan=3, sticky='ew', pady=5)
+        ttk.Radiobutton(mode_frame, text="スキーマのみ", variable=self.copy_data, value=False).pack(side=tk.LEFT, padx=5)
+        ttk.Radiobutton(mode_frame, text="スキーマとデータ", variable=self.copy_data, value=True).pack(side=tk.LEFT, padx=5)
+
+        option_frame = ttk.LabelFrame(main_frame, text="転送（別インスタンスへのコピー時）", padding="5")
+        option_frame.grid(row=4, column=0, columnspan=3, sticky='ew', pady=5)
+        ttk.Label(option_frame, text="バッチサイズ:").pack(side=tk.LEFT, padx=5)
+        ttk.Entry(option_frame, textvariable=self.batch_size, width=10).pack(side=tk.LEFT)
+        ttk.Label(option_frame, text="並列数:").pack(side=tk.LEFT, padx=5)
+        ttk.Entry(option_frame, textvariable=self.workers, width=5).pack(side=tk.LEFT)
+
+        self.progress_bar = ttk.Progressbar(main_frame, mode='determinate')
+        self.progress_bar.grid(row=5, column=0, columnspan=3, sticky='ew', pady=5)
+        ttk.Label(main_frame, textvariable=self.progress_text).grid(row=6, column=0, columnspan=3, sticky='w')
+
+        self.log_text = tk.Text(main_frame, height=8, width=70)
+        self.log_text.grid(row=7, column=0, columnspan=3, sticky='nsew', pady=5)
+        main_frame.rowconfigure(7, weight=1)
+        main_frame.columnconfigure(1, weight=1)
+
+        button_frame = ttk.Frame(main_frame)
+        button_frame.grid(row=8, column=0, columnspan=3, pady=5)
+        self.start_button = ttk.Button(button_frame, text="複製開始", command=self.start)
+        self.start_button.pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="停止", command=self.stop_event.set).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="閉じる", command=self.close).pack(side=tk.LEFT, padx=5)
+
+    def connect(self, server, database, read_only=False):
+        return self.sql_manager.connect_to_server(query_timeout=0, read_only=read_only,
+                                                  database=database, server=server)
+
+    def load_target_databases(self):
+        server = self.target_server.get().strip()
+
+        def read():
+            with self.connect(server, "master") as conn:
+                return conn.cursor().execute("SELECT name FROM sys.databases WHERE database_id > 4").fetchall()
+
+        try:
+            rows = self.sql_manager.run_in_worker(lambda report: self.sql_manager.governor.run_read(read))
+            self.target_db_combo.config(values=[row[0] for row in rows])
+        except Exception as e:
+            messagebox.showerror("エラー", f"データベース一覧の取得に失敗しました: {str(e)}", parent=self.dialog)
+
+    def start(self):
+        if self.worker and self.worker.is_alive():
+            return
+        target_server = self.target_server.get().strip()
+        target_db = self.target_db.get().strip()
+        target_table = self.target_table.get().strip()
+        if not (target_server and target_db and target_table):
+            messagebox.showwarning("警告", "コピー先のサーバー、データベース、テーブル名を入力してください",
+                                   parent=self.dialog)
+            return
+        if (target_server.lower() == self.sql_manager.connection_info['server'].lower()
+                and target_db == self.source_db and target_table == self.table_name):
+            messagebox.showwarning("警告", "コピー元と同じテーブルには複製できません", parent=self.dialog)
+            return
+        try:
+            batch_size = int(self.batch_size.get())
+            workers = int(self.workers.get())
+        except ValueError:
+            messagebox.showwarning("警告", "バッチサイズと並列数は整数で入力してください", parent=self.dialog)
+            return
+        if min(batch_size, workers) <= 0:
+            messagebox.showwarning("警告", "バッチサイズと並列数は1以上で入力してください", parent=self.dialog)
+            return
+
+        self.stop_event.clear()
+        self.log_text.delete("1.0", tk.END)
+        self.copied = 0
+        self.total = 0
+        self.started_at = time.perf_counter()
+        self.progress_bar.config(value=0, maximum=1)
+        self.start_button.config(state=tk.DISABLED)
+        self.worker = threading.Thread(
+            target=self.run_copy,
+            args=(target_server, target_db, target_table, self.copy_data.get(), batch_size, workers),
+            daemon=True)
+        self.worker.start()
+        self.poll_queue()
+
+    def run_copy(self, target_server, target_db, target_table, copy_data, batch_size, workers):
+        try:
+            # 作成とデータのコピーは再試行できないが、通信断などのエラーは回路の状態に反映する
+            self.sql_manager.governor.run(lambda: self.copy_table(target_server, target_db, target_table, copy_data,
+                                                                  batch_size, workers))
+        except Exception as e:
+            self.queue.put(('error', str(e)))
+        finally:
+            self.queue.put(('done', None))
+
+    def copy_table(self, target_server, target_db, target_table, copy_data, batch_size, workers):
+        source_server = self.sql_manager.connection_info['server']
+        with self.connect(source_server, self.source_db) as conn:
+            cursor = conn.cursor()
+            snapshot = CatalogSnapshot.load(cursor, self.table_name)
+            source_instance = cursor.execute("SELECT @@SERVERNAME").fetchone()[0]
+            row_count = cursor.execute("""
+                SELECT SUM(row_count) FROM sys.dm_db_partition_stats
+                WHERE object_id = OBJECT_ID(?) AND index_id IN (0, 1)
+            """, self.table_name).fetchone()[0] or 0
+
+        source = snapshot.find_table(self.table_name)
+        if source is None:
+            raise ValueError(f"テーブル '{self.table_name}' が見つかりません")
+        scripter = TableScripter(snapshot)
+
+        with self.connect(target_server, target_db) as conn:
+            conn.autocommit = True
+            cursor = conn.cursor()
+            target_instance = cursor.execute("SELECT @@SERVERNAME").fetchone()[0]
+            same_instance = source_instance == target_instance
+            target = scripter.renamed_table(source, target_table,
+                                            rename_constraints=same_instance and target_db == self.source_db)
+            if cursor.execute("SELECT OBJECT_ID(?, 'U')", scripter.qualified_name(target)).fetchone()[0]:
+                raise ValueError(f"コピー先に '{target_table}' が既に存在します")
+            if cursor.execute("SELECT SCHEMA_ID(?)", target['schema']).fetchone()[0] is None:
+                cursor.execute(f"EXEC('CREATE SCHEMA {quote_name(target['schema'])}')")
+            cursor.execute(scripter.create_table(target))
+            self.queue.put(('log', f"テーブル {scripter.qualified_name(target)} を作成しました"))
+
+            if copy_data and not self.stop_event.is_set():
+                self.queue.put(('total', row_count))
+                if same_instance:
+                    self.copy_same_instance(cursor, scripter, source, target, target_server, target_db)
+                else:
+                    self.copy_across_instances(scripter, source, target, target_server, target_db,
+                                               batch_size, workers)
+
+            if self.stop_event.is_set():
+                self.queue.put(('log', "停止しました（インデックスは作成していません）"))
+                return
+
+            # 読み込み後にキーとインデックスを作成する（クラスター化インデックスが先）
+            for statement in scripter.index_statements(target):
+                cursor.execute(statement)
+                self.queue.put(('log', statement))
+
+            # 外部キーは参照先がコピー先にあれば作成する
+            for statement in scripter.foreign_key_statements(target):
+                try:
+                    cursor.execute(statement)
+                    self.queue.put(('log', statement))
+                except pyodbc.Error as e:
+                    self.queue.put(('log', f"外部キーを作成できませんでした: {str(e)}"))
+        self.queue.put(('log', "複製が完了しました"))
+
+    def copy_same_instance(self, cursor, scripter, source, target, target_server, target_db):
+        """同一インスタンス内ではINSERT ... SELECTをTABLOCK付きで実行し、ヒープへの最小ログ記録を狙う"""
+        columns = ", ".join(quote_name(name) for name in scripter.insert_columns(source))
+        target_name = scripter.qualified_name(target)
+        identity = any(column['is_identity'] for column in source['columns'])
+
+        # 1文で実行するため、進捗は別の接続からコピー先の行数を確認して表示する
+        self.copy_finished = False
+        monitor = threading.Thread(target=self.monitor_rows, args=(target_server, target_db, target_name),
+                                   daemon=True)
+        monitor.start()
+        try:
+            if identity:
+                cursor.execute(f"SET IDENTITY_INSERT {target_name} ON")
+            cursor.execute(f"INSERT INTO {target_name} WITH (TABLOCK) ({columns}) "
+                           f"SELECT {columns} FROM {scripter.qualified_name(source, self.source_db)}")
+            self.queue.put(('rows', cursor.rowcount))
+            if identity:
+                cursor.execute(f"SET IDENTITY_INSERT {target_name} OFF")
+        finally:
+            self.copy_finished = True
+            monitor.join()
+
+    def monitor_rows(self, target_server, target_db, target_name):
+        try:
+            with self.connect(target_server, target_db) as conn:
+                cursor = conn.cursor()
+                while not self.copy_finished:
+                    count = cursor.execute("""
+                        SELECT SUM(row_count) FROM sys.dm_db_partition_stats
+                        WHERE object_id = OBJECT_ID(?) AND index_id IN (0, 1)
+                    """, target_name).fetchone()[0] or 0
+                    self.queue.put(('rows', count))
+                    time.sleep(1)
+        except pyodbc.Error:
+            pass
+
+    def copy_across_instances(self, scripter, source, target, target_server, target_db, batch_size, workers):
+        """主キーの範囲ごとに並列で読み出して書き込む"""
+        columns = scripter.insert_columns(source)
+        column_list = ", ".join(quote_name(name) for name in columns)
+        select_sql = f"SELECT {column_list} FROM {scripter.qualified_name(source)}"
+        insert_sql = (f"INSERT INTO {scripter.qualified_name(target)} ({column_list}) "
+                      f"VALUES ({', '.join('?' for _ in columns)})")
+        identity = any(column['is_identity'] for column in source['columns'])
+
+        ranges = [(None, None)]
+        key = scripter.range_key(source)
+        if key and workers > 1:
+            with self.connect(self.sql_manager.connection_info['server'], self.source_db, read_only=True) as conn:
+                low, high = conn.cursor().execute(
+                    f"SELECT MIN({quote_name(key)}), MAX({quote_name(key)}) FROM {scripter.qualified_name(source)}"
+                ).fetchone()
+            if low is not None:
+                step = (high - low) // workers + 1
+                ranges = [(start, min(start + step - 1, high)) for start in range(low, high + 1, step)]
+
+        def copy_range(bounds):
+            sql, params = select_sql, ()
+            if bounds[0] is not None:
+                sql += f" WHERE {quote_name(key)} BETWEEN ? AND ?"
+                params = bounds
+            with self.connect(self.sql_manager.connection_info['server'], self.source_db, read_only=True) as source_conn, \
+                    self.connect(target_server, target_db) as target_conn:
+                source_cursor = source_conn.cursor()
+                target_cursor = target_conn.cursor()
+                target_cursor.fast_executemany = True
+                if identity:
+                    target_cursor.execute(f"SET IDENTITY_INSERT {scripter.qualified_name(target)} ON")
+                source_cursor.execute(sql, *params)
+                while not self.stop_event.is_set():
+                    rows = source_cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    target_cursor.executemany(insert_sql, rows)
+                    target_conn.commit()
+                    self.queue.put(('progress', len(rows)))
+
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            for future in [executor.submit(copy_range, bounds) for bounds in ranges]:
+                future.result()
+
+    def poll_queue(self):
+        finished = False
+        while True:
+            try:
+                kind, payload = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'total':
+                self.total = payload
+                self.progress_bar.config(maximum=max(payload, 1))
+            elif kind == 'progress':
+                self.copied += payload
+            elif kind == 'rows':
+                self.copied = payload
+            elif kind == 'log':
+                self.log_text.insert(tk.END, payload + "\n")
+                self.log_text.see(tk.END)
+            elif kind == 'error':
+                messagebox.showerror("エラー", f"テーブルの複製に失敗しました: {payload}", parent=self.dialog)
+            elif kind == 'done':
+                finished = True
+
+        elapsed = time.perf_counter() - self.started_at
+        rate = self.copied / elapsed if elapsed > 0 else 0
+        self.progress_bar.config(value=self.copied)
+        self.progress_text.set(f"{self.copied:,} / {self.total:,} 行　{rate:,.0f} 行/秒　{elapsed:.1f} 秒")
+
+        if finished:
+            self.start_button.config(state=tk.NORMAL)
+            self.sql_manager.refresh_table_list(read_only=False)
+        else:
+            self.dialog.after(self.POLL_INTERVAL, self.poll_queue)
+
+    def close(self):
+        self.stop_event.set()
+        self.dialog.destroy()
+
+class SchemaSearchIndex:
+    """サーバー上の全データベースのテーブル名・カラム名の転置インデックス
+
+    名前を小文字の3文字組（トライグラム）に分解してエントリを引けるようにし、部分一致や
+    ワイルドカードの検索では、パターンのトライグラムを含むエントリだけを照合する。
+    データベース単位で入れ替えられるため、変更のあったデータベースだけを読み直せる。
+    """
+
+    GRAM_SIZE = 3
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}           # エントリID -> (データベース, スキーマ, テーブル, カラム, 型)
+        self.postings = {}          # トライグラム -> エントリIDの集合
+        self.database_entries = {}  # データベース -> エントリIDのリスト
+        self.fingerprints = {}      # データベース -> スキーマの変更検出用の値
+        self.next_id = 0
+
+    @classmethod
+    def grams(cls, text):
+        text = text.lower()
+        return {text[i:i + cls.GRAM_SIZE] for i in range(len(text) - cls.GRAM_SIZE + 1)}
+
+    def replace_database(self, database, fingerprint, rows):
+        """
+        Args:
+            database: データベース名
+            fingerprint: 変更検出用の値（次回の読み直し要否の判定に使う）
+            rows: (スキーマ, テーブル, カラム, 型) のリスト
+        """
+        with self.lock:
+            self.remove_entries(database)
+            entry_ids = []
+            for row in rows:
+                entry_id = self.next_id
+                self.next_id += 1
+                self.entries[entry_id] = (database,) + tuple(row)
+                for gram in self.grams(row[1]) | self.grams(row[2]):
+                    self.postings.setdefault(gram, set()).add(entry_id)
+                entry_ids.append(entry_id)
+            self.database_entries[database] = entry_ids
+            self.fingerprints[database] = fingerprint
+
+    def remove_database(self, database):
+        with self.lock:
+            self.remove_entries(database)
+            self.fingerprints.pop(database, None)
+
+    def remove_entries(self, database):
+        # lockを取得した状態で呼び出す
+        for entry_id in self.database_entries.pop(database, []):
+            entry = self.entries.pop(entry_id)
+            for gram in self.grams(entry[2]) | self.grams(entry[3]):
+                posting = self.postings.get(gram)
+                if posting is not None:
+                    posting.discard(entry_id)
+                    if not posting:
+                        del self.postings[gram]
+
+    def databases(self):
+        with self.lock:
+            return list(self.database_entries)
+
+    def search(self, pattern, limit=1000):
+        """テーブル名またはカラム名がパターンに一致するエントリを返す
+
+        Args:
+            pattern: 部分一致の文字列。* または ? を含む場合は名前全体とのワイルドカード一致
+            limit: 返す最大件数
+        """
+        pattern = pattern.strip().lower()
+        if not pattern:
+            return []
+
+        if '*' in pattern or '?' in pattern:
+            matcher = re.compile(fnmatch.translate(pattern)).match
+            literals = re.split(r"[*?]+", pattern)
+        else:
+            matcher = re.compile(re.escape(pattern)).search
+            literals = [pattern]
+
+        with self.lock:
+            candidates = None
+            for literal in literals:
+                for gram in self.grams(literal):
+                    posting = self.postings.get(gram, set())
+                    candidates = set(posting) if candidates is None else candidates & posting
+                    if not candidates:
+                        return []
+            if candidates is None:
+                # 3文字未満のパターンはトライグラムで絞り込めないため全件を照合する
+                candidates = self.entries.keys()
+            # 一致したものを全件並べ替えず、先頭のlimit件だけを取り出す
+            return heapq.nsmallest(limit, (self.entries[entry_id] for entry_id in candidates
+                                           if matcher(self.entries[entry_id][2].lower())
+                                           or matcher(self.entries[entry_id][3].lower())))
+
+class SchemaSearchPanel:
+    """メインウィンドウのスキーマ検索。全データベースのテーブル・カラムをバックグラウンドで索引化して検索する"""
+
+    # 索引化を並列に行うデータベースの数
+    MAX_WORKERS = 4
+
+    # 入力が止まってから検索するまでの時間（ミリ秒）
+    SEARCH_DELAY = 300
+
+    # 検索結果の最大表示件数
+    MAX_RESULTS = 1000
+
+    # データベースごとのテーブルとカラム
+    COLUMNS_SQL = """
+        SELECT s.name, t.name, c.name, TYPE_NAME(c.user_type_id), ty.is_user_defined,
+               c.max_length, c.precision, c.scale
+        FROM sys.tables t
+        JOIN sys.schemas s ON t.schema_id = s.schema_id
+        JOIN sys.columns c ON c.object_id = t.object_id
+        JOIN sys.types ty ON c.user_type_id = ty.user_type_id
+        WHERE t.is_ms_shipped = 0
+    """
+
+    # テーブルの追加・削除・変更で変わる値（ALTER TABLEでmodify_dateが更新される）
+    FINGERPRINT_SQL = """
+        SELECT COUNT(*), MAX(modify_date), CHECKSUM_AGG(CHECKSUM(object_id, modify_date))
+        FROM sys.tables
+    """
+
+    def __init__(self, parent, sql_manager):
+        """
+        Args:
+            parent: パネルを配置する親ウィジェット
+            sql_manager: SQLTableManagerのインスタンス
+        """
+        self.sql_manager = sql_manager
+        self.frame = ttk.Frame(parent)
+
+        self.index = SchemaSearchIndex()
+        self.queue = queue.Queue()
+        self.worker = None
+        self.indexed = False
+        self.search_id = None
+        self.refresh_id = None
+        self.pattern = tk.StringVar()
+        self.status = tk.StringVar(value="タブを開くと索引を作成します")
+        self.create_widgets()
+
+        self.pattern.trace_add('write', lambda *args: self.schedule_search())
+        # 全データベースへの問い合わせになるため、索引はタブを初めて開いたときに作成する
+        parent.bind('<<NotebookTabChanged>>', self.on_tab_changed, add='+')
+
+    def create_widgets(self):
+        toolbar = ttk.Frame(self.frame)
+        toolbar.pack(fill=tk.X, pady=2)
+        ttk.Label(toolbar, text="検索:").pack(side=tk.LEFT, padx=2)
+        ttk.Entry(toolbar, textvariable=self.pattern, width=30).pack(side=tk.LEFT, padx=2)
+        ttk.Label(toolbar, text="部分一致（* と ? でワイルドカード）").pack(side=tk.LEFT, padx=5)
+        ttk.Button(toolbar, text="再読込", command=self.refresh).pack(side=tk.LEFT, padx=5)
+        ttk.Label(toolbar, textvariable=self.status).pack(side=tk.RIGHT, padx=5)
+
+        columns = ("データベース", "スキーマ", "テーブル", "カラム", "型")
+        self.result_tree = ttk.Treeview(self.frame, columns=columns, show="headings")
+        for column in columns:
+            self.result_tree.heading(column, text=column)
+            self.result_tree.column(column, width=120)
+        self.result_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.result_tree.bind('<Double-1>', self.open_result)
+
+    def on_tab_changed(self, event):
+        if not self.indexed and event.widget.select() == str(self.frame):
+            self.refresh()
+
+    def schedule_refresh(self):
+        """接続設定の間隔で索引を定期的に更新する（0なら更新しない）"""
+        if self.refresh_id:
+            self.frame.after_cancel(self.refresh_id)
+            self.refresh_id = None
+        minutes = self.sql_manager.connection_info.get('schema_search_refresh_minutes', 0)
+        if self.indexed and minutes > 0:
+            self.refresh_id = self.frame.after(minutes * 60000, self.periodic_refresh)
+
+    def periodic_refresh(self):
+        self.refresh_id = None
+        self.refresh()
+
+    def reset(self):
+        """接続先のサーバーや認証情報が変わったときに、前の接続先の索引を破棄する"""
+        if self.refresh_id:
+            self.frame.after_cancel(self.refresh_id)
+            self.refresh_id = None
+        self.index = SchemaSearchIndex()
+        self.indexed = False
+        self.result_tree.delete(*self.result_tree.get_children())
+        self.status.set("タブを開くと索引を作成します")
+        # 表示中ならすぐに作り直す（索引化の途中なら、終わってから作り直す）
+        if self.frame.winfo_ismapped():
+            self.refresh()
+
+    def refresh(self):
+        if self.worker and self.worker.is_alive():
+            return
+        self.indexed = True
+        self.status.set("索引を更新中...")
+        self.worker = threading.Thread(target=self.run_refresh, args=(self.index,), daemon=True)
+        self.worker.start()
+        self.poll_queue()
+
+    def run_refresh(self, index):
+        """
+        Args:
+            index: 更新するSchemaSearchIndex（途中で接続先が変わっても新しい索引には書き込まない）
+        """
+        started_at = time.perf_counter()
+        try:
+            databases = [row[0] for row in self.sql_manager.read_rows(
+                "SELECT name FROM sys.databases WHERE database_id > 4 AND state_desc = 'ONLINE'")]
+            for database in set(index.databases()) - set(databases):
+                index.remove_database(database)
+
+            with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+                results = list(executor.map(lambda database: self.index_database(index, database), databases))
+            updated = sum(1 for result in results if result is True)
+            failed = [database for database, result in zip(databases, results) if isinstance(result, Exception)]
+
+            message = (f"{len(index.entries):,} カラム / {len(databases)} DB　"
+                       f"更新 {updated} DB　{time.perf_counter() - started_at:.1f} 秒")
+            if failed:
+                message += f"　取得失敗: {', '.join(failed)}"
+            self.queue.put((index, message))
+        except Exception as e:
+            self.queue.put((index, f"索引の更新に失敗しました: {str(e)}"))
+
+    def index_database(self, index, database):
+        """変更があればデータベースのカラムを読み直す
+
+        Returns:
+            読み直した場合はTrue、変更がなければFalse、失敗した場合は例外
+        """
+        def read():
+            with self.sql_manager.connect_to_server(read_only=True, database=database) as conn:
+                cursor = conn.cursor()
+                fingerprint = tuple(cursor.execute(self.FINGERPRINT_SQL).fetchone())
+                if index.fingerprints.get(database) == fingerprint:
+                    return fingerprint, None
+                return fingerprint, cursor.execute(self.COLUMNS_SQL).fetchall()
+
+        try:
+            fingerprint, rows = self.sql_manager.governor.run_read(read)
+        except Exception as e:
+            return e
+        if rows is None:
+            return False
+
+        scripter = TableScripter(None)
+        index.replace_database(database, fingerprint, [
+            (schema, table, column, scripter.format_type({
+                'type': type_name, 'is_user_defined': is_user_defined,
+                'max_length': max_length, 'precision': precision, 'scale': scale
+            }))
+            for schema, table, column, type_name, is_user_defined, max_length, precision, scale in rows
+        ])
+        return True
+
+    def poll_queue(self):
+        try:
+            index, payload = self.queue.get_nowait()
+        except queue.Empty:
+            self.frame.after(200, self.poll_queue)
+            return
+        if index is not self.index:
+            # 接続先が変わる前の索引化が終わった
+            if self.frame.winfo_ismapped():
+                self.refresh()
+            return
+        self.status.set(payload)
+        self.search()
+        self.schedule_refresh()
+
+    def schedule_search(self):
+        # 入力のたびではなく、入力が止まってから検索する
+        if self.search_id:
+            self.frame.after_cancel(self.search_id)
+        self.search_id = self.frame.after(self.SEARCH_DELAY, self.search)
+
+    def search(self):
+        self.search_id = None
+        self.result_tree.delete(*self.result_tree.get_children())
+        for entry in self.index.search(self.pattern.get(), self.MAX_RESULTS):
+            self.result_tree.insert("", tk.END, values=entry)
+
+    def open_result(self, event):
+        """検索結果のデータベースとテーブルを左側の一覧で選択する"""
+        selected_item = self.result_tree.selection()
+        if not selected_item:
+            return
+        database, schema, table = self.result_tree.item(selected_item[0])['values'][:3]
+
+        manager = self.sql_manager
+        for listbox, name, on_select in ((manager.db_listbox, str(database), manager.on_db_select),
+                                         (manager.table_listbox, str(table), manager.on_table_select)):
+            names = listbox.get(0, tk.END)
+            if name not in names:
+                return
+            position = names.index(name)
+            listbox.selection_clear(0, tk.END)
+            listbox.selection_set(position)
+            listbox.see(position)
+            on_select(None)
+
+class UIDiagnostics:
+    """Tkのイベントループの遅延と、UIのコールバックごとの処理時間を計測する
+
+    tkinterがイベントやafterのコールバックを呼び出す CallWrapper を差し替えて各コールバックの
+    処理時間を測り、しきい値を超えたものを停止として記録する。あわせてafterの心拍で
+    イベントループの遅延を測り、コールバックの外（描画など）で起きた停止も記録する。
+    """
+
+    # 心拍の間隔（ミリ秒）
+    HEARTBEAT_INTERVAL = 100
+
+    # 保持する停止の記録の最大件数
+    MAX_STALLS = 500
+
+    installed = False
+
+    def __init__(self, root, output_dir="diagnostics"):
+        """
+        Args:
+            root: 監視するTkのルートウィンドウ（ウィジェットの作成前に渡すこと）
+            output_dir: 停止のログとプロファイル結果の出力先
+        """
+        self.root = root
+        self.output_dir = output_dir
+        self.enabled = False
+        self.profiling = False
+        self.threshold_ms = 200
+        self.stalls = []
+        self.ticks = 0
+        self.expected_at = 0.0
+        self.last_callback = None
+        self.stall_since_tick = False
+        self.heartbeat_id = None
+        self.install()
+
+    def install(self):
+        """以降に登録されるすべてのコールバックを計測対象にする"""
+        if UIDiagnostics.installed:
+            return
+        UIDiagnostics.installed = True
+        diagnostics = self
+        original_call = tk.CallWrapper.__call__
+
+        class TimedCallWrapper(tk.CallWrapper):
+            def __call__(self, *args):
+                if not diagnostics.enabled:
+                    return original_call(self, *args)
+                return diagnostics.run_callback(self, original_call, args)
+
+        tk.CallWrapper = TimedCallWrapper
+
+    def enable(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        self.expected_at = time.perf_counter() + self.HEARTBEAT_INTERVAL / 1000
+        self.heartbeat_id = self.root.after(self.HEARTBEAT_INTERVAL, self.heartbeat)
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        # すぐに有効に戻しても心拍が二重にならないよう、予約済みの心拍を取り消す
+        if self.heartbeat_id:
+            self.root.after_cancel(self.heartbeat_id)
+            self.heartbeat_id = None
+
+    def heartbeat(self):
+        self.heartbeat_id = None
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        lag_ms = (now - self.expected_at) * 1000
+        self.ticks += 1
+
+        # コールバックの停止として記録済みの遅延は二重に記録しない
+        if lag_ms >= self.threshold_ms and not self.stall_since_tick:
+            previous = f"（直前: {self.last_callback}）" if self.last_callback else ""
+            self.record_stall("ループ遅延", f"描画・その他{previous}", lag_ms)
+        self.stall_since_tick = False
+
+        self.expected_at = now + self.HEARTBEAT_INTERVAL / 1000
+        self.heartbeat_id = self.root.after(self.HEARTBEAT_INTERVAL, self.heartbeat)
+
+    def run_callback(self, wrapper, call, args):
+        name = self.callback_name(wrapper.func)
+        ticks = self.ticks
+        profiler = cProfile.Profile() if self.profiling else None
+        started_at = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        try:
+            return call(wrapper, *args)
+        finally:
+            if profiler:
+                profiler.disable()
+            elapsed_ms = (time.perf_counter() - started_at) * 1000
+            self.last_callback = name
+            # 処理中に心拍が進んだ場合はダイアログなどの入れ子のイベントループが回っていたので停止ではない
+            if elapsed_ms >= self.threshold_ms and self.ticks == ticks:
+                self.stall_since_tick = True
+                self.record_stall("コールバック", name, elapsed_ms, profiler)
+
+    @staticmethod
+    def callback_name(func):
+        name = getattr(func, '__qualname__', None) or getattr(func, '__name__', repr(func))
+        if '<locals>' in name:
+            # afterのコールバックは内部の関数で包まれているため、元の関数名を使う
+            name = getattr(func, '__name__', name)
+        code = getattr(func, '__code__', None)
+        if name.endswith('<lambda>') and code:
+            name += f"（{code.co_firstlineno}行目）"
+        return name
+
+    def record_stall(self, kind, callback, duration_ms, profiler=None):
+        stall = {
+            'time': datetime.datetime.now().strftime("%H:%M:%S"),
+            'kind': kind,
+            'callback': callback,
+            'duration_ms': duration_ms,
+            'sql_ms': None, 'tk_ms': None, 'own_ms': None,
+            'profile': ""
+        }
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            if profiler:
+                stall.update(self.breakdown(profiler))
+                file_name = re.sub(r"[^\w.]+", "_", f"{datetime.datetime.now():%Y%m%d_%H%M%S_%f}_{callback}")
+                stall['profile'] = os.path.join(self.output_dir, f"{file_name}.prof")
+                profiler.dump_stats(stall['profile'])
+            with open(os.path.join(self.output_dir, "ui_stalls.log"), 'a', encoding='utf-8') as f:
+                f.write(f"{datetime.datetime.now():%Y-%m-%d %H:%M:%S}\t{kind}\t{duration_ms:.0f}ms\t{callback}"
+                        f"\t{stall['profile']}\n")
+        except OSError:
+            pass
+
+        self.stalls.append(stall)
+        if len(self.stalls) > self.MAX_STALLS:
+            self.stalls.sort(key=lambda item: item['duration_ms'], reverse=True)
+            del self.stalls[self.MAX_STALLS:]
+
+    def breakdown(self, profiler):
+        """プロファイル結果の自己時間を、SQL（pyodbc）・Tk（tkinter）・このツールのコードに分類する"""
+        own_file = os.path.basename(__file__)
+        sql = tk_time = own = 0.0
+        for (file_name, _, function), (_, _, total_time, _, _) in pstats.Stats(profiler).stats.items():
+            if 'pyodbc' in function:
+                sql += total_time
+            elif 'tkinter' in file_name or 'tkapp' in function:
+                tk_time += total_time
+            elif os.path.basename(file_name) == own_file:
+                own += total_time
+        return {'sql_ms': sql * 1000, 'tk_ms': tk_time * 1000, 'own_ms': own * 1000}
+
+    def worst_stalls(self, count=20):
+        return sorted(self.stalls, key=lambda stall: stall['duration_ms'], reverse=True)[:count]
+
+class DiagnosticsDialog:
+    """UIの応答性の診断。停止の多いコールバックと、その処理時間の内訳を表示する"""
+
+    # 表示を更新する間隔（ミリ秒）
+    REFRESH_INTERVAL = 1000
+
+    def __init__(self, sql_manager):
+        """
+        Args:
+            sql_manager: SQLTableManagerのインスタンス
+        """
+        self.diagnostics = sql_manager.diagnostics
+
+        self.dialog = tk.Toplevel(sql_manager.root)
+        self.dialog.title("UI診断")
+        self.dialog.geometry("850x420")
+        self.dialog.transient(sql_manager.root)
+
+        self.enabled = tk.BooleanVar(value=self.diagnostics.enabled)
+        self.profiling = tk.BooleanVar(value=self.diagnostics.profiling)
+        self.threshold = tk.StringVar(value=str(self.diagnostics.threshold_ms))
+
+        self.create_widgets()
+        self.refresh()
+
+    def create_widgets(self):
+        main_frame = ttk.Frame(self.dialog, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+
+        option_frame = ttk.Frame(main_frame)
+        option_frame.pack(fill=tk.X)
+        ttk.Checkbutton(option_frame, text="監視する", variable=self.enabled,
+                        command=self.apply_settings).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(option_frame, text="停止したコールバックのプロファイルを保存（cProfile）",
+                        variable=self.profiling, command=self.apply_settings).pack(side=tk.LEFT, padx=5)
+        ttk.Label(option_frame, text="しきい値(ミリ秒):").pack(side=tk.LEFT, padx=(10, 2))
+        ttk.Entry(option_frame, textvariable=self.threshold, width=6).pack(side=tk.LEFT)
+        ttk.Button(option_frame, text="反映", command=self.apply_settings).pack(side=tk.LEFT, padx=5)
+
+        ttk.Label(main_frame, text=f"ログとプロファイルの出力先: {os.path.abspath(self.diagnostics.output_dir)}").pack(
+            anchor='w', pady=5)
+
+        columns = ("時刻", "種別", "コールバック", "時間(ms)", "SQL(ms)", "Tk(ms)", "自コード(ms)", "プロファイル")
+        self.stall_tree = ttk.Treeview(main_frame, columns=columns, show="headings")
+        for column, width in zip(columns, (65, 85, 220, 70, 65, 65, 80, 200)):
+            self.stall_tree.heading(column, text=column)
+            self.stall_tree.column(column, width=width)
+        self.stall_tree.pack(fill=tk.BOTH, expand=True, pady=5)
+
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(pady=5)
+        ttk.Button(button_frame, text="クリア", command=self.clear).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="閉じる", command=self.dialog.destroy).pack(side=tk.LEFT, padx=5)
+
+    def apply_settings(self):
+        try:
+            self.diagnostics.threshold_ms = max(int(self.threshold.get()), 1)
+        except ValueError:
+            messagebox.showwarning("警告", "しきい値は整数で入力してください", parent=self.dialog)
+            return
+        self.diagnostics.profiling = self.profiling.get()
+        if self.enabled.get():
+            self.diagnostics.enable()
+        else:
+            self.diagnostics.disable()
+
+    def refresh(self):
+        if not self.dialog.winfo_exists():
+            return
+        self.stall_tree.delete(*self.stall_tree.get_children())
+        for stall in self.diagnostics.worst_stalls():
+            breakdown = [f"{stall[key]:.0f}" if stall[key] is not None else ""
+                         for key in ('sql_ms', 'tk_ms', 'own_ms')]
+            self.stall_tree.insert("", tk.END, values=(
+                stall['time'], stall['kind'], stall['callback'], f"{stall['duration_ms']:.0f}",
+                *breakdown, stall['profile']))
+        self.dialog.after(self.REFRESH_INTERVAL, self.refresh)
+
+    def clear(self):
+        self.diagnostics.stalls.clear()
+        self.stall_tree.delete(*self.stall_tree.get_children())
+
+class LockHoldersDialog:
+    """DDL実行前に、対象テーブルのロックを保持・待機しているセッションを表示する"""
+
+    def __init__(self, sql_manager, holders):
+        """
+        Args:
+            sql_manager: SQLTableManagerのインスタンス
+            holders: SQLTableManager.get_lock_holders() の結果
+        """
+        self.sql_manager = sql_manager
+        self.dialog = tk.Toplevel(sql_manager.root)
+        self.dialog.title(f"ロック保持セッション - {sql_manager.current_table}")
+        self.dialog.geometry("1000x350")
+        self.dialog.transient(sql_manager.root)
+        self.dialog.grab_set()
+
+        self.result = False
+        self.create_widgets()
+        self.show_holders(holders)
+
+    def create_widgets(self):
+        main_frame = ttk.Frame(self.dialog, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+
+        ttk.Label(main_frame, text="以下のセッションがテーブルのロックを保持または待機しています。\n"
+                                   "DDLはスキーマ変更ロックを必要とするため、これらの完了を待つことになります。").pack(anchor='w')
+
+        columns = ("SPID", "リソース", "モード", "状態", "ログイン", "ホスト", "プログラム",
+                   "コマンド", "待機", "ブロック元", "経過(ms)", "SQL")
+        self.holder_tree = ttk.Treeview(main_frame, columns=columns, show="headings")
+        for column, width in zip(columns, (50, 70, 50, 60, 90, 90, 120, 80, 90, 70, 70, 250)):
+            self.holder_tree.heading(column, text=column)
+            self.holder_tree.column(column, width=width)
+        self.holder_tree.pack(fill=tk.BOTH, expand=True, pady=5)
+
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(pady=5)
+        ttk.Button(button_frame, text="再確認", command=self.refresh).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="実行", command=self.ok).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="キャンセル", command=self.cancel).pack(side=tk.LEFT, padx=5)
+
+    def show_holders(self, holders):
+        self.holder_tree.delete(*self.holder_tree.get_children())
+        for holder in holders:
+            self.holder_tree.insert("", tk.END, values=tuple("" if value is None else value for value in holder))
+
+    def refresh(self):
         try:
-            if not self.sql_manager.current_db:
-                messagebox.showwarning("警告", "データベースが選択されていません")
-                return
-                
-            with self.connect_to_server() as conn:
-                cursor = conn.cursor()
-                cursor.execute(f"""
-                    SELECT COLUMN_NAME 
-                    FROM INFORMATION_SCHEMA.COLUMNS 
-                    WHERE TABLE_NAME = '{self.ref_table.get()}'
-                    AND (COLUMNPROPERTY(OBJECT_ID(TABLE_SCHEMA + '.' + TABLE_NAME), COLUMN_NAME, 'IsIdentity') = 1
-                    OR EXISTS (
-                        SELECT 1 
-                        FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE 
-                        WHERE TABLE_NAME = '{self.ref_table.get()}' 
-                        AND COLUMN_NAME = INFORMATION_SCHEMA.COLUMNS.COLUMN_NAME
-                    ))
-                """)
-                columns = [row[0] for row in cursor.fetchall()]
-                self.ref_column_combo['values'] = columns
+            self.show_holders(self.sql_manager.get_lock_holders())
         except Exception as e:
-            messagebox.showerror("エラー", f"カラム一覧の取得に失敗しました: {str(e)}")
+            messagebox.showerror("エラー", f"ロック状況の取得に失敗しました: {str(e)}", parent=self.dialog)
 
-    def toggle_computation_formula(self):
-        if self.is_computed.get():
-            self.formula_frame.pack(fill=tk.X, padx=5, pady=5)
-        else:
-            self.formula_frame.pack_forget()
-            
-    def get_full_data_type(self):
-        base_type = self.selected_type.get()
-        if base_type in DataTypes.TYPES_WITH_LENGTH and self.length.get():
-            return f"{base_type}({self.length.get()})"
-        elif base_type in DataTypes.TYPES_WITH_PRECISION:
-            precision = self.precision.get() or "18"
-            scale = self.scale.get() or "0"
-            return f"{base_type}({precision},{scale})"
-        return base_type
-        
-    def validate(self):
-        if not self.column_name.get().strip():
-            messagebox.showwarning("警告", "カラム名を入力してください")
-            return False
-            
-        if self.is_computed.get() and not self.computation_formula.get().strip():
-            messagebox.showwarning("警告", "計算式を入力してください")
-            return False
-            
-        return True
-        
     def ok(self):
-        if not self.validate():
-            return
-            
-        self.result = {
-            'name': self.column_name.get().strip(),
-            'data_type': self.get_full_data_type(),
-            'is_primary': self.is_primary.get(),
-            'is_nullable': self.is_nullable.get(),
-            'is_computed': self.is_computed.get(),
-            'is_foreign_key' : self.is_foreign_key.get(),
-            'ref_table' : self.ref_table.get(),
-            'ref_column': self.ref_column.get(),
-            'computation_formula': self.computation_formula.get().strip() if self.is_computed.get() else None
-        }
+        self.result = True
         self.dialog.destroy()
-        
+
     def cancel(self):
         self.dialog.destroy()
 
@@ -391,6 +4364,9 @@ class SQLTableManager:
         self.root = tk.Tk()
         self.root.title("SQLテーブル管理ツール")
         self.root.geometry("1100x800")
+
+        # UI診断（コールバックを計測するため、ウィジェットより先に用意する）
+        self.diagnostics = UIDiagnostics(self.root)
         
         # 設定ファイルのパス
         self.settings_file = "connection_settings.json"
@@ -400,6 +4376,10 @@ class SQLTableManager:
         
         self.current_db = None # current_dbを初期化する
         self.current_table = None
+        self.columns_data = []
+        self.governor = QueryGovernor()
+        # サーバー名 -> ONLINE = ON (WAIT_AT_LOW_PRIORITY ...) を使えるか
+        self.low_priority_support = {}
         self.setup_ui()
 
     def check_and_install_driver(self):
@@ -508,7 +4488,13 @@ class SQLTableManager:
             'server': 'NTC18',
             'username': 'sa',
             'password': 'Ntc002611',
-            'driver': 'ODBC Driver 17 for SQL Server'
+            'driver': 'ODBC Driver 17 for SQL Server',
+            'login_timeout': 15,
+            'query_timeout': 30,
+            'lock_timeout_ms': 5000,
+            'ddl_retries': 3,
+            'low_priority_minutes': 0,
+            'schema_search_refresh_minutes': 0
         }
         
         # ドライバのチェックとインストール
@@ -546,7 +4532,24 @@ class SQLTableManager:
         settings_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="設定", menu=settings_menu)
         settings_menu.add_command(label="接続設定", command=self.show_connection_settings)
+
+        # ツールメニュー
+        tools_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="ツール", menu=tools_menu)
+        tools_menu.add_command(label="型最適化アドバイザー", command=self.show_type_advisor)
+        tools_menu.add_command(label="統計情報", command=self.show_statistics)
+        tools_menu.add_command(label="テストデータ生成", command=self.show_data_generator)
+        tools_menu.add_command(label="テーブルの複製", command=self.show_table_copy)
+        tools_menu.add_command(label="スクリプト生成", command=self.show_database_script)
+        tools_menu.add_command(label="スキーマ比較", command=self.show_schema_diff)
+        tools_menu.add_separator()
+        tools_menu.add_command(label="UI診断", command=self.show_diagnostics)
         
+        # ステータスバー（接続状態の表示）
+        self.governor_status = tk.StringVar()
+        ttk.Label(self.root, textvariable=self.governor_status, relief=tk.SUNKEN, anchor='w').pack(side=tk.BOTTOM, fill=tk.X)
+        self.update_governor_status()
+
         # メインフレームの作成
         main_frame = ttk.Frame(self.root)
         main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -604,14 +4607,28 @@ class SQLTableManager:
         right_frame = ttk.Frame(main_frame)
         right_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
 
+        # カラム一覧とSQLコンソールをタブで切り替え
+        right_notebook = ttk.Notebook(right_frame)
+        right_notebook.pack(fill=tk.BOTH, expand=True)
+        column_tab = ttk.Frame(right_notebook)
+        right_notebook.add(column_tab, text="カラム一覧")
+
         # カラム一覧表示
-        self.column_tree = ttk.Treeview(right_frame, columns=("名前", "型", "主キー", "NULL許可"), show="headings")
+        self.column_tree = ttk.Treeview(column_tab, columns=("名前", "型", "主キー", "NULL許可"), show="headings")
         self.column_tree.heading("名前", text="カラム名")
         self.column_tree.heading("型", text="データ型")
         self.column_tree.heading("主キー", text="主キー")
         self.column_tree.heading("NULL許可", text="NULL許可")
         self.column_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
+        # SQLコンソール
+        self.query_console = QueryConsole(right_notebook, self)
+        right_notebook.add(self.query_console.frame, text="SQLコンソール")
+
+        # スキーマ検索
+        self.schema_search = SchemaSearchPanel(right_notebook, self)
+        right_notebook.add(self.schema_search.frame, text="スキーマ検索")
+
         # 初期状態の設定
         self.refresh_database_list()
 
@@ -620,45 +4637,130 @@ class SQLTableManager:
         dialog.dialog.wait_window()
         
         if dialog.result:
+            previous = self.connection_info
             self.connection_info = dialog.result
+            self.low_priority_support = {}
+            if any(previous.get(key) != dialog.result.get(key)
+                   for key in ('server', 'read_server', 'username', 'password', 'driver')):
+                self.schema_search.reset()
             self.save_connection_settings(dialog.result)
             # 接続情報が変更されたので、データベース一覧を更新
             self.refresh_database_list()
+            self.schema_search.schedule_refresh()
 
-    def connect_to_server(self):
-        connection_string = (
-            f"DRIVER={{{self.connection_info['driver']}}};"
-            f"SERVER={self.connection_info['server']};"
-            f"UID={self.connection_info['username']};"
-            f"PWD={self.connection_info['password']}"
-        )
-        if self.current_db:
-            connection_string += f";DATABASE={self.current_db}"
-        return pyodbc.connect(connection_string)
+    def connect_to_server(self, query_timeout=None, read_only=False, database=None, server=None):
+        """
+        Args:
+            query_timeout: クエリタイムアウト（秒、0で無制限）。省略時は接続設定の値
+            read_only: カタログ参照やデータ閲覧などの読み取り専用の処理ならTrue。
+                DDLや更新は常にプライマリで実行する
+            database: 接続先のデータベース。省略時は選択中のデータベース
+            server: 接続先のサーバー。省略時は接続設定のサーバー
+        """
+        settings = self.connection_info
+        if server and server.lower() != settings['server'].lower():
+            # 別サーバーへは同じ認証情報で接続する（読み取り用サーバーへの振り分けは行わない）
+            settings = dict(settings, server=server, read_server='')
+        connection_string = build_connection_string(settings, database or self.current_db, read_only)
+        if query_timeout is None:
+            query_timeout = int(self.connection_info.get('query_timeout', 30))
+        return self.governor.connect(
+            connection_string, int(self.connection_info.get('login_timeout', 15)), query_timeout,
+            connection_attributes(self.connection_info))
 
-    def refresh_database_list(self):
-        try:
-            with self.connect_to_server() as conn:
+    def read_rows(self, sql, *params, read_only=True):
+        """冪等な読み取りクエリを実行し、一時エラーの場合は再試行してから全行を返す
+
+        Args:
+            read_only: Falseの場合はプライマリから読む（直前の変更を確実に反映したい場合やロック情報など）
+        """
+        def read():
+            with self.connect_to_server(read_only=read_only) as conn:
                 cursor = conn.cursor()
-                cursor.execute("SELECT name FROM sys.databases WHERE database_id > 4")
-                self.db_listbox.delete(0, tk.END)
-                for db in cursor.fetchall():
-                    self.db_listbox.insert(tk.END, db[0])
+                cursor.execute(sql, *params)
+                return cursor.fetchall()
+        return self.run_in_worker(lambda report: self.governor.run_read(read))
+
+    def run_in_worker(self, func, message="処理中..."):
+        """funcをワーカースレッドで実行し、終わるまで処理中の表示を出してイベントループを回しながら待つ
+
+        再試行の待機やロック待ちでUIスレッドを止めないためのもの。呼び出し元には同期的に結果を返し、
+        例外はそのまま送出する。待っている間の入力は処理中ダイアログのグラブで止める。
+
+        Args:
+            func: ワーカースレッドで実行する関数。進捗を表示する関数（文字列を1つ受け取る）を引数に取る
+            message: 処理中ダイアログに表示する文言
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return func(lambda text: None)
+
+        reports = queue.Queue()
+        result = {}
+
+        def work():
+            try:
+                result['value'] = func(reports.put)
+            except Exception as e:
+                result['error'] = e
+
+        worker = threading.Thread(target=work, daemon=True)
+        worker.start()
+        # すぐに終わる処理ではダイアログを出さない
+        worker.join(0.2)
+        if worker.is_alive():
+            previous_grab = self.root.grab_current()
+            busy = tk.Toplevel(self.root)
+            busy.title("処理中")
+            busy.transient(previous_grab.winfo_toplevel() if previous_grab else self.root)
+            busy.protocol("WM_DELETE_WINDOW", lambda: None)
+            status = tk.StringVar(master=busy, value=message)
+            ttk.Label(busy, textvariable=status, padding="20").pack()
+            busy.grab_set()
+            done = tk.BooleanVar(master=busy, value=False)
+
+            def check():
+                while not reports.empty():
+                    status.set(f"{message}\n{reports.get_nowait()}")
+                if worker.is_alive():
+                    busy.after(100, check)
+                else:
+                    done.set(True)
+
+            check()
+            busy.wait_variable(done)
+            busy.grab_release()
+            busy.destroy()
+            if previous_grab is not None and previous_grab.winfo_exists():
+                previous_grab.grab_set()
+
+        if 'error' in result:
+            raise result['error']
+        return result.get('value')
+
+    def update_governor_status(self):
+        self.governor_status.set(self.governor.status_text())
+        self.root.after(1000, self.update_governor_status)
+
+    def refresh_database_list(self, read_only=True):
+        try:
+            databases = self.read_rows("SELECT name FROM sys.databases WHERE database_id > 4", read_only=read_only)
+            self.db_listbox.delete(0, tk.END)
+            for db in databases:
+                self.db_listbox.insert(tk.END, db[0])
         except Exception as e:
             error_type = type(e).__name__
             error_message = str(e)
             messagebox.showerror("エラー", f"データベース一覧の取得に失敗しました: {str(e)}: {error_type}: {error_message}")
 
-    def refresh_table_list(self):
+    def refresh_table_list(self, read_only=True):
         if not self.current_db:
             return
         try:
-            with self.connect_to_server() as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_TYPE = 'BASE TABLE'")
-                self.table_listbox.delete(0, tk.END)
-                for table in cursor.fetchall():
-                    self.table_listbox.insert(tk.END, table[0])
+            tables = self.read_rows("SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_TYPE = 'BASE TABLE'",
+                                    read_only=read_only)
+            self.table_listbox.delete(0, tk.END)
+            for table in tables:
+                self.table_listbox.insert(tk.END, table[0])
         except Exception as e:
             messagebox.showerror("エラー", f"テーブル一覧の取得に失敗しました: {str(e)}")
 
@@ -668,13 +4770,17 @@ class SQLTableManager:
             messagebox.showwarning("警告", "データベース名を入力してください")
             return
 
-        try:
+        def create():
             with self.connect_to_server() as conn:
                 cursor = conn.cursor()
                 cursor.execute(f"CREATE DATABASE {db_name}")
                 conn.commit()
+
+        try:
+            self.governor.run(create)
             messagebox.showinfo("成功", f"データベース '{db_name}' を作成しました")
-            self.refresh_database_list()
+            # 作成直後はセカンダリに反映されていない可能性があるためプライマリから読む
+            self.refresh_database_list(read_only=False)
             self.db_entry.delete(0, tk.END)
         except Exception as e:
             messagebox.showerror("エラー", f"データベースの作成に失敗しました: {str(e)}")
@@ -689,14 +4795,17 @@ class SQLTableManager:
             messagebox.showwarning("警告", "テーブル名を入力してください")
             return
 
-        try:
+        def create():
             with self.connect_to_server() as conn:
                 cursor = conn.cursor()
                 # IDENTITYを追加してAUTO_INCREMENTを実現
                 cursor.execute(f"CREATE TABLE {table_name} (ID INT IDENTITY(1,1) PRIMARY KEY)")
                 conn.commit()
+
+        try:
+            self.governor.run(create)
             messagebox.showinfo("成功", f"テーブル '{table_name}' を作成しました")
-            self.refresh_table_list()
+            self.refresh_table_list(read_only=False)
             self.table_entry.delete(0, tk.END)
         except Exception as e:
             messagebox.showerror("エラー", f"テーブルの作成に失敗しました: {str(e)}")
@@ -712,62 +4821,257 @@ class SQLTableManager:
         if not dialog.result:
             return
             
-        try:
-            with self.connect_to_server() as conn:
-                cursor = conn.cursor()
-                
-                if dialog.result['is_computed']:
-    # 計算列の追加
-                    sql = f"""ALTER TABLE {self.current_table} 
-                            ADD {dialog.result['name']} AS {dialog.result['computation_formula']}"""
-                else:
-                    # 通常のカラム追加
-                    # 主キーで数値型の場合はIDENTITYを追加
-                    data_type = dialog.result['data_type']
-                    is_numeric = any(type in data_type.upper() for type in ['INT', 'BIGINT', 'SMALLINT', 'TINYINT'])
-                    
-                    if dialog.result['is_primary'] and is_numeric:
-                        # IDENTITY(1,1)を追加：開始値1, 増分値1
-                        identity_clause = "IDENTITY(1,1)"
-                    else:
-                        identity_clause = ""
-                    
-                    constraint = "PRIMARY KEY" if dialog.result['is_primary'] else ""
-                    null_constraint = "NULL" if dialog.result['is_nullable'] else "NOT NULL"
-                    
-                    sql = f"""ALTER TABLE {self.current_table} 
-                            ADD {dialog.result['name']} {data_type} {identity_clause} {constraint} {null_constraint}"""
-                    
-                    cursor.execute(sql)
-                    conn.commit()
+        def add(cursor):
+            if dialog.result['is_computed']:
+                # 計算列の追加
+                self.create_computed_column(cursor, dialog.result)
+                return
 
-                    # 外部キーの設定
-                    if dialog.result.get('is_foreign_key', False):
-                        ref_table = dialog.result.get('ref_table')
-                        ref_column = dialog.result.get('ref_column')
-                        if ref_table and ref_column:
-                            fk_constraint_name = f"FK_{self.current_table}_{dialog.result['name']}"
-                            cursor.execute(f"""
-                                ALTER TABLE {self.current_table}
-                                ADD CONSTRAINT {fk_constraint_name}
-                                FOREIGN KEY ({dialog.result['name']})
-                                REFERENCES {ref_table}({ref_column})
-                            """)
-                            conn.commit()
+            # 通常のカラム追加
+            # 主キーで数値型の場合はIDENTITYを追加
+            data_type = dialog.result['data_type']
+            is_numeric = any(type in data_type.upper() for type in ['INT', 'BIGINT', 'SMALLINT', 'TINYINT'])
+            
+            if dialog.result['is_primary'] and is_numeric:
+                # IDENTITY(1,1)を追加：開始値1, 増分値1
+                identity_clause = "IDENTITY(1,1)"
+            else:
+                identity_clause = ""
+            
+            constraint = "PRIMARY KEY" if dialog.result['is_primary'] else ""
+            null_constraint = "NULL" if dialog.result['is_nullable'] else "NOT NULL"
+            
+            sql = f"""ALTER TABLE {self.current_table} 
+                    ADD {dialog.result['name']} {data_type} {identity_clause} {constraint} {null_constraint}"""
+            
+            cursor.execute(sql)
 
+            # 外部キーの設定
+            if dialog.result.get('is_foreign_key', False):
+                ref_table = dialog.result.get('ref_table')
+                ref_column = dialog.result.get('ref_column')
+                if ref_table and ref_column:
+                    fk_constraint_name = f"FK_{self.current_table}_{dialog.result['name']}"
+                    cursor.execute(f"""
+                        ALTER TABLE {self.current_table}
+                        ADD CONSTRAINT {fk_constraint_name}
+                        FOREIGN KEY ({dialog.result['name']})
+                        REFERENCES {ref_table}({ref_column})
+                    """)
+
+        try:
+            if not self.run_ddl(add):
+                return
                 
-                self.column_tree.insert("", tk.END, values=(
-                    dialog.result['name'],
-                    dialog.result['data_type'],
-                    "はい" if dialog.result['is_primary'] else "いいえ",
-                    "はい" if dialog.result['is_nullable'] else "いいえ"
-                ))
-                
-                messagebox.showinfo("成功", f"カラム '{dialog.result['name']}' を追加しました")
+            self.column_tree.insert("", tk.END, values=(
+                dialog.result['name'],
+                dialog.result['data_type'],
+                "はい" if dialog.result['is_primary'] else "いいえ",
+                "はい" if dialog.result['is_nullable'] else "いいえ"
+            ))
+            
+            messagebox.showinfo("成功", f"カラム '{dialog.result['name']}' を追加しました")
                 
         except Exception as e:
             messagebox.showerror("エラー", f"カラムの追加に失敗しました: {str(e)}")
 
+    def create_computed_column(self, cursor, column):
+        """計算列を追加し、決定性と精度を確認したうえでPERSISTED化とインデックス作成を行う
+
+        Args:
+            cursor: 実行に使うカーソル（コミットは呼び出し側で行う）
+            column: ColumnDialog.result
+        """
+        column_name = column['name']
+        cursor.execute(f"ALTER TABLE {self.current_table} ADD {column_name} AS {column['computation_formula']}")
+
+        if not (column['is_persisted'] or column['create_index']):
+            return
+
+        cursor.execute("""
+            SELECT COLUMNPROPERTY(OBJECT_ID(?), ?, 'IsDeterministic'),
+                   COLUMNPROPERTY(OBJECT_ID(?), ?, 'IsPrecise')
+        """, self.current_table, column_name, self.current_table, column_name)
+        is_deterministic, is_precise = cursor.fetchone()
+
+        if not is_deterministic:
+            raise ValueError(f"計算式が非決定的なため、PERSISTEDやインデックスは設定できません: {column['computation_formula']}")
+        if column['create_index'] and not is_precise and not column['is_persisted']:
+            raise ValueError("計算式が不正確（浮動小数点を含む）なため、インデックスを作成するにはPERSISTEDが必要です")
+
+        if column['is_persisted']:
+            cursor.execute(f"ALTER TABLE {self.current_table} ALTER COLUMN {column_name} ADD PERSISTED")
+        if column['create_index']:
+            cursor.execute(f"CREATE INDEX IX_{self.current_table}_{column_name} "
+                           f"ON {self.current_table} ({column_name}){self.low_priority_clause(cursor)}")
+
+    def run_ddl(self, action):
+        """テーブルのロック保持者を確認してから、ロックタイムアウトと再試行付きでDDLを実行する
+
+        Sch-Mロックの要求が長時間の読み取りの後ろで待つと、後続のすべてのクエリが
+        その後ろに並んでしまうため、待ち時間を区切って失敗させ、間隔を空けて再試行する。
+
+        Args:
+            action: カーソルを受け取ってDDLを実行する関数（コミットはこのメソッドで行う）
+        Returns:
+            実行した場合はTrue、ユーザーが中止した場合はFalse
+        """
+        if not self.confirm_lock_holders():
+            return False
+
+        lock_timeout = int(self.connection_info.get('lock_timeout_ms', 5000))
+        retries = int(self.connection_info.get('ddl_retries', 3))
+
+        def execute(report):
+            # ロック待ちと再試行の待機はワーカースレッドで行い、UIスレッドを止めない
+            delay = 1.0
+            for attempt in range(retries + 1):
+                try:
+                    # 待ち時間はロックタイムアウトで区切るため、クエリタイムアウトは設けない
+                    with self.connect_to_server(query_timeout=0) as conn:
+                        cursor = conn.cursor()
+                        cursor.execute(f"SET LOCK_TIMEOUT {lock_timeout}")
+                        action(cursor)
+                        conn.commit()
+                    self.governor.record_success()
+                    return True
+                except pyodbc.Error as e:
+                    if not getattr(e, 'recorded_by_governor', False):
+                        self.governor.record_failure(e)
+                    if attempt == retries or not self.is_lock_timeout(e):
+                        raise
+                    # 再試行のたびに待ち時間を倍にし、揺らぎを加えて一斉再試行を避ける
+                    wait = delay + random.uniform(0, delay)
+                    report(f"ロックを取得できなかったため {wait:.1f} 秒後に再試行します（{attempt + 1}/{retries}）")
+                    time.sleep(wait)
+                    delay *= 2
+
+        return self.run_in_worker(execute, f"テーブル '{self.current_table}' を変更しています...")
+
+    def is_lock_timeout(self, error):
+        """ロック要求のタイムアウト（エラー1222）かどうか"""
+        return 1222 in native_error_numbers(error)
+
+    def low_priority_clause(self, cursor):
+        """WAIT_AT_LOW_PRIORITYを使う設定で、接続先が対応している場合はWITH句を返す
+
+        オンライン操作が可能な CREATE INDEX / ADD CONSTRAINT でのみ使用する。
+
+        Args:
+            cursor: DDLを実行する接続のカーソル
+        """
+        minutes = int(self.connection_info.get('low_priority_minutes', 0))
+        if minutes <= 0 or not self.supports_low_priority(cursor):
+            return ""
+        return (f" WITH (ONLINE = ON (WAIT_AT_LOW_PRIORITY "
+                f"(MAX_DURATION = {minutes} MINUTES, ABORT_AFTER_WAIT = SELF)))")
+
+    def supports_low_priority(self, cursor):
+        """接続先で ONLINE = ON (WAIT_AT_LOW_PRIORITY ...) を使えるか（サーバーごとに1回だけ確認する）
+
+        ONLINEはEnterprise（Developerを含む）とAzureでのみ使え、CREATE INDEX と ADD CONSTRAINT での
+        WAIT_AT_LOW_PRIORITYは SQL Server 2022 以降が必要。
+        """
+        server = self.connection_info['server'].lower()
+        if server not in self.low_priority_support:
+            edition, major_version = cursor.execute(
+                "SELECT CAST(SERVERPROPERTY('EngineEdition') AS INT), "
+                "CAST(SERVERPROPERTY('ProductMajorVersion') AS INT)").fetchone()
+            # 3: Enterprise・Developer、5: Azure SQL Database、8: Azure SQL Managed Instance
+            self.low_priority_support[server] = edition in (5, 8) or (edition == 3 and (major_version or 0) >= 16)
+        return self.low_priority_support[server]
+
+    def confirm_lock_holders(self):
+        """現在のテーブルでロックを保持・待機しているセッションがあれば表示して実行可否を確認"""
+        try:
+            holders = self.get_lock_holders()
+        except Exception as e:
+            return messagebox.askyesno("確認", f"ロック状況を取得できませんでした: {str(e)}\n続行しますか？")
+
+        if not holders:
+            return True
+
+        dialog = LockHoldersDialog(self, holders)
+        dialog.dialog.wait_window()
+        return dialog.result
+
+    def get_lock_holders(self):
+        return self.read_rows("""
+            SELECT DISTINCT
+                l.request_session_id,
+                l.resource_type,
+                l.request_mode,
+                l.request_status,
+                s.login_name,
+                s.host_name,
+                s.program_name,
+                r.command,
+                r.wait_type,
+                r.blocking_session_id,
+                r.total_elapsed_time,
+                LEFT(t.text, 200)
+            FROM sys.dm_tran_locks l
+            JOIN sys.dm_exec_sessions s ON s.session_id = l.request_session_id
+            LEFT JOIN sys.dm_exec_requests r ON r.session_id = l.request_session_id
+            OUTER APPLY sys.dm_exec_sql_text(r.sql_handle) t
+            WHERE l.resource_database_id = DB_ID()
+            AND l.request_session_id <> @@SPID
+            AND (
+                (l.resource_type = 'OBJECT' AND l.resource_associated_entity_id = OBJECT_ID(?))
+                OR l.resource_associated_entity_id IN (
+                    SELECT hobt_id FROM sys.partitions WHERE object_id = OBJECT_ID(?))
+            )
+            ORDER BY l.request_session_id
+        """, self.current_table, self.current_table, read_only=False)
+
+    def get_column_indexes(self, column_name):
+        """カラムを含むインデックス（主キー・一意制約を除く）の名前と、そのインデックスのカラム一覧"""
+        return self.read_rows("""
+            SELECT i.name, STUFF((
+                SELECT ', ' + c2.name
+                FROM sys.index_columns ic2
+                JOIN sys.columns c2 ON ic2.object_id = c2.object_id AND ic2.column_id = c2.column_id
+                WHERE ic2.object_id = i.object_id AND ic2.index_id = i.index_id
+                ORDER BY ic2.is_included_column, ic2.key_ordinal, ic2.index_column_id
+                FOR XML PATH('')), 1, 2, '')
+            FROM sys.indexes i
+            WHERE i.object_id = OBJECT_ID(?) AND i.is_primary_key = 0 AND i.is_unique_constraint = 0
+            AND EXISTS (
+                SELECT 1 FROM sys.index_columns ic
+                JOIN sys.columns c ON ic.object_id = c.object_id AND ic.column_id = c.column_id
+                WHERE ic.object_id = i.object_id AND ic.index_id = i.index_id AND c.name = ?
+            )
+            ORDER BY i.name
+        """, self.current_table, column_name, read_only=False)
+
+    def confirm_column_indexes(self, column_name, message, ask_without_indexes=True):
+        """カラムを含むインデックスを一覧にして、あわせて削除してよいか確認する
+
+        Args:
+            ask_without_indexes: Falseの場合、該当するインデックスがなければ確認しない
+        Returns:
+            削除するインデックス名のリスト。中止した場合はNone
+        """
+        try:
+            indexes = self.get_column_indexes(column_name)
+        except Exception as e:
+            messagebox.showerror("エラー", f"インデックス情報の取得に失敗しました: {str(e)}")
+            return None
+
+        if not indexes and not ask_without_indexes:
+            return []
+        if indexes:
+            lines = "\n".join(f"  {name} ({columns})" for name, columns in indexes)
+            message += f"\n\n次のインデックスもあわせて削除されます:\n{lines}"
+        if not messagebox.askyesno("確認", message):
+            return None
+        return [name for name, _ in indexes]
+
+    def drop_column_indexes(self, cursor, index_names):
+        """confirm_column_indexesで確認したインデックスを削除"""
+        for index_name in index_names:
+            cursor.execute(f"DROP INDEX {quote_name(index_name)} ON {self.current_table}")
+
     def delete_column(self):
         if not self.current_table:
             messagebox.showwarning("警告", "データベース・テーブルを選択し、\n削除するカラムを選択してください")
@@ -779,12 +5083,15 @@ class SQLTableManager:
             return
 
         column_name = self.column_tree.item(selected_item)['values'][0]
-        if messagebox.askyesno("確認", f"カラム '{column_name}' を削除しますか？"):
+        index_names = self.confirm_column_indexes(column_name, f"カラム '{column_name}' を削除しますか？")
+        if index_names is not None:
+            def drop(cursor):
+                self.drop_column_indexes(cursor, index_names)
+                cursor.execute(f"ALTER TABLE {self.current_table} DROP COLUMN {column_name}")
+
             try:
-                with self.connect_to_server() as conn:
-                    cursor = conn.cursor()
-                    cursor.execute(f"ALTER TABLE {self.current_table} DROP COLUMN {column_name}")
-                    conn.commit()
+                if not self.run_ddl(drop):
+                    return
                 self.column_tree.delete(selected_item)
                 messagebox.showinfo("成功", f"カラム '{column_name}' を削除しました")
             except Exception as e:
@@ -804,71 +5111,125 @@ class SQLTableManager:
             self.current_table = self.table_listbox.get(selection[0])
             self.refresh_column_list()
 
-    def refresh_column_list(self):
+    def refresh_column_list(self, read_only=True):
         if not self.current_table:
             return
 
         try:
-            with self.connect_to_server() as conn:
-                cursor = conn.cursor()
-                cursor.execute(f"""
-                    SELECT 
-                        c.COLUMN_NAME, 
-                        c.DATA_TYPE,
-                        CASE WHEN COLUMNPROPERTY(OBJECT_ID(c.TABLE_SCHEMA + '.' + c.TABLE_NAME), c.COLUMN_NAME, 'IsIdentity') = 1 
-                             OR EXISTS (
-                                SELECT 1 FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE 
-                                WHERE TABLE_NAME = '{self.current_table}' 
-                                AND COLUMN_NAME = c.COLUMN_NAME
-                             ) THEN 'はい' ELSE 'いいえ' END as IS_PRIMARY,
-                        CASE WHEN c.IS_NULLABLE = 'YES' THEN 'はい' ELSE 'いいえ' END as IS_NULLABLE,
-                        CASE WHEN cc.is_computed = 1 THEN 'YES' ELSE 'NO' END as IS_COMPUTED,
-                        cc.definition as COMPUTED_DEFINITION  -- cc.definition を使用
-                    FROM INFORMATION_SCHEMA.COLUMNS c
-                    LEFT JOIN sys.columns sc 
-                        ON OBJECT_ID(c.TABLE_SCHEMA + '.' + c.TABLE_NAME) = sc.object_id 
-                        AND c.COLUMN_NAME = sc.name
-                    LEFT JOIN sys.computed_columns cc 
-                        ON sc.object_id = cc.object_id 
-                        AND sc.column_id = cc.column_id
-                    WHERE c.TABLE_NAME = '{self.current_table}'
-                """)
-                
-                self.column_tree.delete(*self.column_tree.get_children())
-                self.columns_data = []  # カラムデータを保存するリストをクリア
+            rows = self.read_rows(f"""
+                SELECT 
+                    c.COLUMN_NAME, 
+                    c.DATA_TYPE,
+                    CASE WHEN COLUMNPROPERTY(OBJECT_ID(c.TABLE_SCHEMA + '.' + c.TABLE_NAME), c.COLUMN_NAME, 'IsIdentity') = 1 
+                         OR EXISTS (
+                            SELECT 1 FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE 
+                            WHERE TABLE_NAME = '{self.current_table}' 
+                            AND COLUMN_NAME = c.COLUMN_NAME
+                         ) THEN 'はい' ELSE 'いいえ' END as IS_PRIMARY,
+                    CASE WHEN c.IS_NULLABLE = 'YES' THEN 'はい' ELSE 'いいえ' END as IS_NULLABLE,
+                    CASE WHEN cc.is_computed = 1 THEN 'YES' ELSE 'NO' END as IS_COMPUTED,
+                    cc.definition as COMPUTED_DEFINITION,  -- cc.definition を使用
+                    ISNULL(cc.is_persisted, 0) as IS_PERSISTED,
+                    CASE WHEN EXISTS (
+                            SELECT 1 FROM sys.index_columns ic
+                            WHERE ic.object_id = sc.object_id
+                            AND ic.column_id = sc.column_id
+                         ) THEN 1 ELSE 0 END as IS_INDEXED
+                FROM INFORMATION_SCHEMA.COLUMNS c
+                LEFT JOIN sys.columns sc 
+                    ON OBJECT_ID(c.TABLE_SCHEMA + '.' + c.TABLE_NAME) = sc.object_id 
+                    AND c.COLUMN_NAME = sc.name
+                LEFT JOIN sys.computed_columns cc 
+                    ON sc.object_id = cc.object_id 
+                    AND sc.column_id = cc.column_id
+                WHERE c.TABLE_NAME = '{self.current_table}'
+            """, read_only=read_only)
+            
+            self.column_tree.delete(*self.column_tree.get_children())
+            self.columns_data = []  # カラムデータを保存するリストをクリア
+            
+            for column in rows:
+                # タプルの各要素を個別に取得して表示
+                column_name = column[0]
+                data_type = column[1]
+                is_primary = column[2]
+                is_nullable = column[3]
+                is_computed = column[4]
+                computed_definition = column[5]
+                is_persisted = column[6]
+                is_indexed = column[7]
+
+                # カラムデータを保存
+                self.columns_data.append({
+                    'name': column_name,
+                    'data_type': data_type,
+                    'is_primary': is_primary == 'はい',
+                    'is_nullable': is_nullable == 'はい',
+                    'is_computed': is_computed == 'YES',
+                    'computed_definition': computed_definition if computed_definition else None,
+                    'is_persisted': bool(is_persisted),
+                    'is_indexed': bool(is_indexed)
+                })
                 
-                for column in cursor.fetchall():
-                    # タプルの各要素を個別に取得して表示
-                    column_name = column[0]
-                    data_type = column[1]
-                    is_primary = column[2]
-                    is_nullable = column[3]
-                    is_computed = column[4]
-                    computed_definition = column[5]
-
-                    # カラムデータを保存
-                    self.columns_data.append({
-                        'name': column_name,
-                        'data_type': data_type,
-                        'is_primary': is_primary == 'はい',
-                        'is_nullable': is_nullable == 'はい',
-                        'is_computed': is_computed == 'YES',
-                        'computed_definition': computed_definition if computed_definition else None
-                    })
-                    
-                    self.column_tree.insert("", tk.END, values=(column_name, data_type, is_primary, is_nullable))
+                self.column_tree.insert("", tk.END, values=(column_name, data_type, is_primary, is_nullable))
 
         except Exception as e:
             messagebox.showerror("エラー", f"カラム一覧の取得に失敗しました: {str(e)}")
 
-    def edit_column(self):
-        selected_item = self.column_tree.selection()
-        if not selected_item:
-            messagebox.showwarning("警告", "編集するカラムを選択してください")
+    def show_type_advisor(self):
+        if not self.current_table:
+            messagebox.showwarning("警告", "テーブルを選択してください")
             return
+        TypeAdvisorDialog(self)
+
+    def show_statistics(self):
+        if not self.current_table:
+            messagebox.showwarning("警告", "テーブルを選択してください")
+            return
+        StatisticsDialog(self)
+
+    def show_data_generator(self):
+        if not self.current_table:
+            messagebox.showwarning("警告", "テーブルを選択してください")
+            return
+        DataGeneratorDialog(self)
+
+    def show_table_copy(self):
+        if not self.current_table:
+            messagebox.showwarning("警告", "テーブルを選択してください")
+            return
+        TableCopyDialog(self)
+
+    def show_database_script(self):
+        if not self.current_db:
+            messagebox.showwarning("警告", "データベースを選択してください")
+            return
+        DatabaseScriptDialog(self)
+
+    def show_schema_diff(self):
+        SchemaDiffDialog(self)
+
+    def show_diagnostics(self):
+        DiagnosticsDialog(self)
+
+    def edit_column(self, column_name=None, preset_type=None):
+        """
+        Args:
+            column_name: 編集するカラム名（省略時は一覧で選択中のカラム）
+            preset_type: ダイアログに初期表示するデータ型（省略時は現在の型）
+        """
+        if column_name is None:
+            selected_item = self.column_tree.selection()
+            if not selected_item:
+                messagebox.showwarning("警告", "編集するカラムを選択してください")
+                return
+
+            # 選択されたアイテムのインデックスを取得
+            selected_index = self.column_tree.index(selected_item)
+        else:
+            column_names = [column['name'] for column in self.columns_data]
+            selected_index = column_names.index(column_name) if column_name in column_names else len(column_names)
 
-        # 選択されたアイテムのインデックスを取得
-        selected_index = self.column_tree.index(selected_item)
         if selected_index >= len(self.columns_data):
             messagebox.showerror("エラー", "カラム情報の取得に失敗しました")
             return
@@ -877,11 +5238,14 @@ class SQLTableManager:
         column_data = self.columns_data[selected_index]
         current_values = [
             column_data['name'],
-            column_data['data_type'],
+            preset_type or column_data['data_type'],
             "はい" if column_data['is_primary'] else "いいえ",
             "はい" if column_data['is_nullable'] else "いいえ",
             column_data['is_computed'],
-            column_data['computed_definition']
+            column_data['computed_definition'],
+            False, "", "",
+            column_data['is_persisted'],
+            column_data['is_computed'] and column_data['is_indexed']
         ]
         
         dialog = ColumnDialog(self, "カラムの編集", current_values)
@@ -890,38 +5254,48 @@ class SQLTableManager:
         if not dialog.result:
             return
             
-        try:
-            with self.connect_to_server() as conn:
-                cursor = conn.cursor()
-                old_column_name = current_values[0]
-                
-                # カラム名の変更
-                if dialog.result['name'] != old_column_name:
-                    cursor.execute(f"EXEC sp_rename '{self.current_table}.{old_column_name}', '{dialog.result['name']}', 'COLUMN'")
-                
-                # 計算列への変更または通常カラムへの変更
-                if dialog.result['is_computed']:
-                    sql = f"""ALTER TABLE {self.current_table} DROP COLUMN {dialog.result['name']}
-                            ALTER TABLE {self.current_table} ADD {dialog.result['name']} 
-                            AS {dialog.result['computation_formula']}"""
-                else:
-                    # データ型と制約の変更
-                    null_constraint = "NULL" if dialog.result['is_nullable'] else "NOT NULL"
-                    sql = f"""ALTER TABLE {self.current_table} ALTER COLUMN {dialog.result['name']} 
-                            {dialog.result['data_type']} {null_constraint}"""
-                
+        old_column_name = current_values[0]
+
+        index_names = []
+        if dialog.result['is_computed']:
+            # 計算列は削除して作り直すため、列を参照するインデックスも削除することを確認する
+            index_names = self.confirm_column_indexes(
+                old_column_name, f"計算列 '{old_column_name}' を削除して作り直します。続行しますか？",
+                ask_without_indexes=False)
+            if index_names is None:
+                return
+
+        def edit(cursor):
+            # カラム名の変更
+            if dialog.result['name'] != old_column_name:
+                cursor.execute(f"EXEC sp_rename '{self.current_table}.{old_column_name}', '{dialog.result['name']}', 'COLUMN'")
+            
+            # 計算列への変更または通常カラムへの変更
+            if dialog.result['is_computed']:
+                # 列を参照するインデックスがあると削除できないため先に削除
+                self.drop_column_indexes(cursor, index_names)
+                cursor.execute(f"ALTER TABLE {self.current_table} DROP COLUMN {dialog.result['name']}")
+                self.create_computed_column(cursor, dialog.result)
+            else:
+                # データ型と制約の変更
+                null_constraint = "NULL" if dialog.result['is_nullable'] else "NOT NULL"
+                sql = f"""ALTER TABLE {self.current_table} ALTER COLUMN {dialog.result['name']}
+                        {dialog.result['data_type']} {null_constraint}"""
                 cursor.execute(sql)
-                
-                # 主キー制約の変更
-                if dialog.result['is_primary'] != (current_values[2] == "はい"):
-                    if dialog.result['is_primary']:
-                        cursor.execute(f"ALTER TABLE {self.current_table} ADD CONSTRAINT PK_{dialog.result['name']} PRIMARY KEY ({dialog.result['name']})")
-                    else:
-                        cursor.execute(f"ALTER TABLE {self.current_table} DROP CONSTRAINT PK_{old_column_name}")
-                
-                conn.commit()
-                self.refresh_column_list()
-                messagebox.showinfo("成功", "カラムを更新しました")
+            
+            # 主キー制約の変更
+            if dialog.result['is_primary'] != (current_values[2] == "はい"):
+                if dialog.result['is_primary']:
+                    cursor.execute(f"ALTER TABLE {self.current_table} ADD CONSTRAINT PK_{dialog.result['name']} "
+                                   f"PRIMARY KEY ({dialog.result['name']}){self.low_priority_clause(cursor)}")
+                else:
+                    cursor.execute(f"ALTER TABLE {self.current_table} DROP CONSTRAINT PK_{old_column_name}")
+
+        try:
+            if not self.run_ddl(edit):
+                return
+            self.refresh_column_list(read_only=False)
+            messagebox.showinfo("成功", "カラムを更新しました")
                 
         except Exception as e:
             messagebox.showerror("エラー", f"カラムの更新に失敗しました: {str(e)}")
@@ -955,7 +5329,102 @@ class DataTypes:
         'UNIQUEIDENTIFIER'
     ]
 
+    # LOB型（行外に格納され、I/Oとメモリ許可が大きくなる）
+    LOB_TYPES = ['TEXT', 'NTEXT', 'IMAGE']
+
+    # 可変長のデータ型
+    VARIABLE_TYPES = ['VARCHAR', 'NVARCHAR', 'VARBINARY']
+
+    # 1行あたりの最大サイズ（バイト）
+    MAX_ROW_SIZE = 8060
+
+    # 1ページあたりのデータ領域（バイト）
+    PAGE_DATA_SIZE = 8096
+
+    # 固定長データ型の格納サイズ（バイト）
+    FIXED_SIZES = {
+        'TINYINT': 1, 'SMALLINT': 2, 'INT': 4, 'BIGINT': 8,
+        'BIT': 1, 'MONEY': 8, 'SMALLMONEY': 4,
+        'FLOAT': 8, 'REAL': 4, 'DATE': 3,
+        'TIME': 5, 'DATETIME': 8, 'DATETIME2': 8,
+        'DATETIMEOFFSET': 10, 'SMALLDATETIME': 4,
+        'UNIQUEIDENTIFIER': 16
+    }
+
+    # 整数型の値の範囲（狭い順）
+    INTEGER_RANGES = [
+        ('TINYINT', 0, 255),
+        ('SMALLINT', -2**15, 2**15 - 1),
+        ('INT', -2**31, 2**31 - 1),
+        ('BIGINT', -2**63, 2**63 - 1)
+    ]
+
+    # 可変長文字列の長さ候補
+    LENGTH_BUCKETS = [8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4000]
+
+    @staticmethod
+    def storage_size(data_type, max_length):
+        """sys.columns.max_length から1行あたりの最大格納サイズを求める
+
+        Returns:
+            (サイズ, 可変長かどうか)。MAX型とLOB型は行内ポインタ分のサイズを返す
+        """
+        base_type = data_type.upper()
+        if base_type in DataTypes.LOB_TYPES:
+            return 16, True
+        if base_type in DataTypes.VARIABLE_TYPES:
+            if max_length == -1:
+                return 24, True
+            return max_length, True
+        return max_length, False
+
+def run_schema_diff(args):
+    """画面を使わずにスキーマを比較し、移行スクリプトを出力する
+
+    Returns:
+        終了コード
+            0: 差分なし
+            1: 差分あり（移行スクリプトを出力）
+            2: 接続設定の読み込み、データベースへの接続、出力先への書き込みのいずれかに失敗
+    """
+    try:
+        with open(args.settings, 'r') as f:
+            settings = json.load(f)
+
+        governor = QueryGovernor()
+        source = load_snapshot(governor, settings, args.source_db, args.source_server)
+        target = load_snapshot(governor, settings, args.target_db, args.target_server)
+        differences, script = SchemaComparer(source, target, args.include_drops).compare()
+
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8', newline='\n') as f:
+                f.write(script)
+        else:
+            sys.stdout.write(script)
+    except (pyodbc.Error, CircuitOpenError, OSError, json.JSONDecodeError) as e:
+        print(f"スキーマの比較に失敗しました: {str(e)}", file=sys.stderr)
+        return 2
+
+    for kind, name, detail in differences:
+        print(f"{kind}\t{name}\t{detail}", file=sys.stderr)
+    return 1 if differences else 0
+
 def main():
+    parser = argparse.ArgumentParser(description="SQL Server テーブル管理ツール")
+    subparsers = parser.add_subparsers(dest='command')
+    diff_parser = subparsers.add_parser('diff', help="スキーマを比較し、ターゲットをソースに合わせる移行スクリプトを出力する")
+    diff_parser.add_argument('source_db', help="目標とするスキーマのデータベース")
+    diff_parser.add_argument('target_db', help="変更対象のデータベース")
+    diff_parser.add_argument('--source-server', help="ソースのサーバー（省略時は接続設定のサーバー）")
+    diff_parser.add_argument('--target-server', help="ターゲットのサーバー（省略時は接続設定のサーバー）")
+    diff_parser.add_argument('--settings', default="connection_settings.json", help="接続設定ファイル")
+    diff_parser.add_argument('--output', help="移行スクリプトの出力先（省略時は標準出力）")
+    diff_parser.add_argument('--include-drops', action='store_true', help="テーブル・カラムの削除を含める")
+    args = parser.parse_args()
+
+    if args.command == 'diff':
+        sys.exit(run_schema_diff(args))
+
     app = SQLTableManager()
     app.run()
 
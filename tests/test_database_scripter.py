@@ -0,0 +1,54 @@
+import types
+
+import pytest
+
+pytest.importorskip("pyodbc")
+from DB_editor import DatabaseScripter  # noqa: E402
+
+
+def make_snapshot(*tables):
+    """(object_id, schema, name, 参照先object_idのリスト) からスナップショット相当を作る"""
+    snapshot_tables = {}
+    for object_id, schema, name, references in tables:
+        foreign_keys = {index: {'referenced_object_id': reference} for index, reference in enumerate(references)}
+        snapshot_tables[object_id] = {'object_id': object_id, 'schema': schema, 'name': name,
+                                      'foreign_keys': foreign_keys}
+    return types.SimpleNamespace(tables=snapshot_tables)
+
+
+def ordered_names(snapshot):
+    return [f"{table['schema']}.{table['name']}" for table in DatabaseScripter(snapshot).dependency_order()]
+
+
+def test_referenced_tables_come_first():
+    snapshot = make_snapshot(
+        (1, 'dbo', 'OrderLine', [2, 3]),
+        (2, 'dbo', 'Order', [4]),
+        (3, 'dbo', 'Product', []),
+        (4, 'dbo', 'Customer', []),
+    )
+    assert ordered_names(snapshot) == ['dbo.Customer', 'dbo.Order', 'dbo.Product', 'dbo.OrderLine']
+
+
+def test_order_ignores_self_references_and_tables_outside_snapshot():
+    snapshot = make_snapshot(
+        (1, 'dbo', 'Employee', [1, 99]),
+        (2, 'app', 'Setting', []),
+    )
+    assert ordered_names(snapshot) == ['app.Setting', 'dbo.Employee']
+
+
+def test_cycles_are_placed_last_in_name_order():
+    snapshot = make_snapshot(
+        (1, 'dbo', 'B', [2]),
+        (2, 'dbo', 'A', [1]),
+        (3, 'dbo', 'C', [2]),
+        (4, 'dbo', 'Z', []),
+    )
+    # 循環しているA・Bと、それを参照するCは名前順で末尾に並ぶ
+    assert ordered_names(snapshot) == ['dbo.Z', 'dbo.A', 'dbo.B', 'dbo.C']
+
+
+def test_order_does_not_depend_on_catalog_order():
+    tables = [(1, 'dbo', 'T3', [2]), (2, 'dbo', 'T1', []), (3, 'sales', 'T0', []), (4, 'dbo', 'T2', [])]
+    assert ordered_names(make_snapshot(*tables)) == ordered_names(make_snapshot(*reversed(tables)))
@@ -0,0 +1,146 @@
+import pytest
+
+pyodbc = pytest.importorskip("pyodbc")
+import DB_editor  # noqa: E402
+from DB_editor import CircuitOpenError, QueryGovernor, native_error_numbers  # noqa: E402
+
+
+def odbc_error(sqlstate, message):
+    return pyodbc.Error(sqlstate, f"[{sqlstate}] [Microsoft][ODBC Driver 17 for SQL Server]{message}")
+
+
+class FakeConnection:
+    timeout = None
+
+
+@pytest.fixture
+def governor():
+    return QueryGovernor(failure_threshold=3, reset_timeout=30)
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(DB_editor.time, "sleep", lambda seconds: None)
+
+
+def open_circuit(governor):
+    for _ in range(governor.failure_threshold):
+        governor.record_failure(odbc_error('08S01', "Communication link failure (10054) (SQLExecDirectW)"))
+    assert governor.state == QueryGovernor.OPEN
+
+
+def expire_reset_timeout(governor):
+    governor.opened_at -= governor.reset_timeout + 1
+
+
+def test_native_error_numbers_reads_only_record_suffixes():
+    error = odbc_error('23000', "[SQL Server]Violation of PRIMARY KEY constraint 'PK_t'. "
+                                "The duplicate key value is (1205). (2627) (SQLExecDirectW); "
+                                "[23000] [SQL Server]The statement has been terminated. (3621)")
+    assert native_error_numbers(error) == {2627, 3621}
+
+
+def test_is_transient_classification(governor):
+    assert governor.is_transient(odbc_error('08S01', "Communication link failure (10054) (SQLExecDirectW)"))
+    assert governor.is_transient(odbc_error('40001', "[SQL Server]deadlock victim (1205) (SQLExecDirectW)"))
+    assert not governor.is_transient(odbc_error('42000', "[SQL Server]Incorrect syntax (102) (SQLExecDirectW)"))
+    # クエリのタイムアウトは一時エラーではなく、ログインのタイムアウトだけを数える
+    timeout = odbc_error('HYT00', "Query timeout expired (0) (SQLExecDirectW)")
+    assert not governor.is_transient(timeout)
+    assert governor.is_transient(timeout, connecting=True)
+    assert not governor.is_transient(CircuitOpenError("open"))
+
+
+def test_opens_after_consecutive_transient_failures(governor):
+    governor.record_failure(odbc_error('42000', "[SQL Server]Incorrect syntax (102) (SQLExecDirectW)"))
+    assert governor.failures == 0
+    open_circuit(governor)
+    with pytest.raises(CircuitOpenError):
+        governor.before_call()
+
+
+def test_half_open_lets_a_single_probe_through(governor):
+    open_circuit(governor)
+    expire_reset_timeout(governor)
+    assert governor.before_call() is True
+    with pytest.raises(CircuitOpenError):
+        governor.before_call()
+    governor.record_success()
+    assert governor.state == QueryGovernor.CLOSED
+    assert governor.before_call() is False
+
+
+def test_failed_probe_reopens_circuit(governor):
+    open_circuit(governor)
+    expire_reset_timeout(governor)
+    governor.before_call()
+    governor.record_failure(odbc_error('08S01', "Communication link failure (10054) (SQLExecDirectW)"))
+    assert governor.state == QueryGovernor.OPEN
+    assert not governor.probe_in_flight
+
+
+def test_successful_probe_connect_closes_circuit(governor, monkeypatch):
+    monkeypatch.setattr(DB_editor.pyodbc, "connect", lambda *args, **kwargs: FakeConnection())
+    open_circuit(governor)
+    expire_reset_timeout(governor)
+    # run_read等を通さずに接続するだけの呼び出し元でも、回路が半開のまま残らない
+    conn = governor.connect("DSN=test", 15, 30)
+    assert conn.timeout == 30
+    assert governor.state == QueryGovernor.CLOSED
+    assert governor.run_read(lambda: "ok") == "ok"
+
+
+def test_connect_failure_is_recorded_once(governor, monkeypatch):
+    def fail(*args, **kwargs):
+        raise odbc_error('08001', "TCP Provider: timeout (258) (SQLDriverConnect)")
+
+    monkeypatch.setattr(DB_editor.pyodbc, "connect", fail)
+    with pytest.raises(pyodbc.Error) as raised:
+        governor.run(lambda: governor.connect("DSN=test", 15, 30))
+    assert raised.value.recorded_by_governor
+    assert governor.failures == 1
+
+
+def test_run_records_errors_after_connecting(governor):
+    def query():
+        raise odbc_error('08S01', "Communication link failure (10054) (SQLExecDirectW)")
+
+    for _ in range(governor.failure_threshold):
+        with pytest.raises(pyodbc.Error):
+            governor.run(query)
+    assert governor.state == QueryGovernor.OPEN
+
+
+def test_run_read_retries_transient_errors(governor):
+    attempts = []
+
+    def read():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise odbc_error('40001', "[SQL Server]deadlock victim (1205) (SQLExecDirectW)")
+        return "rows"
+
+    assert governor.run_read(read) == "rows"
+    assert len(attempts) == 3
+    assert governor.state == QueryGovernor.CLOSED
+    assert governor.failures == 0
+
+
+def test_run_read_does_not_retry_permanent_errors(governor):
+    attempts = []
+
+    def read():
+        attempts.append(1)
+        raise odbc_error('42S02', "[SQL Server]Invalid object name 't'. (208) (SQLExecDirectW)")
+
+    with pytest.raises(pyodbc.Error):
+        governor.run_read(read)
+    assert len(attempts) == 1
+
+
+def test_connect_passes_attrs_before_only_when_set(governor, monkeypatch):
+    calls = []
+    monkeypatch.setattr(DB_editor.pyodbc, "connect", lambda *args, **kwargs: calls.append(kwargs) or FakeConnection())
+    governor.connect("DSN=test", 15, 30, DB_editor.connection_attributes({'packet_size': 0}))
+    governor.connect("DSN=test", 15, 30, DB_editor.connection_attributes({'packet_size': 32767}))
+    assert calls == [{'timeout': 15}, {'timeout': 15, 'attrs_before': {DB_editor.SQL_ATTR_PACKET_SIZE: 32767}}]
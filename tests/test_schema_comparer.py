@@ -0,0 +1,87 @@
+import pytest
+
+pytest.importorskip("pyodbc")
+from DB_editor import CatalogSnapshot as C, SchemaComparer  # noqa: E402
+
+
+class FakeCursor:
+    def __init__(self, results):
+        self.results = results
+
+    def execute(self, sql, *params):
+        self.rows = self.results.get(sql, [])
+        return self
+
+    def fetchall(self):
+        return list(self.rows)
+
+
+def column(column_id, name, type_name, is_nullable=False, default=None):
+    default_name, default_definition = default or (None, None)
+    return (1, column_id, name, type_name, 0, 4 if type_name == 'int' else 8, 10, 0, is_nullable, None,
+            0, None, None, 0, None, 0, 0, default_name, default_definition)
+
+
+def load(amount_type='int', names=None, system_named=(), extra_columns=()):
+    """dbo.Orders 1テーブルのスナップショット。namesで制約名を置き換える"""
+    names = names or {}
+
+    def name(original):
+        return names.get(original, original)
+
+    return C.load(FakeCursor({
+        C.TABLES_SQL: [(1, 'dbo', 'Orders')],
+        C.COLUMNS_SQL: [column(1, 'id', 'int'),
+                        column(2, 'amount', amount_type, default=(name('DF_Orders_amount'), '((0))'))]
+                       + list(extra_columns),
+        C.INDEXES_SQL: [(1, 1, name('PK_Orders'), 1, 1, 1, 0, None)],
+        C.INDEX_COLUMNS_SQL: [(1, 1, 1, 1, 'id', 0, 0)],
+        C.CHECKS_SQL: [(1, name('CK_Orders_amount'), '([amount]>=(0))')],
+        C.SYSTEM_NAMED_SQL: [(1, name(original)) for original in system_named],
+    }))
+
+
+SYSTEM_NAMED = ('PK_Orders', 'DF_Orders_amount', 'CK_Orders_amount')
+
+
+def test_system_named_constraints_match_by_definition():
+    source = load(names={'PK_Orders': 'PK__Orders__3213E83F', 'DF_Orders_amount': 'DF__Orders__amoun__2B3F6F97',
+                         'CK_Orders_amount': 'CK__Orders__amoun__2C3393D0'}, system_named=SYSTEM_NAMED)
+    target = load(names={'PK_Orders': 'PK__Orders__3213E83E', 'DF_Orders_amount': 'DF__Orders__amoun__1A14E395',
+                         'CK_Orders_amount': 'CK__Orders__amoun__1B0907CE'}, system_named=SYSTEM_NAMED)
+    assert SchemaComparer(source, target).compare() == ([], "")
+
+
+def test_user_named_constraint_rename_is_a_difference():
+    differences, script = SchemaComparer(load(), load(names={'CK_Orders_amount': 'CK_amount'})).compare()
+    assert [kind for kind, _, _ in differences] == ["CHECK制約", "CHECK制約"]
+    assert "DROP CONSTRAINT [CK_amount]" in script
+    assert "ADD CONSTRAINT [CK_Orders_amount] CHECK ([amount]>=(0))" in script
+
+
+def test_drops_are_commented_unless_requested():
+    target = load(extra_columns=[column(3, 'legacy', 'int', is_nullable=True, default=('DF_Orders_legacy', '((1))'))])
+    script = SchemaComparer(load(), target).compare()[1]
+    assert "-- ALTER TABLE [dbo].[Orders] DROP CONSTRAINT [DF_Orders_legacy]\n" in script
+    assert "-- ALTER TABLE [dbo].[Orders] DROP COLUMN [legacy]\n" in script
+
+    script = SchemaComparer(load(), target, include_drops=True).compare()[1]
+    assert "ALTER TABLE [dbo].[Orders] DROP COLUMN [legacy]\nGO\n" in script
+    assert "-- ALTER" not in script
+
+
+def test_altered_column_rebuilds_default_and_checks_around_alter():
+    differences, script = SchemaComparer(load(amount_type='bigint'), load()).compare()
+    # 既定値とCHECK制約は変わっていないため、差分はカラムの型だけ
+    assert differences == [("カラム変更", "[dbo].[Orders].[amount]", "INT NOT NULL → BIGINT NOT NULL")]
+    order = [
+        "ALTER TABLE [dbo].[Orders] DROP CONSTRAINT [DF_Orders_amount]",
+        "ALTER TABLE [dbo].[Orders] DROP CONSTRAINT [CK_Orders_amount]",
+        "ALTER TABLE [dbo].[Orders] ALTER COLUMN [amount] BIGINT NOT NULL",
+        "ALTER TABLE [dbo].[Orders] ADD CONSTRAINT [DF_Orders_amount] DEFAULT ((0)) FOR [amount]",
+        "ALTER TABLE [dbo].[Orders] ADD CONSTRAINT [CK_Orders_amount] CHECK ([amount]>=(0))",
+    ]
+    positions = [script.index(statement + "\nGO\n") for statement in order]
+    assert positions == sorted(positions)
+    # 変更しないカラムの主キーは作り直さない
+    assert "PK_Orders" not in script
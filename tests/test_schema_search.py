@@ -0,0 +1,56 @@
+import pytest
+
+pytest.importorskip("pyodbc")
+from DB_editor import SchemaSearchIndex  # noqa: E402
+
+
+@pytest.fixture
+def index():
+    index = SchemaSearchIndex()
+    index.replace_database('Sales', 1, [
+        ('dbo', 'Customer', 'CustomerId', 'int'),
+        ('dbo', 'Customer', 'Name', 'nvarchar(100)'),
+        ('dbo', 'OrderLine', 'OrderId', 'int'),
+    ])
+    index.replace_database('Hr', 1, [
+        ('dbo', 'Employee', 'Id', 'int'),
+        ('dbo', 'Employee', 'CustomerNote', 'nvarchar(max)'),
+    ])
+    return index
+
+
+def test_substring_search_matches_table_or_column_names(index):
+    assert index.search("customer") == [
+        ('Hr', 'dbo', 'Employee', 'CustomerNote', 'nvarchar(max)'),
+        ('Sales', 'dbo', 'Customer', 'CustomerId', 'int'),
+        ('Sales', 'dbo', 'Customer', 'Name', 'nvarchar(100)'),
+    ]
+    assert index.search("  ORDERL ") == [('Sales', 'dbo', 'OrderLine', 'OrderId', 'int')]
+    assert index.search("nomatch") == []
+    assert index.search("") == []
+
+
+def test_short_patterns_scan_all_entries(index):
+    # 3文字未満はトライグラムで絞り込めない
+    assert [entry[3] for entry in index.search("id")] == ['Id', 'CustomerId', 'OrderId']
+
+
+def test_wildcards_match_the_whole_name(index):
+    assert [entry[3] for entry in index.search("*id")] == ['Id', 'CustomerId', 'OrderId']
+    assert [entry[3] for entry in index.search("order?d")] == ['OrderId']
+    assert index.search("cust*") == index.search("customer")
+    assert index.search("ustomer*") == []
+
+
+def test_limit_returns_first_entries_in_order(index):
+    assert index.search("customer", limit=2) == index.search("customer")[:2]
+
+
+def test_replace_and_remove_database(index):
+    index.replace_database('Sales', 2, [('dbo', 'Invoice', 'InvoiceId', 'int')])
+    assert [entry[0] for entry in index.search("customer")] == ['Hr']
+    assert index.fingerprints['Sales'] == 2
+    index.remove_database('Hr')
+    assert index.search("customer") == []
+    assert index.databases() == ['Sales']
+    assert all(index.postings.values())
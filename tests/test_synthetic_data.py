@@ -0,0 +1,73 @@
+import datetime
+
+import pytest
+
+pytest.importorskip("pyodbc")
+from DB_editor import SyntheticDataGenerator  # noqa: E402
+
+
+def make_column(type_name, name="col", max_length=4, precision=0, scale=0,
+                is_nullable=False, is_unique=False, ref_table=None, **settings):
+    column = {
+        'name': name, 'type': type_name, 'max_length': max_length, 'precision': precision, 'scale': scale,
+        'is_nullable': is_nullable, 'is_unique': is_unique, 'ref_table': ref_table, 'ref_column': None
+    }
+    column['settings'] = SyntheticDataGenerator.default_settings(column)
+    column['settings'].update(settings)
+    return column
+
+
+def test_default_settings_use_sequence_for_unique_columns():
+    unique = make_column('INT', is_nullable=True, is_unique=True)
+    assert unique['settings']['distribution'] == "連番"
+    # 一意インデックスにはNULLを1行しか入れられない
+    assert unique['settings']['null_ratio'] == 0.0
+    assert make_column('INT', is_nullable=True)['settings']['null_ratio'] == 0.1
+
+
+def test_key_range_follows_type():
+    assert SyntheticDataGenerator.key_range(make_column('TINYINT')) == (0, 255)
+    assert SyntheticDataGenerator.key_range(make_column('DECIMAL', precision=5, scale=2)) == (-999, 999)
+    assert SyntheticDataGenerator.key_range(make_column('NVARCHAR', max_length=6)) == (0, 999)
+    assert SyntheticDataGenerator.key_range(make_column('FLOAT')) is None
+
+
+def test_sequence_error_reports_overflow():
+    column = make_column('TINYINT', is_unique=True, min=200)
+    assert SyntheticDataGenerator.sequence_error(column, 56) is None
+    assert "TINYINT" in SyntheticDataGenerator.sequence_error(column, 57)
+
+
+def test_sequence_error_requires_sequence_for_unique_columns():
+    assert SyntheticDataGenerator.sequence_error(make_column('INT', is_unique=True, distribution="一様"), 10)
+    assert SyntheticDataGenerator.sequence_error(make_column('INT', distribution="一様"), 10) is None
+    # 一意でない文字列は切り詰めても構わない
+    assert SyntheticDataGenerator.sequence_error(make_column('VARCHAR', max_length=2, distribution="連番"), 1000) is None
+
+
+def test_key_from_value_inverts_convert():
+    generator = SyntheticDataGenerator([])
+    for column in (make_column('DATE'), make_column('DATETIME2'), make_column('VARBINARY', max_length=4),
+                   make_column('BIGINT')):
+        values = generator.convert(column, [0, 12345], None)
+        assert [SyntheticDataGenerator.key_from_value(column, value) for value in values] == [0, 12345]
+    assert SyntheticDataGenerator.key_from_value(make_column('INT'), None) is None
+
+
+def test_generate_batch_is_reproducible_per_start():
+    columns = [make_column('INT', name="id", is_unique=True),
+               make_column('VARCHAR', name="name", max_length=20, is_nullable=True),
+               make_column('DATETIME', name="created", distribution="正規")]
+    whole = SyntheticDataGenerator(columns, seed=7).generate_batch(100, 50)
+    assert whole == SyntheticDataGenerator(columns, seed=7).generate_batch(100, 50)
+    assert whole != SyntheticDataGenerator(columns, seed=8).generate_batch(100, 50)
+    assert [row[0] for row in whole] == list(range(101, 151))
+    assert all(isinstance(row[2], datetime.datetime) for row in whole)
+
+
+def test_unique_sequence_values_stay_unique_when_truncated():
+    column = make_column('CHAR', name="code", max_length=3, is_unique=True, min=0)
+    generator = SyntheticDataGenerator([column])
+    values = [row[0] for row in generator.generate_batch(0, 500) + generator.generate_batch(500, 500)]
+    assert len(set(values)) == 1000
+    assert all(len(value) <= 3 for value in values)
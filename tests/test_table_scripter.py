@@ -0,0 +1,50 @@
+import pytest
+
+pytest.importorskip("pyodbc")
+from DB_editor import TableScripter  # noqa: E402
+
+
+def make_table():
+    return {
+        'object_id': 10, 'schema': 'dbo', 'name': 'Order',
+        'columns': [
+            {'name': 'id', 'default_name': None},
+            {'name': 'status', 'default_name': 'DF_Order_status'}
+        ],
+        'indexes': {
+            1: {'name': 'PK_Order', 'is_primary_key': True, 'is_unique_constraint': False},
+            2: {'name': 'UQ_OrderLine_no', 'is_primary_key': False, 'is_unique_constraint': True},
+            3: {'name': 'IX_Order_status', 'is_primary_key': False, 'is_unique_constraint': False}
+        },
+        'foreign_keys': {
+            20: {'name': 'FK_Order_parent', 'referenced_object_id': 10, 'ref_table': 'Order'},
+            21: {'name': 'FK_order_Customer', 'referenced_object_id': 11, 'ref_table': 'Customer'}
+        },
+        'checks': [('CK_Order_status', "([status]>(0))"), ('status_positive', "([status]>(0))")]
+    }
+
+
+def test_renamed_table_keeps_constraint_names_by_default():
+    table = make_table()
+    renamed = TableScripter(None).renamed_table(table, 'Order_copy')
+    assert renamed['name'] == 'Order_copy'
+    assert renamed['indexes'][1]['name'] == 'PK_Order'
+    assert renamed['columns'][1]['default_name'] == 'DF_Order_status'
+    # 自己参照の外部キーだけが新しいテーブルを参照する
+    assert renamed['foreign_keys'][20]['ref_table'] == 'Order_copy'
+    assert renamed['foreign_keys'][21]['ref_table'] == 'Customer'
+    assert table['name'] == 'Order' and table['foreign_keys'][20]['ref_table'] == 'Order'
+
+
+def test_renamed_table_replaces_whole_name_tokens_only():
+    renamed = TableScripter(None).renamed_table(make_table(), 'Order_copy', rename_constraints=True)
+    assert renamed['indexes'][1]['name'] == 'PK_Order_copy'
+    assert renamed['columns'][1]['default_name'] == 'DF_Order_copy_status'
+    assert renamed['foreign_keys'][21]['name'] == 'FK_Order_copy_Customer'
+    assert renamed['checks'][0] == ('CK_Order_copy_status', "([status]>(0))")
+    # 「OrderLine」は語として一致しないため、末尾に新しい名前を付ける
+    assert renamed['indexes'][2]['name'] == 'UQ_OrderLine_no_Order_copy'
+    assert renamed['checks'][1][0] == 'status_positive_Order_copy'
+    # 制約でないインデックスは名前を変えない
+    assert renamed['indexes'][3]['name'] == 'IX_Order_status'
+    assert renamed['columns'][0]['default_name'] is None